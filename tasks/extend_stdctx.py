@@ -1,7 +1,7 @@
-import requests
 from cumulusci.tasks.sfdx import SFDXBaseTask
 from cumulusci.core.keychain import BaseProjectKeychain
 from abc import abstractmethod
+from tasks.rlm_connect_client import ConnectClient
 
 # ExtendStandardContext is a custom task that extends the SFDXBaseTask provided by CumulusCI.
 class ExtendStandardContext(SFDXBaseTask):
@@ -32,6 +32,7 @@ class ExtendStandardContext(SFDXBaseTask):
         self._load_keychain()
         self.access_token = self.options.get("access_token", self.org_config.access_token)
         self.instance_url = self.options.get("instance_url", self.org_config.instance_url)
+        self.client = ConnectClient.from_task(self)
 
     # Execute the task after preparation, where the core functionality will be implemented
     def _run_task(self):
@@ -59,7 +60,7 @@ class ExtendStandardContext(SFDXBaseTask):
     # Post-process after getting the context ID - usually involves additional API calls to further define the context
     def _process_context_id(self):
         url, headers = self._build_url_and_headers(f"connect/context-definitions/{self.context_id}")
-        response = self._make_request("get", url, headers=headers)
+        response = self._make_request("get", url, headers=headers, cache="revalidate")
         if response:
             version_list = response.get('contextDefinitionVersionList', [])
             if version_list:
@@ -92,21 +93,11 @@ class ExtendStandardContext(SFDXBaseTask):
 
     # Helper to construct the request URL and headers for making API calls
     def _build_url_and_headers(self, endpoint):
-        url = f"{self.instance_url}/services/data/v{self.project_config.project__package__api_version}/{endpoint}"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json",
-        }
-        return url, headers
+        return self.client.build_url(endpoint), self.client.build_headers()
 
-    # Make an HTTP request using the requests library and handle the response
+    # Make an HTTP request through the shared pooled Connect API client and handle the response
     def _make_request(self, method, url, **kwargs):
-        response = requests.request(method, url, **kwargs)
-        if response.ok:
-            return response.json()
-        else:
-            self.logger.error(f"Failed {method.upper()} request to {url}: {response.text}")
-            return None
+        return self.client.request(method, url, **kwargs)
 
     # Abstract method to get the keychain class, needs to be implemented by subclasses
     @abstractmethod
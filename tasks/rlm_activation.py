@@ -0,0 +1,168 @@
+import os
+
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+from cumulusci.core.utils import process_bool_arg, process_list_arg
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+from tasks.rlm_connect_client import ConnectClient, soql_in
+from tasks.rlm_load_dataset import COLLECTION_SIZE, key_value
+from tasks.rlm_polling import poll
+from tasks.rlm_sfdmu_dataset import Dataset
+
+# Field identifying the records of each object and the field holding its activation state, with the
+# values that mean active and inactive
+ACTIVATION_FIELDS = {
+    "ExpressionSetVersion": {"key": "ApiName", "state": "IsActive", "active": True, "inactive": False},
+    "DecisionTable": {"key": "DeveloperName", "state": "Status", "active": "Active", "inactive": "Inactive"},
+}
+
+DEFAULT_VERIFY_TIMEOUT = 120
+MAX_LOGGED_ERRORS = 5
+
+
+# SetActivationState activates or deactivates expression set versions and decision tables by name. The
+# records are resolved with a single query, the ones not yet in the wanted state are updated through sObject
+# Collections 200 at a time, and a final query confirms the state, waiting for activations the org finishes
+# asynchronously. The names and states come from the names option or from the object's CSV in an sfdmu dataset.
+class SetActivationState(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "access_token": {
+            "description": "The access token for the org. Defaults to the project default",
+        },
+        "sobject": {
+            "description": f"Object to update: {', '.join(ACTIVATION_FIELDS)}",
+            "required": True,
+        },
+        "names": {
+            "description": "Names of the records to update, matched on ApiName or DeveloperName",
+        },
+        "active": {
+            "description": "Whether the records named in names are activated or deactivated. Defaults to True",
+        },
+        "dataset": {
+            "description": "sfdmu dataset directory whose CSV for the object lists the names and wanted states, "
+            "e.g. datasets/sfdmu/expressionsets_active",
+        },
+        "verify_timeout": {
+            "description": f"Seconds to wait for the org to report the final state. Defaults to {DEFAULT_VERIFY_TIMEOUT}",
+        },
+    }
+
+    # Initialize the task options
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        sobject = self.options["sobject"]
+        if sobject not in ACTIVATION_FIELDS:
+            raise TaskOptionsError(f"sobject must be one of {', '.join(ACTIVATION_FIELDS)}, not {sobject}")
+        self.fields = ACTIVATION_FIELDS[sobject]
+        if bool(self.options.get("names")) == bool(self.options.get("dataset")):
+            raise TaskOptionsError("Specify either names or a dataset")
+        self.verify_timeout = int(self.options.get("verify_timeout") or DEFAULT_VERIFY_TIMEOUT)
+
+    # Prepare runtime by setting up access token, instance URL and the shared Connect API client
+    def _prep_runtime(self):
+        self.access_token = self.options.get("access_token", self.org_config.access_token)
+        self.instance_url = self.options.get("instance_url", self.org_config.instance_url)
+        self.client = ConnectClient.from_task(self)
+
+    # Resolve the records, update the ones in the wrong state and verify the result
+    def _run_task(self):
+        self._prep_runtime()
+        targets = self._targets()
+        sobject, key, state = self.options["sobject"], self.fields["key"], self.fields["state"]
+        if not targets:
+            self.logger.info(f"No {sobject} records to update")
+            return
+
+        records = self._query(targets)
+        missing = sorted(set(targets) - set(records))
+        if missing:
+            raise CumulusCIException(f"No {sobject} records with {key} {', '.join(missing)}")
+
+        changes = [
+            (name, records[name]["Id"], value)
+            for name, value in sorted(targets.items())
+            if key_value(records[name][state]) != key_value(value)
+        ]
+        self.logger.info(f"{len(changes)} of {len(targets)} {sobject} records need a new {state}")
+        errors = self._update(changes)
+        if errors:
+            for error in errors[:MAX_LOGGED_ERRORS]:
+                self.logger.error(error)
+            raise CumulusCIException(f"Could not update {len(errors)} {sobject} records")
+        if changes:
+            self._verify(targets)
+        self.return_values = {"updated": [name for name, _, _ in changes], "unchanged": len(targets) - len(changes)}
+
+    # Map of record name to the state it should end up in
+    def _targets(self):
+        key, state = self.fields["key"], self.fields["state"]
+        if self.options.get("names"):
+            active = process_bool_arg(self.options.get("active", True))
+            value = self.fields["active"] if active else self.fields["inactive"]
+            return {name: value for name in process_list_arg(self.options["names"])}
+
+        directory = self.options["dataset"]
+        if not os.path.exists(os.path.join(directory, "export.json")):
+            raise TaskOptionsError(f"{directory} is not an sfdmu dataset")
+        obj = Dataset(directory).by_name.get(self.options["sobject"])
+        if obj is None or key not in obj.columns or state not in obj.columns:
+            raise TaskOptionsError(f"{directory} has no {self.options['sobject']} CSV with {key} and {state} columns")
+        boolean = isinstance(self.fields["active"], bool)
+        return {
+            row[key]: row[state].lower() == "true" if boolean else row[state]
+            for row in obj.iter_rows()
+            if row.get(key)
+        }
+
+    # Current records for the target names, keyed by name, from a single query
+    def _query(self, targets):
+        sobject, key, state = self.options["sobject"], self.fields["key"], self.fields["state"]
+        records = self.client.query(f"SELECT Id, {key}, {state} FROM {sobject} WHERE {key} IN {soql_in(sorted(targets))}")
+        if records is None:
+            raise CumulusCIException(f"Could not query {sobject} records")
+        return {record[key]: record for record in records}
+
+    # Write the new states in sObject Collections requests; returns the errors of the records that failed
+    def _update(self, changes):
+        sobject, state = self.options["sobject"], self.fields["state"]
+        url = self.client.build_url("composite/sobjects")
+        errors = []
+        for start in range(0, len(changes), COLLECTION_SIZE):
+            chunk = changes[start:start + COLLECTION_SIZE]
+            records = [{"attributes": {"type": sobject}, "Id": record_id, state: value} for _, record_id, value in chunk]
+            response = self.client.request("patch", url, json={"allOrNone": False, "records": records})
+            if response is None:
+                errors.extend(f"{name}: update request failed" for name, _, _ in chunk)
+                continue
+            for (name, _, _), outcome in zip(chunk, response):
+                if not outcome.get("success"):
+                    messages = "; ".join(error.get("message", "") for error in outcome.get("errors", []))
+                    errors.append(f"{name}: {messages}")
+        return errors
+
+    # Query the records until every one of them reports its target state or the timeout passes
+    def _verify(self, targets):
+        sobject, state = self.options["sobject"], self.fields["state"]
+        pending = {}
+
+        def settled():
+            records = self._query(targets)
+            pending.clear()
+            pending.update(
+                {
+                    name: records.get(name, {}).get(state)
+                    for name, value in targets.items()
+                    if key_value(records.get(name, {}).get(state)) != key_value(value)
+                }
+            )
+            return not pending
+
+        _, elapsed, attempts = poll(settled, timeout=self.verify_timeout)
+        if pending:
+            states = ", ".join(f"{name} ({value})" for name, value in sorted(pending.items()))
+            raise CumulusCIException(f"{sobject} records did not reach their {state} after {elapsed:.0f}s: {states}")
+        self.logger.info(f"Verified the {state} of {len(targets)} {sobject} records after {attempts} queries")
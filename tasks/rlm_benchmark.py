@@ -0,0 +1,201 @@
+import json
+import shutil
+import statistics
+import time
+
+from cumulusci.core.config import OrgConfig, TaskConfig
+from cumulusci.core.exceptions import CumulusCIException
+from cumulusci.core.utils import import_global, process_list_arg
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+from tasks.rlm_connect_client import add_request_hook, remove_request_hook
+from tasks.rlm_extend_stdctx import clear_definition_listings
+from tasks.rlm_http_metrics import recorder
+from tasks.rlm_mock_org import MockOrg, MockOrgServer
+from tasks.rlm_org_state import org_key, state_dir
+
+DEFAULT_TASKS = [
+    "extend_stdctx_all",
+    "sync_pricing_data",
+    "wait_for_decision_tables",
+    "wait_for_price_adjustment_schedules",
+    "insert_quantumbit_data",
+]
+DEFAULT_FLOWS = ["extend_context_definitions"]
+
+
+# BenchmarkTasks runs the custom tasks and flows against a local stand-in org and reports wall time,
+# round trips and bytes for each, optionally failing when they regress against a saved baseline
+class BenchmarkTasks(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "tasks": {
+            "description": f"Tasks to benchmark. Defaults to {', '.join(DEFAULT_TASKS)}",
+        },
+        "flows": {
+            "description": f"Flows to benchmark. Defaults to {', '.join(DEFAULT_FLOWS)}",
+        },
+        "iterations": {
+            "description": "Number of runs of each task and flow. Defaults to 3",
+        },
+        "latency": {
+            "description": "Seconds of simulated round-trip latency per request. Defaults to 0.05",
+        },
+        "error_rate": {
+            "description": "Fraction of requests answered with a 503. Defaults to 0",
+        },
+        "throttle_rate": {
+            "description": "Fraction of requests answered with a 429. Defaults to 0",
+        },
+        "output": {
+            "description": "Path of a JSON file to write the results to",
+        },
+        "baseline": {
+            "description": "Path of a JSON results file from an earlier run to compare against",
+        },
+        "max_regression": {
+            "description": "Allowed fractional increase in median wall time over the baseline. Defaults to 0.25",
+        },
+    }
+
+    # Initialize the task options
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        self.tasks = process_list_arg(self.options.get("tasks")) or DEFAULT_TASKS
+        self.flows = process_list_arg(self.options.get("flows")) or DEFAULT_FLOWS
+        self.iterations = int(self.options.get("iterations") or 3)
+        self.max_regression = float(self.options.get("max_regression") or 0.25)
+
+    # Start the stand-in org, run every target the requested number of times and report the results
+    def _run_task(self):
+        org = MockOrg(
+            latency=float(self.options.get("latency") or 0.05),
+            error_rate=float(self.options.get("error_rate") or 0),
+            throttle_rate=float(self.options.get("throttle_rate") or 0),
+        )
+        recorder.reset()
+        add_request_hook(recorder.record)
+        try:
+            with MockOrgServer(org) as server:
+                self.overrides = {"instance_url": server.url, "access_token": "mock-access-token"}
+                self.mock_org_config = OrgConfig(dict(self.overrides), "mock")
+                targets = [("task", name) for name in self.tasks] + [("flow", name) for name in self.flows]
+                runs = []
+                for kind, name in targets:
+                    for iteration in range(self.iterations):
+                        runs.append(self._measure(org, kind, name, iteration))
+        finally:
+            remove_request_hook(recorder.record)
+
+        summary = self._summarize(runs)
+        self.return_values = {"runs": runs, "summary": summary, "http": recorder.summary()}
+        self._log_summary(summary)
+        if self.options.get("output"):
+            with open(self.options["output"], "w") as f:
+                json.dump(self.return_values, f, indent=2)
+        if self.options.get("baseline"):
+            self._compare_to_baseline(summary)
+        failed = [f"{run['kind']}:{run['name']} run {run['iteration'] + 1}: {run['error']}" for run in runs if run["error"]]
+        if failed:
+            raise CumulusCIException(f"{len(failed)} benchmark runs failed: " + "; ".join(failed))
+
+    # Run one target against a freshly reset org and collect its measurements
+    def _measure(self, org, kind, name, iteration):
+        org.reset()
+        clear_definition_listings()
+        shutil.rmtree(state_dir(self.project_config, org_key(self.mock_org_config)), ignore_errors=True)
+        start = time.perf_counter()
+        error = None
+        try:
+            if kind == "task":
+                self._run_named_task(name, {})
+            else:
+                for task_name, options in self._flow_steps(name):
+                    self._run_named_task(task_name, options)
+        except Exception as e:
+            error = str(e)
+        wall = time.perf_counter() - start
+        stats = org.snapshot()
+        return {
+            "kind": kind,
+            "name": name,
+            "iteration": iteration,
+            "wall": wall,
+            "requests": stats["requests"],
+            "bytes_in": stats["bytes_in"],
+            "bytes_out": stats["bytes_out"],
+            "errors": stats["errors"],
+            "throttled": stats["throttled"],
+            "endpoints": stats["endpoints"],
+            "error": error,
+        }
+
+    # Instantiate and run a task from cumulusci.yml, pointed at the stand-in org
+    def _run_named_task(self, name, step_options):
+        task_config = self.project_config.get_task(name)
+        config = dict(task_config.config)
+        config["options"] = {**(task_config.options or {}), **step_options, **self.overrides}
+        task_class = import_global(task_config.class_path)
+        task_class(self.project_config, TaskConfig(config), self.mock_org_config)()
+
+    # Expand a flow into its (task, options) steps in order, descending into sub-flows
+    def _flow_steps(self, flow_name):
+        flow_config = self.project_config.get_flow(flow_name)
+        for _, step in sorted(flow_config.steps.items(), key=lambda item: float(item[0])):
+            if step.get("flow"):
+                yield from self._flow_steps(step["flow"])
+            elif step.get("task") and step["task"] != "None":
+                yield step["task"], step.get("options") or {}
+
+    # Median wall time and round trips per target over its successful runs; a run that failed says nothing
+    # about the target's speed, so it only counts toward failures
+    def _summarize(self, runs):
+        summary = {}
+        for run in runs:
+            summary.setdefault(f"{run['kind']}:{run['name']}", []).append(run)
+        results = {}
+        for target, target_runs in summary.items():
+            passed = [run for run in target_runs if not run["error"]]
+            results[target] = {
+                "wall_median": statistics.median(run["wall"] for run in passed) if passed else None,
+                "wall_min": min(run["wall"] for run in passed) if passed else None,
+                "requests": statistics.median(run["requests"] for run in passed) if passed else None,
+                "bytes": statistics.median(run["bytes_in"] + run["bytes_out"] for run in passed) if passed else None,
+                "failures": len(target_runs) - len(passed),
+            }
+        return results
+
+    def _log_summary(self, summary):
+        self.logger.info(f"{'Target':<45} {'Median s':>9} {'Min s':>8} {'Calls':>6} {'Bytes':>9} {'Failed':>6}")
+        for target, row in summary.items():
+            if row["wall_median"] is None:
+                self.logger.info(f"{target:<45} {'-':>9} {'-':>8} {'-':>6} {'-':>9} {row['failures']:>6}")
+                continue
+            self.logger.info(
+                f"{target:<45} {row['wall_median']:>9.3f} {row['wall_min']:>8.3f} "
+                f"{row['requests']:>6.0f} {row['bytes']:>9.0f} {row['failures']:>6}"
+            )
+
+    # Fail when a target failed any run, or got slower or chattier than the saved baseline allows
+    def _compare_to_baseline(self, summary):
+        with open(self.options["baseline"]) as f:
+            baseline = json.load(f)["summary"]
+        regressions = []
+        for target, row in summary.items():
+            before = baseline.get(target)
+            if not before:
+                continue
+            if row["failures"]:
+                regressions.append(f"{target} failed {row['failures']} of {self.iterations} runs")
+            if row["wall_median"] is None or before.get("wall_median") is None:
+                continue
+            if row["wall_median"] > before["wall_median"] * (1 + self.max_regression):
+                regressions.append(
+                    f"{target} wall time {before['wall_median']:.3f}s -> {row['wall_median']:.3f}s"
+                )
+            if row["requests"] > before["requests"]:
+                regressions.append(f"{target} round trips {before['requests']:.0f} -> {row['requests']:.0f}")
+        if regressions:
+            raise CumulusCIException("Benchmark regressions: " + "; ".join(regressions))
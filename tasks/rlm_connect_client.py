@@ -0,0 +1,423 @@
+import os
+import random
+import re
+import threading
+import time
+
+import requests
+from cumulusci.core.exceptions import CumulusCIException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tasks.rlm_http_metrics import recorder, report_at_exit
+from tasks.rlm_org_state import org_key
+from tasks.rlm_response_cache import ResponseCache
+
+# Default client settings, overridable per project under project -> custom -> connect_client in cumulusci.yml
+DEFAULT_SETTINGS = {
+    "pool_size": 10,
+    "connect_timeout": 10,
+    "read_timeout": 120,
+    "max_retries": 3,
+    "backoff_factor": 0.5,
+    "metrics_path": None,
+    "max_concurrency": 10,
+    "min_api_headroom": 0,
+    "cache_ttl": 600,
+    "cache_max_bytes": 20000000,
+}
+
+# Environment variable that enables the HTTP metrics report without editing cumulusci.yml
+METRICS_PATH_ENV = "RLM_HTTP_METRICS"
+
+# Server errors that are retried by the shared session before a task sees them
+RETRY_STATUS_CODES = (500, 502, 504)
+
+# Methods that are safe to replay after a server error
+IDEMPOTENT_METHODS = frozenset(["DELETE", "GET", "HEAD", "OPTIONS", "PUT"])
+
+# Responses that mean the org wants fewer concurrent requests; ConnectClient.send retries them itself, 429 for any
+# method and 503 only for idempotent ones
+THROTTLE_STATUS_CODES = (429, 503)
+
+# Daily API usage the org reports on every REST response, e.g. "api-usage=2451/15000"
+LIMIT_INFO_PATTERN = re.compile(r"api-usage=(\d+)/(\d+)")
+
+# Callables notified after every request with
+# (method, url, status, latency, request_bytes, response_bytes, retries); status is 0 when no response arrived.
+# The metrics recorder keeps every sample, so it is only registered while a metrics report is asked for.
+_request_hooks = []
+
+# Sessions are shared by every task running in the same process (e.g. all steps of a `cci flow run`)
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Concurrency limiters and the last reported daily API usage, per org (instance URL)
+_limiters = {}
+_api_usage = {}
+_org_state_lock = threading.Lock()
+
+
+# Raised instead of sending a request once the org's remaining daily API requests fall below min_api_headroom
+class ApiHeadroomExceeded(CumulusCIException):
+    pass
+
+
+# Retry policy that replays server errors only for idempotent methods, so a POST that the server may already
+# have applied is never sent twice. Throttled responses are not retried here but by ConnectClient.send, which
+# waits out their Retry-After without holding a slot of the org's concurrency limit.
+class ConnectRetry(Retry):
+
+    # Exponential backoff with jitter, so requests throttled together do not all retry at the same moment
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(backoff / 2, backoff) if backoff else 0
+
+
+# AdaptiveLimiter bounds the requests in flight to one org. The bound grows by one for every bound's worth of
+# successful requests and halves whenever the org throttles (additive increase, multiplicative decrease). A
+# throttled request also pauses new requests, its own retry included, for its Retry-After, or for a jittered
+# backoff that grows with consecutive throttles when it has none.
+class AdaptiveLimiter:
+
+    MAX_PAUSE = 30
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0
+        self.throttled = 0
+        self.consecutive_throttles = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause <= 0 and self.in_flight < int(self.limit):
+                    break
+                self.condition.wait(timeout=pause if pause > 0 else None)
+            self.in_flight += 1
+
+    # Give back a slot; throttled halves the bound and holds new requests back
+    def release(self, throttled=False, retry_after=None):
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.consecutive_throttles += 1
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.consecutive_throttles = 0
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            if throttled:
+                delay = retry_after or random.uniform(0.5, 1.0) * min(
+                    self.MAX_PAUSE, 0.25 * 2 ** min(self.consecutive_throttles, 8)
+                )
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self.condition.notify_all()
+
+
+# The shared limiter of an org
+def get_limiter(instance_url, max_concurrency):
+    with _org_state_lock:
+        limiter = _limiters.get(instance_url)
+        if limiter is None:
+            limiter = _limiters[instance_url] = AdaptiveLimiter(max_concurrency)
+        return limiter
+
+
+# Daily API requests used and allowed in an org as last reported by Sforce-Limit-Info, or None before the
+# first response; remaining is the headroom a flow can check before starting a heavy step
+def api_headroom(instance_url):
+    with _org_state_lock:
+        usage = _api_usage.get(instance_url.rstrip("/"))
+    if usage is None:
+        return None
+    used, limit = usage
+    return {"used": used, "limit": limit, "remaining": limit - used, "fraction": (limit - used) / limit if limit else 0}
+
+
+def _record_api_usage(instance_url, response):
+    match = LIMIT_INFO_PATTERN.search(response.headers.get("Sforce-Limit-Info") or "")
+    if match:
+        with _org_state_lock:
+            _api_usage[instance_url] = (int(match.group(1)), int(match.group(2)))
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After") or 0)
+    except ValueError:
+        return 0
+
+
+# Resolve client settings from defaults overlaid with any project-level overrides
+def resolve_settings(project_config=None, overrides=None):
+    settings = dict(DEFAULT_SETTINGS)
+    if project_config is not None:
+        settings.update(project_config.project__custom__connect_client or {})
+    settings.update(overrides or {})
+    return settings
+
+
+# Return the keep-alive session for the given settings, creating and mounting its connection pool once
+def get_session(settings):
+    key = (
+        int(settings["pool_size"]),
+        int(settings["max_retries"]),
+        float(settings["backoff_factor"]),
+    )
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            pool_size, max_retries, backoff_factor = key
+            retry = ConnectRetry(
+                total=max_retries,
+                connect=max_retries,
+                read=max_retries,
+                status=max_retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=RETRY_STATUS_CODES,
+                allowed_methods=IDEMPOTENT_METHODS,
+                raise_on_status=False,
+                respect_retry_after_header=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+            )
+            session = requests.Session()
+            session.headers["Accept-Encoding"] = "gzip, deflate"
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[key] = session
+        return session
+
+
+# Register an additional request hook, e.g. for tracing
+def add_request_hook(hook):
+    if hook not in _request_hooks:
+        _request_hooks.append(hook)
+
+
+def remove_request_hook(hook):
+    if hook in _request_hooks:
+        _request_hooks.remove(hook)
+
+
+# Render values as a quoted, escaped SOQL list for use in an IN (...) clause
+def soql_in(values):
+    quoted = (
+        "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'" for value in values
+    )
+    return f"({', '.join(quoted)})"
+
+
+# Close every pooled session, e.g. at interpreter shutdown or between isolated benchmark runs
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+# ConnectClient wraps the shared session with the URL, header and error handling used by the RLM tasks
+class ConnectClient:
+
+    def __init__(self, instance_url, access_token, api_version, logger, settings=None, cache=None):
+        self.instance_url = instance_url.rstrip("/")
+        self.access_token = access_token
+        self.api_version = api_version
+        self.logger = logger
+        self.settings = settings or dict(DEFAULT_SETTINGS)
+        self.timeout = (
+            float(self.settings["connect_timeout"]),
+            float(self.settings["read_timeout"]),
+        )
+        self.session = get_session(self.settings)
+        self.limiter = get_limiter(self.instance_url, self.settings["max_concurrency"])
+        self.max_retries = int(self.settings["max_retries"])
+        self.min_api_headroom = float(self.settings.get("min_api_headroom") or 0)
+        self.cache = cache
+        metrics_path = os.environ.get(METRICS_PATH_ENV) or self.settings.get("metrics_path")
+        if metrics_path:
+            add_request_hook(recorder.record)
+            report_at_exit(metrics_path)
+
+    # Build a client from a task whose runtime (access token and instance URL) has been prepared, with the
+    # org's response cache unless cache_max_bytes is 0
+    @classmethod
+    def from_task(cls, task, **overrides):
+        settings = resolve_settings(task.project_config, overrides)
+        api_version = task.project_config.project__package__api_version
+        cache = None
+        if int(settings.get("cache_max_bytes") or 0) > 0 and task.org_config is not None:
+            org = org_key(task.org_config, task.instance_url)
+            cache = ResponseCache.for_org(task.project_config, org, api_version, settings)
+        return cls(task.instance_url, task.access_token, api_version, task.logger, settings, cache)
+
+    # Path of an endpoint relative to the instance, as used by composite subrequests
+    def build_path(self, endpoint):
+        return f"/services/data/v{self.api_version}/{endpoint}"
+
+    # Full URL of a REST or Connect API endpoint
+    def build_url(self, endpoint):
+        return f"{self.instance_url}{self.build_path(endpoint)}"
+
+    # Headers sent with every request
+    def build_headers(self):
+        return {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json",
+        }
+
+    # Make an HTTP request through the pooled session and return the decoded body, or None on failure. With
+    # cache set, a GET is answered from the org's response cache when possible; cache="revalidate" always
+    # confirms the cached response with the org, for resources that change outside of these tasks.
+    def request(self, method, url, cache=False, **kwargs):
+        if cache and self.cache is not None and method.lower() == "get":
+            return self._cached_get(url, revalidate=cache == "revalidate", **kwargs)
+        response = self.send(method, url, **kwargs)
+        if response.ok:
+            return response.json() if response.content else {}
+        self.logger.error(f"Failed {method.upper()} request to {url}: {response.text}")
+        return None
+
+    # Send a request through the pooled session within the org's concurrency limit, notify the request hooks
+    # and return the raw response. A throttled request gives its slot back before waiting out the org's
+    # Retry-After, which the limiter applies to every request to the org, and is then sent again.
+    def send(self, method, url, **kwargs):
+        self._check_headroom(url)
+        kwargs["headers"] = kwargs.get("headers") or self.build_headers()
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        throttles = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException:
+                self.limiter.release()
+                self._notify(method, url, 0, time.perf_counter() - start, 0, 0, throttles)
+                raise
+            throttled = response.status_code in THROTTLE_STATUS_CODES
+            self.limiter.release(throttled, _retry_after(response) if throttled else None)
+            if not throttled:
+                break
+            self.logger.debug(f"Throttled by the org, now at most {int(self.limiter.limit)} requests in flight")
+            retryable = response.status_code == 429 or method.upper() in IDEMPOTENT_METHODS
+            if not retryable or throttles >= self.max_retries:
+                break
+            throttles += 1
+        _record_api_usage(self.instance_url, response)
+        if self.cache is not None and method.upper() not in ("GET", "HEAD"):
+            self.cache.invalidate(url)
+        body = response.request.body or b""
+        retries = getattr(response.raw, "retries", None)
+        self._notify(
+            method,
+            url,
+            response.status_code,
+            time.perf_counter() - start,
+            len(body.encode() if isinstance(body, str) else body),
+            len(response.content),
+            throttles + (len(retries.history) if retries is not None else 0),
+        )
+        return response
+
+    # GET through the response cache: fresh entries are returned without a request, entries with validators are
+    # revalidated with a conditional GET and anything else is fetched and stored
+    def _cached_get(self, url, revalidate=False, **kwargs):
+        params = kwargs.get("params")
+        entry = self.cache.get(url, params)
+        if entry and self.cache.fresh(entry, revalidate):
+            self.logger.debug(f"Using the cached response of {url}")
+            return entry["body"]
+        kwargs["headers"] = {
+            **(kwargs.get("headers") or self.build_headers()),
+            **(self.cache.validators(entry, revalidate) if entry else {}),
+        }
+        response = self.send("get", url, **kwargs)
+        if response.status_code == 304 and entry:
+            self.cache.revalidated(url, params, entry)
+            return entry["body"]
+        if response.ok:
+            body = response.json() if response.content else {}
+            self.cache.put(url, params, response, body)
+            return body
+        self.logger.error(f"Failed GET request to {url}: {response.text}")
+        return None
+
+    # Refuse to send once the org is closer to its daily API limit than min_api_headroom allows; the limits
+    # resource itself stays reachable so a flow can wait for headroom to come back
+    def _check_headroom(self, url):
+        if not self.min_api_headroom or url == self.build_url("limits"):
+            return
+        headroom = api_headroom(self.instance_url)
+        if headroom and headroom["fraction"] < self.min_api_headroom:
+            raise ApiHeadroomExceeded(
+                f"Only {headroom['remaining']} of {headroom['limit']} daily API requests remain in {self.instance_url}, "
+                f"below the configured headroom of {self.min_api_headroom:.0%}"
+            )
+
+    # Daily API usage of the org, refreshed from the limits resource when refresh is set or nothing is known yet
+    def api_headroom(self, refresh=False):
+        if refresh or api_headroom(self.instance_url) is None:
+            limits = self.request("get", self.build_url("limits"))
+            daily = (limits or {}).get("DailyApiRequests")
+            if daily:
+                with _org_state_lock:
+                    _api_usage[self.instance_url] = (daily["Max"] - daily["Remaining"], daily["Max"])
+        return api_headroom(self.instance_url)
+
+    def _notify(self, *sample):
+        for hook in list(_request_hooks):
+            try:
+                hook(*sample)
+            except Exception as e:
+                self.logger.debug(f"Request hook {hook} failed: {e}")
+
+    # Run a SOQL query and return every record, following nextRecordsUrl; returns None on failure
+    def query(self, soql):
+        response = self.request("get", self.build_url("query"), params={"q": soql})
+        if response is None:
+            return None
+        records = response.get("records", [])
+        while not response.get("done", True) and response.get("nextRecordsUrl"):
+            response = self.request("get", f"{self.instance_url}{response['nextRecordsUrl']}")
+            if response is None:
+                return None
+            records.extend(response.get("records", []))
+        return records
+
+    # Run a SOQL COUNT() query and return the count, or None on failure
+    def query_count(self, soql):
+        response = self.request("get", self.build_url("query"), params={"q": soql})
+        return None if response is None else response.get("totalSize", 0)
+
+    # Describe one subrequest of a composite request; later subrequests may use @{referenceId.field}
+    def subrequest(self, method, endpoint, reference_id, body=None):
+        subrequest = {
+            "method": method.upper(),
+            "url": self.build_path(endpoint),
+            "referenceId": reference_id,
+        }
+        if body is not None:
+            subrequest["body"] = body
+        return subrequest
+
+    # Send subrequests as a single /composite round trip and return their responses keyed by referenceId,
+    # or None when the composite request itself is rejected
+    def composite(self, subrequests, all_or_none=False):
+        response = self.request(
+            "post",
+            self.build_url("composite"),
+            json={"allOrNone": all_or_none, "compositeRequest": subrequests},
+        )
+        if response is None:
+            return None
+        return {
+            subresponse["referenceId"]: subresponse
+            for subresponse in response.get("compositeResponse", [])
+        }
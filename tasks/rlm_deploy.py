@@ -0,0 +1,280 @@
+import base64
+import hashlib
+import io
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+import zipfile
+
+import yaml
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+from cumulusci.core.source_transforms.transforms import FindReplaceTransform, FindReplaceTransformOptions
+from cumulusci.core.utils import process_bool_arg
+from cumulusci.tasks.metadata import package as metadata_package
+from cumulusci.tasks.salesforce import Deploy
+
+from tasks.rlm_connect_client import ConnectClient, soql_in
+from tasks.rlm_org_state import load_state, org_key, save_state, state_path
+
+# Placeholders for record IDs in the metadata source, e.g. __ATTRIBUTEPasID__
+DEFAULT_TOKEN_PATTERN = r"__\w+PasID__"
+
+# Package folders whose components are whole directories rather than single files
+BUNDLE_DIRECTORIES = {"aura", "experiences", "lwc", "staticresources", "waveTemplates"}
+
+METADATA_NAMESPACE = "http://soap.sforce.com/2006/04/metadata"
+
+# Record IDs resolved per (org, object, field, value), shared by every deploy in the same flow run
+_record_ids = {}
+_record_ids_lock = threading.Lock()
+
+
+def clear_record_ids():
+    with _record_ids_lock:
+        _record_ids.clear()
+
+
+# Set of the placeholders matching pattern that appear in any file below path
+def find_tokens(path, pattern):
+    pattern = re.compile(pattern.encode())
+    found = set()
+    for root, _, names in os.walk(path):
+        for name in names:
+            with open(os.path.join(root, name), "rb") as f:
+                found.update(token.decode() for token in pattern.findall(f.read()))
+    return found
+
+
+# Component a file of a metadata API package belongs to, e.g. "classes/Foo" for classes/Foo.cls-meta.xml and
+# "lwc/foo" for lwc/foo/foo.js; None for package.xml
+def component_key(name):
+    parts = name.split("/")
+    if len(parts) < 2:
+        return None
+    if parts[0] in BUNDLE_DIRECTORIES and len(parts) > 2:
+        return f"{parts[0]}/{parts[1]}"
+    leaf = parts[-1]
+    if leaf.endswith("-meta.xml"):
+        leaf = leaf[: -len("-meta.xml")]
+    return "/".join(parts[:-1] + [leaf.rsplit(".", 1)[0]])
+
+
+# Content hash of every component of a package, over all of its files
+def component_hashes(zf):
+    digests = {}
+    for name in sorted(zf.namelist()):
+        key = component_key(name)
+        if key is None or name.endswith("/"):
+            continue
+        digest = digests.setdefault(key, hashlib.sha256())
+        digest.update(name.encode())
+        digest.update(zf.read(name))
+    return {key: digest.hexdigest()[:16] for key, digest in digests.items()}
+
+
+# Components of the package that mention any of the given components by name
+def dependent_components(zf, components):
+    names = {key.rsplit("/", 1)[-1] for key in components}
+    pattern = re.compile(
+        rb"(?<![\w])(" + b"|".join(re.escape(name.encode()) for name in sorted(names, key=len, reverse=True)) + rb")(?![\w])"
+    )
+    dependents = set()
+    for name in zf.namelist():
+        key = component_key(name)
+        if key and key not in components and key not in dependents and pattern.search(zf.read(name)):
+            dependents.add(key)
+    return dependents
+
+
+# Metadata types keyed by the package folders they are stored in, from CumulusCI's metadata map
+def type_directories():
+    with open(os.path.join(os.path.dirname(metadata_package.__file__), "metadata_map.yml")) as f:
+        metadata_map = yaml.safe_load(f)
+    directories = {}
+    for directory, parsers in metadata_map.items():
+        for parser in parsers:
+            directories.setdefault(parser["type"], set()).add(directory)
+    return directories
+
+
+# Rewrite package.xml to list only the members of the kept components; child members such as
+# CustomField Account.Foo__c are kept with their parent component
+def filter_package_xml(package_xml, components):
+    ET.register_namespace("", METADATA_NAMESPACE)
+    ns = {"md": METADATA_NAMESPACE}
+    root = ET.fromstring(package_xml)
+    directories = type_directories()
+    kept = [key.rsplit("/", 1) if "/" in key else ("", key) for key in components]
+    for types in root.findall("md:types", ns):
+        type_name = types.find("md:name", ns).text
+        type_dirs = directories.get(type_name)
+        for member in types.findall("md:members", ns):
+            keep = any(
+                (type_dirs is None or folder.split("/")[0] in type_dirs)
+                and (member.text == name or member.text.startswith(name + ".") or member.text.endswith("/" + name))
+                for folder, name in kept
+            )
+            if not keep:
+                types.remove(member)
+        if types.find("md:members", ns) is None:
+            root.remove(types)
+    return b'<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root)
+
+
+# Copy of a package with only the files of the given components and a matching package.xml
+def filter_package(zf, components):
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as filtered:
+        for name in zf.namelist():
+            if name == "package.xml":
+                filtered.writestr(name, filter_package_xml(zf.read(name), components))
+            elif component_key(name) in components:
+                filtered.writestr(name, zf.read(name))
+    return output.getvalue()
+
+
+# DeployWithRecordIds replaces record ID placeholders in the metadata before deploying it. Only placeholders
+# that actually occur below the deploy path are resolved, with one query per object, and the IDs are cached
+# for the rest of the flow; a placeholder that cannot be resolved fails the task before anything is packaged.
+class DeployWithRecordIds(Deploy):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        **Deploy.task_options,
+        "record_ids": {
+            "description": "List of placeholder groups, each with an sobject, the field to match on (defaults to "
+            "Name) and a map of placeholder to field value, e.g. __ATTRIBUTEPasID__: Standard Attribute Based Adjustment",
+        },
+        "token_pattern": {
+            "description": f"Regular expression of the placeholders that must be resolved. Defaults to {DEFAULT_TOKEN_PATTERN}",
+        },
+    }
+
+    # Initialize the task options and check the placeholder groups
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.token_pattern = self.options.get("token_pattern") or DEFAULT_TOKEN_PATTERN
+        self.record_id_groups = []
+        for group in self.options.get("record_ids") or []:
+            if not group.get("sobject") or not group.get("tokens"):
+                raise TaskOptionsError(f"Each record_ids entry needs an sobject and tokens: {group}")
+            self.record_id_groups.append(
+                {"sobject": group["sobject"], "field": group.get("field") or "Name", "tokens": dict(group["tokens"])}
+            )
+
+    # Prepare runtime by setting up access token, instance URL and the shared Connect API client
+    def _prep_runtime(self):
+        self.access_token = self.options.get("access_token", self.org_config.access_token)
+        self.instance_url = self.options.get("instance_url", self.org_config.instance_url)
+        self.client = ConnectClient.from_task(self)
+
+    # Resolve the placeholders, add them as find_replace transforms and deploy
+    def _run_task(self):
+        replacements = self._resolve_record_ids()
+        if replacements:
+            transform = FindReplaceTransform(
+                FindReplaceTransformOptions.parse_obj(
+                    {"patterns": [{"find": token, "replace": record_id} for token, record_id in replacements.items()]}
+                )
+            )
+            self.transforms = list(self.transforms or []) + [transform]
+        return super()._run_task()
+
+    # Map of placeholder to record ID for every placeholder found below the deploy path
+    def _resolve_record_ids(self):
+        path = self.options.get("path")
+        if not path or not os.path.exists(path):
+            return {}
+        found = find_tokens(path, self.token_pattern)
+        if not found:
+            return {}
+        self._prep_runtime()
+        org = org_key(self.org_config, self.instance_url)
+        replacements = {}
+        for group in self.record_id_groups:
+            tokens = {token: value for token, value in group["tokens"].items() if token in found}
+            if tokens:
+                ids = self._record_ids(org, group["sobject"], group["field"], set(tokens.values()))
+                replacements.update({token: ids[value] for token, value in tokens.items() if value in ids})
+        unresolved = sorted(found - set(replacements))
+        if unresolved:
+            raise CumulusCIException(f"Could not resolve record ID placeholders in {path}: {', '.join(unresolved)}")
+        self.logger.info(f"Resolved {len(replacements)} record ID placeholders")
+        return replacements
+
+    # Record IDs of the records whose field matches one of values, from the cache or a single query
+    def _record_ids(self, org, sobject, field, values):
+        with _record_ids_lock:
+            ids = {value: _record_ids[key] for value in values if (key := (org, sobject, field, value)) in _record_ids}
+        missing = sorted(values - set(ids))
+        if not missing:
+            return ids
+        records = self.client.query(f"SELECT Id, {field} FROM {sobject} WHERE {field} IN {soql_in(missing)}")
+        if records is None:
+            raise CumulusCIException(f"Could not query {sobject} records to resolve record ID placeholders")
+        matches = {}
+        for record in records:
+            matches.setdefault(record[field], []).append(record["Id"])
+        duplicates = sorted(value for value, record_ids in matches.items() if len(record_ids) > 1)
+        if duplicates:
+            raise CumulusCIException(f"More than one {sobject} record has {field} {', '.join(duplicates)}")
+        with _record_ids_lock:
+            for value, record_ids in matches.items():
+                _record_ids[(org, sobject, field, value)] = ids[value] = record_ids[0]
+        return ids
+
+
+# IncrementalDeploy deploys only the components whose content (after transforms) changed since the last
+# successful deploy of the same path to the org, plus the components that reference them. The component hashes
+# of that deploy are kept per org; with incremental turned off the whole package is deployed and the hashes
+# are recorded again.
+class IncrementalDeploy(DeployWithRecordIds):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        **DeployWithRecordIds.task_options,
+        "incremental": {
+            "description": "Deploy only the components changed since the last deploy of this path to the org. Defaults to False",
+        },
+    }
+
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.incremental = process_bool_arg(self.options.get("incremental") or False)
+        self.deployed_hashes = None
+
+    # Deploy, then record the component hashes once the deploy has succeeded
+    def _run_task(self):
+        result = super()._run_task()
+        if self.deployed_hashes is not None and not self.check_only:
+            save_state(self._manifest_path(), {"path": self.options.get("path"), "components": self.deployed_hashes})
+        return result
+
+    def _manifest_path(self):
+        path = re.sub(r"[^\w.-]", "_", os.path.normpath(self.options.get("path")))
+        return state_path(self.project_config, org_key(self.org_config), "deploys", path)
+
+    # Build the full package, then narrow it to the changed components and their dependents
+    def _get_package_zip(self, path):
+        package_zip = super()._get_package_zip(path)
+        if not isinstance(package_zip, str):
+            return package_zip
+        zf = zipfile.ZipFile(io.BytesIO(base64.b64decode(package_zip)))
+        self.deployed_hashes = component_hashes(zf)
+        if not self.incremental:
+            return package_zip
+
+        previous = load_state(self._manifest_path()).get("components", {})
+        changed = {key for key, digest in self.deployed_hashes.items() if previous.get(key) != digest}
+        if not changed:
+            self.logger.info("No components changed since the last deploy")
+            return None
+        selected = changed | dependent_components(zf, changed)
+        if len(selected) == len(self.deployed_hashes):
+            return package_zip
+        self.logger.info(
+            f"Deploying {len(selected)} of {len(self.deployed_hashes)} components "
+            f"({len(changed)} changed): {', '.join(sorted(selected))}"
+        )
+        return base64.b64encode(filter_package(zf, selected)).decode()
@@ -0,0 +1,120 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cumulusci.core.config import TaskConfig
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+from tasks.rlm_extend_stdctx import ExtendStandardContext
+from tasks.rlm_org_state import refreshed_org_config
+
+DEFAULT_START_DATE = "2024-01-01T00:00:00.000Z"
+DEFAULT_MAX_WORKERS = 4
+
+
+# ExtendStandardContexts runs the create -> map -> activate chain of several independent
+# context definitions concurrently, one ExtendStandardContext per context spec. The org's token is refreshed
+# once, when this task starts, and every chain gets it through its access_token and instance_url options and a
+# snapshot of the refreshed org config, so the chains never refresh or save the org config from their threads.
+class ExtendStandardContexts(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "access_token": {
+            "description": "The access token for the org. Defaults to the project default",
+        },
+        "contexts": {
+            "description": "List of context specs, each with name, baseReference, mappingName and contextTtl "
+            "(description, developerName, startDate, composite and reconcile are optional)",
+            "required": True,
+        },
+        "composite": {
+            "description": "Batch each chain through the Composite API (see ExtendStandardContext). Defaults to False",
+        },
+        "reconcile": {
+            "description": "Reconcile existing context definitions instead of creating new ones (see ExtendStandardContext). "
+            "Defaults to False",
+        },
+        "max_workers": {
+            "description": f"Maximum number of context chains to run at once. Defaults to {DEFAULT_MAX_WORKERS}",
+        },
+    }
+
+    # Initialize the task options, filling in defaults for each context spec
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        contexts = self.options.get("contexts") or []
+        if not isinstance(contexts, list):
+            raise TaskOptionsError("contexts must be a list of context specs")
+        self.contexts = [self._context_options(spec) for spec in contexts]
+        self.max_workers = int(self.options.get("max_workers") or DEFAULT_MAX_WORKERS)
+
+    # Expand one context spec into the options of an ExtendStandardContext task
+    def _context_options(self, spec):
+        missing = [key for key in ("name", "baseReference", "mappingName", "contextTtl") if key not in spec]
+        if missing:
+            raise TaskOptionsError(f"Context spec {spec} is missing {', '.join(missing)}")
+        options = {
+            "name": spec["name"],
+            "description": spec.get("description", f"Extension of {spec['baseReference']}"),
+            "developerName": spec.get("developerName", spec["name"]),
+            "baseReference": spec["baseReference"],
+            "startDate": spec.get("startDate", DEFAULT_START_DATE),
+            "contextTtl": spec["contextTtl"],
+            "mappingName": spec["mappingName"],
+        }
+        for key in ("access_token", "instance_url", "composite", "reconcile"):
+            if key in spec or self.options.get(key) is not None:
+                options[key] = spec.get(key, self.options.get(key))
+        return options
+
+    # Refresh the org's token once, on the main thread, before any chain starts; a token passed in the
+    # access_token option is used as given
+    def _update_credentials(self):
+        if self.options.get("access_token"):
+            return
+        with self.org_config.save_if_changed():
+            self.org_config.refresh_oauth_token(self.project_config.keychain)
+
+    # Execute every context chain on a bounded worker pool and report each one separately
+    def _run_task(self):
+        credentials = {
+            "access_token": self.options.get("access_token", self.org_config.access_token),
+            "instance_url": self.options.get("instance_url", self.org_config.instance_url),
+        }
+        org_config = refreshed_org_config(self.org_config)
+        tasks = [
+            ExtendStandardContext(self.project_config, TaskConfig({"options": {**credentials, **options}}), org_config)
+            for options in self.contexts
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._run_context, tasks))
+
+        self.return_values = {"contexts": results}
+        for result in results:
+            self.logger.info(
+                f"{result['name']}: {result['status']} in {result['elapsed']:.2f}s"
+                + (f" ({result['error']})" if result["error"] else "")
+            )
+        failed = [result["name"] for result in results if result["status"] != "Success"]
+        if failed:
+            raise CumulusCIException(f"Failed to extend context definitions: {', '.join(failed)}")
+
+    # Run a single context chain and capture its outcome instead of letting it abort the others
+    def _run_context(self, task):
+        name = task.options["developerName"]
+        start = time.monotonic()
+        error = None
+        try:
+            task()
+            status = "Success" if task.return_values.get("isActive") else "Failed"
+        except Exception as e:
+            status, error = "Failed", str(e)
+        return {
+            "name": name,
+            "status": status,
+            "elapsed": time.monotonic() - start,
+            "error": error,
+            **{key: value for key, value in task.return_values.items() if key != "isActive"},
+        }
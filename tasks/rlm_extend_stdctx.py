@@ -1,10 +1,30 @@
+import threading
 from abc import abstractmethod
 
-import requests
-
+from cumulusci.core.exceptions import CumulusCIException
 from cumulusci.core.keychain import BaseProjectKeychain
+from cumulusci.core.utils import process_bool_arg
 from cumulusci.tasks.sfdx import SFDXBaseTask
 
+from tasks.rlm_connect_client import ConnectClient
+
+# Existing context definitions keyed by developer name, listed once per org (instance URL) and shared
+# by every reconciling task in the process; definitions the tasks create are added as they are created
+_definition_listings = {}
+_definition_listings_lock = threading.Lock()
+
+
+# Context definitions of a connect/context-definitions listing response, under whichever key the API version
+# returns them
+def listed_context_definitions(response):
+    return response.get("contextDefinitionList") or response.get("contextDefinitions") or []
+
+
+# Forget the cached context definition listings, e.g. after the org was reset outside of these tasks
+def clear_definition_listings():
+    with _definition_listings_lock:
+        _definition_listings.clear()
+
 
 # ExtendStandardContext is a custom task that extends the SFDXBaseTask provided by CumulusCI.
 class ExtendStandardContext(SFDXBaseTask):
@@ -37,7 +57,18 @@ class ExtendStandardContext(SFDXBaseTask):
         "contextTtl": {
             "description": "The time-to-live (TTL) of the context definition",
             "required": True, 
-        }
+        },
+        "mappingName": {
+            "description": "The name of the context mapping to mark as default. Defaults to SalesTransaction",
+        },
+        "composite": {
+            "description": "Batch the call chain through the Composite API, falling back to separate calls "
+            "when it is not available. Defaults to False",
+        },
+        "reconcile": {
+            "description": "Reuse an existing context definition with the same developer name and only send the "
+            "updates needed to make its default mapping and active state match. Defaults to False",
+        },
     }
 
     # Initialize the task options and environment variables
@@ -65,16 +96,21 @@ class ExtendStandardContext(SFDXBaseTask):
         self.instance_url = self.options.get(
             "instance_url", self.org_config.instance_url
         )
+        self.client = ConnectClient.from_task(self)
 
     # Execute the task after preparation, where the core functionality will be implemented
     def _run_task(self):
         self._prep_runtime()
-        self._extend_context_definition()
+        if process_bool_arg(self.options.get("reconcile") or False):
+            self._reconcile_context_definition()
+        elif process_bool_arg(self.options.get("composite") or False):
+            self._extend_context_definition_composite()
+        else:
+            self._extend_context_definition()
 
-    # Core logic to extend an existing context definition
-    def _extend_context_definition(self):
-        url, headers = self._build_url_and_headers("connect/context-definitions")
-        payload = {
+    # Payload of the new context definition built from the task options
+    def _context_definition_payload(self):
+        return {
             "name": self.options.get("name"),
             "description": self.options.get("description"),
             "developerName": self.options.get("developerName"),
@@ -82,11 +118,17 @@ class ExtendStandardContext(SFDXBaseTask):
             "startDate": self.options.get("startDate"),
             "contextTtl": self.options.get("contextTtl")
         }
+
+    # Core logic to extend an existing context definition
+    def _extend_context_definition(self):
+        url, headers = self._build_url_and_headers("connect/context-definitions")
+        payload = self._context_definition_payload()
         response = self._make_request("post", url, headers=headers, json=payload)
         if response:
             self.context_id = response.get("contextDefinitionId")
             if self.context_id:
                 self.logger.info(f"Context ID: {self.context_id}")
+                self.return_values["contextDefinitionId"] = self.context_id
                 self._process_context_id()
 
     # Post-process after getting the context ID - usually involves additional API calls to further define the context
@@ -94,7 +136,7 @@ class ExtendStandardContext(SFDXBaseTask):
         url, headers = self._build_url_and_headers(
             f"connect/context-definitions/{self.context_id}"
         )
-        response = self._make_request("get", url, headers=headers)
+        response = self._make_request("get", url, headers=headers, cache="revalidate")
         if response:
             version_list = response.get("contextDefinitionVersionList", [])
             if version_list:
@@ -102,30 +144,41 @@ class ExtendStandardContext(SFDXBaseTask):
 
     # Process the version list obtained from context definitions to perform further operations
     def _process_version_list(self, version_list):
+        if self._find_context_mapping(version_list):
+            self._update_context_mappings()
+
+    # Find the ID of the context mapping to mark as default, returning whether it was found
+    def _find_context_mapping(self, version_list):
+        mapping_name = self.options.get("mappingName") or "SalesTransaction"
         context_mappings = version_list[0].get("contextMappings", [])
         for mapping in context_mappings:
-            if mapping.get("name") == "SalesTransaction":
-                self.sales_transaction_mapping_id = mapping["contextMappingId"]
+            if mapping.get("name") == mapping_name:
+                self.context_mapping_id = mapping["contextMappingId"]
                 self.logger.info(
-                    f"Sales Transaction Context Mapping ID: {self.sales_transaction_mapping_id}"
+                    f"{mapping_name} Context Mapping ID: {self.context_mapping_id}"
                 )
-                self._update_context_mappings()
-                break
+                self.return_values["contextMappingId"] = self.context_mapping_id
+                return True
+        return False
 
-    # Update context mappings, typically for marking certain contexts as the default context
-    def _update_context_mappings(self):
-        url, headers = self._build_url_and_headers(
-            f"connect/context-definitions/{self.context_id}/context-mappings"
-        )
-        payload = {
+    # Payload that marks the selected context mapping as the default
+    def _context_mappings_payload(self):
+        return {
             "contextMappings": [
                 {
-                    "contextMappingId": self.sales_transaction_mapping_id,
+                    "contextMappingId": self.context_mapping_id,
                     "isDefault": "true",
-                    "name": "SalesTransaction",
+                    "name": self.options.get("mappingName") or "SalesTransaction",
                 }
             ]
         }
+
+    # Update context mappings, typically for marking certain contexts as the default context
+    def _update_context_mappings(self):
+        url, headers = self._build_url_and_headers(
+            f"connect/context-definitions/{self.context_id}/context-mappings"
+        )
+        payload = self._context_mappings_payload()
         self._make_request("patch", url, headers=headers, json=payload)
         self._activate_context_id()
 
@@ -135,27 +188,155 @@ class ExtendStandardContext(SFDXBaseTask):
             f"connect/context-definitions/{self.context_id}"
         )
         payload = {"isActive": "true"}
-        self._make_request("patch", url, headers=headers, json=payload)
+        response = self._make_request("patch", url, headers=headers, json=payload)
+        self.return_values["isActive"] = response is not None
 
-    # Helper to construct the request URL and headers for making API calls
-    def _build_url_and_headers(self, endpoint):
-        url = f"{self.instance_url}/services/data/v{self.project_config.project__package__api_version}/{endpoint}"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json",
-        }
-        return url, headers
+    # Composite variant of the chain: the create and read calls share one round trip, and the mapping
+    # and activation updates share a second. The mapping to update is selected by name from the read
+    # response, which a composite reference cannot express, so the chain needs two batches rather than one.
+    # Falls back to the step-by-step path only when a batch request fails as a whole; a failed subrequest
+    # fails the task, as retrying its steps separately would repeat the ones that were applied.
+    def _extend_context_definition_composite(self):
+        responses = self.client.composite(
+            [
+                self.client.subrequest(
+                    "post",
+                    "connect/context-definitions",
+                    "contextDefinition",
+                    self._context_definition_payload(),
+                ),
+                self.client.subrequest(
+                    "get",
+                    "connect/context-definitions/@{contextDefinition.contextDefinitionId}",
+                    "contextDefinitionDetail",
+                ),
+            ]
+        )
+        if responses is None:
+            self.logger.info("Composite batch was not applied, retrying with separate calls")
+            self._extend_context_definition()
+            return
+        created = responses.get("contextDefinition")
+        if not self._subrequest_ok(created):
+            raise CumulusCIException(f"Could not create context definition {self.options.get('developerName')}")
 
-    # Make an HTTP request using the requests library and handle the response
-    def _make_request(self, method, url, **kwargs):
-        response = requests.request(method, url, **kwargs)
-        if response.ok:
-            return response.json()
+        self.context_id = created["body"].get("contextDefinitionId")
+        self.logger.info(f"Context ID: {self.context_id}")
+        self.return_values["contextDefinitionId"] = self.context_id
+        detail = responses.get("contextDefinitionDetail")
+        if not self._subrequest_ok(detail):
+            raise CumulusCIException(f"Could not read context definition {self.context_id}")
+
+        version_list = detail["body"].get("contextDefinitionVersionList", [])
+        if not version_list or not self._find_context_mapping(version_list):
+            return
+        responses = self.client.composite(
+            [
+                self.client.subrequest(
+                    "patch",
+                    f"connect/context-definitions/{self.context_id}/context-mappings",
+                    "contextMappings",
+                    self._context_mappings_payload(),
+                ),
+                self.client.subrequest(
+                    "patch",
+                    f"connect/context-definitions/{self.context_id}",
+                    "activate",
+                    {"isActive": "true"},
+                ),
+            ]
+        )
+        if responses is None:
+            self._update_context_mappings()
+            return
+        if not self._subrequest_ok(responses.get("contextMappings")):
+            raise CumulusCIException(f"Could not set the default context mapping of {self.context_id}")
+        self.return_values["isActive"] = self._subrequest_ok(responses.get("activate"))
+
+    # Reconcile an existing context definition with the desired state, creating it only when it is missing
+    def _reconcile_context_definition(self):
+        developer_name = self.options.get("developerName")
+        existing = self._existing_context_definitions().get(developer_name)
+        if existing is None:
+            self.logger.info(f"No context definition named {developer_name}, creating it")
+            if process_bool_arg(self.options.get("composite") or False):
+                self._extend_context_definition_composite()
+            else:
+                self._extend_context_definition()
+            if self.return_values.get("contextDefinitionId"):
+                with _definition_listings_lock:
+                    _definition_listings.setdefault(self.instance_url, {})[developer_name] = {
+                        "contextDefinitionId": self.return_values["contextDefinitionId"],
+                        "developerName": developer_name,
+                    }
+            return
+
+        self.context_id = existing["contextDefinitionId"]
+        self.logger.info(f"Context ID: {self.context_id}")
+        self.return_values["contextDefinitionId"] = self.context_id
+        url, headers = self._build_url_and_headers(
+            f"connect/context-definitions/{self.context_id}"
+        )
+        response = self._make_request("get", url, headers=headers, cache="revalidate")
+        if not response:
+            return
+        version_list = response.get("contextDefinitionVersionList", [])
+        if not version_list or not self._find_context_mapping(version_list):
+            return
+
+        mapping = next(
+            mapping
+            for mapping in version_list[0].get("contextMappings", [])
+            if mapping["contextMappingId"] == self.context_mapping_id
+        )
+        update_mapping = not process_bool_arg(mapping.get("isDefault") or False)
+        activate = not process_bool_arg(response.get("isActive") or False)
+        if not update_mapping and not activate:
+            self.logger.info(f"Context definition {developer_name} is already up to date")
+            self.return_values["isActive"] = True
+            return
+        if update_mapping:
+            url, headers = self._build_url_and_headers(
+                f"connect/context-definitions/{self.context_id}/context-mappings"
+            )
+            self._make_request("patch", url, headers=headers, json=self._context_mappings_payload())
+        if activate:
+            self._activate_context_id()
         else:
+            self.return_values["isActive"] = True
+
+    # List the org's context definitions once per org and index them by developer name. The listing is always
+    # confirmed with the org, since definitions are also created and deleted outside of these tasks.
+    def _existing_context_definitions(self):
+        with _definition_listings_lock:
+            if self.instance_url not in _definition_listings:
+                url, headers = self._build_url_and_headers("connect/context-definitions")
+                response = self._make_request("get", url, headers=headers, cache="revalidate")
+                if response is None:
+                    raise CumulusCIException("Unable to list the org's context definitions")
+                _definition_listings[self.instance_url] = {
+                    definition.get("developerName"): definition for definition in listed_context_definitions(response)
+                }
+            return _definition_listings[self.instance_url]
+
+    # Check a composite subresponse, logging the failure the same way _make_request does
+    def _subrequest_ok(self, subresponse):
+        if subresponse is None:
+            return False
+        if subresponse.get("httpStatusCode", 500) >= 400:
             self.logger.error(
-                f"Failed {method.upper()} request to {url}: {response.text}"
+                f"Failed composite subrequest {subresponse.get('referenceId')}: {subresponse.get('body')}"
             )
-            return None
+            return False
+        return True
+
+    # Helper to construct the request URL and headers for making API calls
+    def _build_url_and_headers(self, endpoint):
+        return self.client.build_url(endpoint), self.client.build_headers()
+
+    # Make an HTTP request through the shared pooled Connect API client and handle the response
+    def _make_request(self, method, url, **kwargs):
+        return self.client.request(method, url, **kwargs)
 
     # Abstract method to get the keychain class, needs to be implemented by subclasses
     @abstractmethod
@@ -0,0 +1,127 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cumulusci.core.config import TaskConfig
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+from cumulusci.core.flowrunner import FlowCoordinator
+from cumulusci.core.utils import import_global, process_list_arg
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+
+# FanOut runs one task or flow against several orgs of the keychain at the same time. Every org gets its own
+# org config with a freshly refreshed token, orgs that do not exist or have expired are reported and left
+# alone, and a failure in one org does not stop the others. A table of per-org timings and outcomes is logged
+# at the end and the task fails if any org failed.
+class FanOut(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "orgs": {
+            "description": "Org aliases to run against, e.g. beta,dev_preview,tfid",
+            "required": True,
+        },
+        "task": {
+            "description": "Name of the task to run in every org",
+        },
+        "flow": {
+            "description": "Name of the flow to run in every org",
+        },
+        "options": {
+            "description": "Options for the task, or for a flow a map of task name to options",
+        },
+        "max_workers": {
+            "description": "Number of orgs worked on at the same time. Defaults to 4",
+        },
+    }
+
+    # Initialize the task options
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        self.orgs = process_list_arg(self.options["orgs"]) or []
+        if not self.orgs:
+            raise TaskOptionsError("orgs must name at least one org")
+        if bool(self.options.get("task")) == bool(self.options.get("flow")):
+            raise TaskOptionsError("Specify either a task or a flow to run")
+        self.max_workers = int(self.options.get("max_workers") or 4)
+
+    # Run the task or flow in every org and report the outcome per org
+    def _run_task(self):
+        target = self.options.get("task") or self.options.get("flow")
+        kind = "task" if self.options.get("task") else "flow"
+        self.logger.info(f"Running {kind} {target} against {len(self.orgs)} orgs, {self.max_workers} at a time")
+        # Every org is looked up before any target runs: some of this project's tasks replace the project's
+        # keychain with a new one when they start, which would lose the orgs not yet looked up
+        orgs = [(alias, self._get_org(alias)) for alias in self.orgs]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(lambda org: self._run_org(*org), orgs))
+        self.return_values = {result["org"]: result for result in results}
+        self._log_results(results)
+
+        failed = [result["org"] for result in results if result["status"] == "failed"]
+        if failed:
+            raise CumulusCIException(f"{kind.capitalize()} {target} did not complete in {', '.join(failed)}")
+
+    # Org config of an alias in the keychain, or the error looking it up
+    def _get_org(self, alias):
+        try:
+            return self.project_config.keychain.get_org(alias)
+        except Exception as e:
+            return e
+
+    # Run the target against one org; never raises, so one org cannot stop the others
+    def _run_org(self, alias, org_config):
+        start = time.monotonic()
+        result = {"org": alias, "status": "ok", "duration": 0, "error": None, "return_values": None}
+        try:
+            if isinstance(org_config, Exception):
+                raise org_config
+            if org_config.scratch and not org_config.date_created:
+                result.update(status="skipped", error="scratch org has not been created")
+                return result
+            if org_config.scratch and org_config.expired:
+                result.update(status="skipped", error="scratch org has expired")
+                return result
+            self.logger.info(f"[{alias}] Starting in {org_config.instance_url}")
+            result["return_values"] = self._run_target(org_config)
+            self.logger.info(f"[{alias}] Done in {time.monotonic() - start:.1f}s")
+        except Exception as e:
+            self.logger.error(f"[{alias}] Failed: {e}")
+            result.update(status="failed", error=str(e))
+        finally:
+            result["duration"] = time.monotonic() - start
+        return result
+
+    # Run the task with the org's token refreshed, or the flow, which refreshes the token itself
+    def _run_target(self, org_config):
+        options = self.options.get("options") or {}
+        if self.options.get("task"):
+            with org_config.save_if_changed():
+                org_config.refresh_oauth_token(org_config.keychain)
+            task_config = self.project_config.get_task(self.options["task"])
+            config = dict(task_config.config)
+            config["options"] = {**(task_config.options or {}), **options}
+            task_class = import_global(task_config.class_path)
+            task = task_class(self.project_config, TaskConfig(config), org_config, name=self.options["task"])
+            task()
+            return task.return_values
+        coordinator = FlowCoordinator(
+            self.project_config,
+            self.project_config.get_flow(self.options["flow"]),
+            name=self.options["flow"],
+            options=options,
+        )
+        coordinator.run(org_config)
+        return {str(result.step_num): result.return_values for result in coordinator.results}
+
+    def _log_results(self, results):
+        self.logger.info("")
+        self.logger.info(f"{'Org':<20} {'Status':<8} {'Duration':>9}  Detail")
+        for result in results:
+            self.logger.info(
+                f"{result['org']:<20} {result['status']:<8} {result['duration']:>8.1f}s  {result['error'] or ''}"
+            )
+        self.logger.info(
+            f"{sum(result['status'] == 'ok' for result in results)} of {len(results)} orgs completed, "
+            f"longest {max(result['duration'] for result in results):.1f}s"
+        )
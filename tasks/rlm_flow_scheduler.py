@@ -0,0 +1,362 @@
+import datetime
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+from cumulusci.core.flowrunner import FlowCoordinator, TaskRunner, jinja2_env
+from cumulusci.core.utils import process_bool_arg, process_list_arg
+from cumulusci.tasks.salesforce.BaseSalesforceApiTask import BaseSalesforceApiTask
+from cumulusci.tasks.salesforce.BaseSalesforceMetadataApiTask import BaseSalesforceMetadataApiTask
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+from tasks.rlm_org_state import (
+    content_hash,
+    load_state,
+    org_key,
+    path_hash,
+    refreshed_org_config,
+    save_state,
+    state_path,
+)
+from tasks.rlm_trace import DEFAULT_TOP, Tracer, trace_span, write_trace
+
+
+# Lanes a step can run in: shared steps run alongside any others, exclusive steps alongside everything but
+# each other, and solitary steps only once nothing else is running. A solitary step that is waiting holds
+# back new steps so it is not starved.
+class StepLanes:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.running = 0
+        self.exclusive = False
+        self.solitary = False
+        self.waiting_solitary = 0
+
+    # Hold a place in the given lane while the step runs
+    @contextmanager
+    def hold(self, lane):
+        with self.condition:
+            if lane == "solitary":
+                self.waiting_solitary += 1
+                self.condition.wait_for(lambda: not self.running)
+                self.waiting_solitary -= 1
+                self.solitary = True
+            else:
+                self.condition.wait_for(
+                    lambda: not self.solitary
+                    and not self.waiting_solitary
+                    and not (lane == "exclusive" and self.exclusive)
+                )
+                self.exclusive = self.exclusive or lane == "exclusive"
+            self.running += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.running -= 1
+                if lane == "solitary":
+                    self.solitary = False
+                elif lane == "exclusive":
+                    self.exclusive = False
+                self.condition.notify_all()
+
+
+# ParallelFlow runs the steps of a flow (nested flows expanded, options merged exactly as `cci flow run` does)
+# as a dependency graph instead of strictly in sequence. Steps listed in depends_on start as soon as the steps
+# they name have finished; every other step waits for all the steps before it, so a flow without depends_on
+# behaves as it always has. Metadata API deploys never overlap each other, since the org queues them anyway.
+#
+# The org's token is refreshed once before any step starts, and the steps that run alongside others get a
+# snapshot of the refreshed org config that they never refresh or save. Only this project's own tasks,
+# CumulusCI's REST API tasks and Metadata API deploys run alongside other steps; any other task may change the
+# working directory or run the CLI against the org, so it runs on its own with the org config itself.
+#
+# Every step that succeeds is recorded in a per-org checkpoint together with a fingerprint of its inputs: the
+# task, its options and the content of any file or directory an option points at. With resume turned on, a
+# step whose fingerprint matches the checkpoint and none of whose dependencies ran again is not repeated.
+class ParallelFlow(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "flow": {
+            "description": "Name of the flow to run",
+            "required": True,
+        },
+        "depends_on": {
+            "description": "Map of step to the steps it depends on, e.g. 1/6: [1/1]. Steps are named by step number "
+            "(1/6) or by task name when the task occurs once in the flow; [] lets a step start immediately. Steps "
+            "without an entry wait for every step before them",
+        },
+        "max_workers": {
+            "description": "Maximum number of steps running at the same time. Defaults to 4",
+        },
+        "exclusive": {
+            "description": "Tasks that must not run at the same time as each other, in addition to metadata deploys",
+        },
+        "ignore_failure": {
+            "description": "Keep running the steps that do not depend on a failed step. Defaults to False",
+        },
+        "resume": {
+            "description": "Skip the steps that completed in an earlier run against this org with the same inputs. "
+            "Defaults to False",
+        },
+        "trace": {
+            "description": "Path of a Chrome trace file to record the run's steps, API calls and polling waits in",
+        },
+    }
+
+    # Initialize the task options
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        self.max_workers = int(self.options.get("max_workers") or 4)
+        if self.max_workers < 1:
+            raise TaskOptionsError("max_workers must be at least 1")
+        self.exclusive = set(process_list_arg(self.options.get("exclusive")) or [])
+        self.ignore_failure = process_bool_arg(self.options.get("ignore_failure") or False)
+        self.resume = process_bool_arg(self.options.get("resume") or False)
+
+    # Run the flow, recording a trace of it when asked to
+    def _run_task(self):
+        if not self.options.get("trace"):
+            return self._run_flow()
+        tracer = Tracer()
+        try:
+            with tracer.recording(), tracer.span(self.options["flow"], "flow"):
+                self._run_flow()
+        finally:
+            write_trace(tracer, self.options["trace"], DEFAULT_TOP, self.logger)
+
+    # Expand the flow, run its step graph and report timings and the critical path
+    def _run_flow(self):
+        self.coordinator = FlowCoordinator(
+            self.project_config, self.project_config.get_flow(self.options["flow"]), name=self.options["flow"]
+        )
+        self.coordinator.org_config = self.org_config
+        self.steps = [step for step in self.coordinator.steps if step.task_class and not step.skip]
+        self.dependencies = self._dependencies()
+        self.lanes = StepLanes()
+        self.results_lock = threading.Lock()
+        self.timings = {}
+        self.ran = set()
+        self.checkpoint_path = state_path(self.project_config, org_key(self.org_config), "flows", self.options["flow"])
+        self.checkpoint = load_state(self.checkpoint_path).get("steps", {}) if self.resume else {}
+        save_state(self.checkpoint_path, {"flow": self.options["flow"], "steps": self.checkpoint})
+
+        # Refresh the org's token once here; the steps running in parallel get a snapshot of it that they never
+        # refresh or save
+        with self.org_config.save_if_changed():
+            self.org_config.refresh_oauth_token(self.project_config.keychain)
+        self.step_org_config = refreshed_org_config(self.org_config)
+
+        start = time.monotonic()
+        failures = self._run_graph(start)
+        wall = time.monotonic() - start
+
+        critical_path = self._critical_path()
+        self._log_summary(wall, critical_path)
+        self.return_values = {
+            "steps": {str(step.step_num): self.timings.get(str(step.step_num)) for step in self.steps},
+            "wall": wall,
+            "critical_path": [str(step.step_num) for step in critical_path],
+        }
+        if failures:
+            failed = ", ".join(f"{step.step_num} {step.task_name}" for step, _ in failures)
+            raise CumulusCIException(f"Flow {self.options['flow']} failed at step {failed}") from failures[0][1]
+
+    # Step number of every step, with the task name as an alias for tasks that occur once in the flow
+    def _step_ids(self):
+        ids = {str(step.step_num): step for step in self.steps}
+        names = {}
+        for step in self.steps:
+            names.setdefault(step.task_name, []).append(step)
+        ids.update({name: steps[0] for name, steps in names.items() if len(steps) == 1 and name not in ids})
+        return ids
+
+    # Steps each step waits for: those named in depends_on, or every earlier step
+    def _dependencies(self):
+        ids = self._step_ids()
+        declared = {}
+        for step_id, depends_on in (self.options.get("depends_on") or {}).items():
+            step = ids.get(str(step_id))
+            if step is None:
+                raise TaskOptionsError(f"depends_on names unknown or ambiguous step {step_id}")
+            declared[str(step.step_num)] = set()
+            for dependency_id in process_list_arg(depends_on) or []:
+                dependency = ids.get(str(dependency_id))
+                if dependency is None:
+                    raise TaskOptionsError(f"Step {step_id} depends on unknown or ambiguous step {dependency_id}")
+                if dependency.step_num >= step.step_num:
+                    raise TaskOptionsError(f"Step {step_id} can only depend on earlier steps, not {dependency_id}")
+                declared[str(step.step_num)].add(str(dependency.step_num))
+
+        dependencies = {}
+        earlier = set()
+        for step in self.steps:
+            step_id = str(step.step_num)
+            dependencies[step_id] = declared.get(step_id, set(earlier))
+            earlier.add(step_id)
+        return dependencies
+
+    # Schedule every step whose dependencies are done, up to max_workers at a time. After a failure no new
+    # steps are started (unless ignore_failure is set, in which case only the failed step's dependents are
+    # dropped) and the running ones are waited for.
+    def _run_graph(self, start):
+        pending = {str(step.step_num): step for step in self.steps}
+        done = set()
+        blocked = set()
+        failures = []
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if not failures or self.ignore_failure:
+                    for step_id, step in list(pending.items()):
+                        dependencies = self.dependencies[step_id]
+                        if dependencies & blocked:
+                            blocked.add(step_id)
+                            del pending[step_id]
+                            self.logger.warning(f"Not running step {step_id} {step.task_name}: a step it needs failed")
+                        elif dependencies <= done and len(running) < self.max_workers:
+                            del pending[step_id]
+                            running[executor.submit(self._run_step, step, start)] = step
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    step_id = str(step.step_num)
+                    exception = future.exception() or future.result()
+                    if exception and not step.allow_failure:
+                        failures.append((step, exception))
+                        blocked.add(step_id)
+                    else:
+                        done.add(step_id)
+        return failures
+
+    # Run one step unless its when condition is false; returns the exception it raised, if any
+    def _run_step(self, step, start):
+        step_id = str(step.step_num)
+        if step.when:
+            expression = jinja2_env.compile_expression(step.when)
+            if not expression(project_config=step.project_config, org_config=self.org_config):
+                self.logger.info(f"Skipping step {step_id} {step.task_name} (skipped unless {step.when})")
+                return None
+
+        fingerprint = self._fingerprint(step)
+        with self.results_lock:
+            completed = self.checkpoint.get(step_id) or {}
+            resumable = completed.get("fingerprint") == fingerprint and not self.dependencies[step_id] & self.ran
+            if resumable:
+                self.timings[step_id] = {
+                    "task": step.task_name,
+                    "start": time.monotonic() - start,
+                    "end": time.monotonic() - start,
+                    "duration": 0,
+                    "status": "resumed",
+                }
+            else:
+                self.ran.add(step_id)
+        if resumable:
+            self.logger.info(f"Skipping step {step_id} {step.task_name} (completed {completed['completed']})")
+            return None
+
+        lane = self._lane(step)
+        with self.lanes.hold(lane):
+            started = time.monotonic()
+            self.logger.info(f"Running step {step_id}: {step.task_name}")
+            # A solitary step runs alone, so it refreshes and saves the org config as in `cci flow run`; the
+            # snapshot is then taken again so the steps after it pick up its token
+            org_config = self.org_config if lane == "solitary" else self.step_org_config
+            with trace_span(f"{step_id} {step.task_name}", "step", task=step.task_config.get("class_path")):
+                result = TaskRunner(step, org_config, flow=self.coordinator).run_step()
+            if lane == "solitary":
+                self.step_org_config = refreshed_org_config(self.org_config)
+            finished = time.monotonic()
+
+        with self.results_lock:
+            self.coordinator.results.append(result)
+            self.timings[step_id] = {
+                "task": step.task_name,
+                "start": started - start,
+                "end": finished - start,
+                "duration": finished - started,
+                "status": "failed" if result.exception else "ok",
+            }
+            if result.exception:
+                self.checkpoint.pop(step_id, None)
+            else:
+                self.checkpoint[step_id] = {
+                    "task": step.task_name,
+                    "fingerprint": fingerprint,
+                    "completed": datetime.datetime.now().isoformat(timespec="seconds"),
+                }
+            save_state(self.checkpoint_path, {"flow": self.options["flow"], "steps": self.checkpoint})
+        status = f"failed: {result.exception}" if result.exception else "done"
+        self.logger.info(f"Step {step_id} {step.task_name} {status} in {finished - started:.1f}s")
+        return result.exception
+
+    # Lane a step runs in: deploys and the tasks named in exclusive one at a time, this project's own tasks and
+    # CumulusCI's REST API tasks (permission assignments, communities) alongside anything, and every other task
+    # on its own
+    def _lane(self, step):
+        if step.task_name in self.exclusive or issubclass(step.task_class, BaseSalesforceMetadataApiTask):
+            return "exclusive"
+        if step.task_class.__module__.startswith("tasks.") or issubclass(step.task_class, BaseSalesforceApiTask):
+            return "shared"
+        return "solitary"
+
+    # Hash of a step's task, options and the content of every existing path its options name
+    def _fingerprint(self, step):
+        options = step.task_config.get("options") or {}
+        values = [value for option in options.values() for value in (option if isinstance(option, list) else [option])]
+        paths = sorted({value for value in values if isinstance(value, str) and value and os.path.exists(value)})
+        return content_hash(
+            step.task_name,
+            step.task_config.get("class_path"),
+            options,
+            {path: path_hash(path) for path in paths},
+        )
+
+    # Longest chain of dependent steps by measured duration; skipped steps take no time
+    def _critical_path(self):
+        finish = {}
+        previous = {}
+        for step in self.steps:
+            step_id = str(step.step_num)
+            duration = (self.timings.get(step_id) or {}).get("duration", 0)
+            before = max(self.dependencies[step_id], key=lambda d: finish.get(d, 0), default=None)
+            finish[step_id] = duration + (finish.get(before, 0) if before else 0)
+            previous[step_id] = before
+        if not finish:
+            return []
+        by_id = {str(step.step_num): step for step in self.steps}
+        step_id = max(finish, key=finish.get)
+        path = []
+        while step_id:
+            if step_id in self.timings:
+                path.append(by_id[step_id])
+            step_id = previous[step_id]
+        return list(reversed(path))
+
+    # Log every step's timing, the time saved over a sequential run and the critical path
+    def _log_summary(self, wall, critical_path):
+        self.logger.info("")
+        self.logger.info(f"{'Step':<8} {'Task':<40} {'Start':>8} {'Duration':>9} Status")
+        for step in self.steps:
+            timing = self.timings.get(str(step.step_num))
+            if timing:
+                self.logger.info(
+                    f"{str(step.step_num):<8} {step.task_name:<40} {timing['start']:>7.1f}s "
+                    f"{timing['duration']:>8.1f}s {timing['status']}"
+                )
+            else:
+                self.logger.info(f"{str(step.step_num):<8} {step.task_name:<40} {'':>8} {'':>9} not run")
+        sequential = sum(timing["duration"] for timing in self.timings.values())
+        self.logger.info(f"Wall time {wall:.1f}s for {sequential:.1f}s of steps")
+        if critical_path:
+            total = sum(self.timings[str(step.step_num)]["duration"] for step in critical_path)
+            chain = " -> ".join(f"{step.step_num} {step.task_name}" for step in critical_path)
+            self.logger.info(f"Critical path ({total:.1f}s): {chain}")
@@ -0,0 +1,239 @@
+import csv
+import os
+import shutil
+import time
+
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+from cumulusci.core.utils import process_bool_arg, process_list_arg
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+from tasks.rlm_sfdmu_dataset import KEY_SEPARATOR, Dataset, key_spec_parts
+from tasks.rlm_validate_dataset import DatasetValidator
+
+DEFAULT_TEMPLATE = os.path.join("datasets", "sfdmu", "multicurrency")
+
+# Objects written once whatever the scale: reference data every generated product shares
+DEFAULT_SHARED_OBJECTS = [
+    "CurrencyType",
+    "ProductCatalog",
+    "ProductSellingModel",
+    "AttributeCategory",
+    "AttributePicklist",
+    "AttributePicklistValue",
+    "ProductRelationshipType",
+    "Pricebook2",
+    "PriceAdjustmentSchedule",
+    "ProrationPolicy",
+]
+
+# Fields records are looked up by, renamed in every copy of a scaled object
+NAME_FIELDS = {"Name", "DeveloperName", "ApiName"}
+
+# Other fields that must stay unique across the copies of a scaled object
+UNIQUE_FIELDS = {"Code", "ProductCode", "StockKeepingUnit"}
+
+
+# Suffix of the names in copy number `copy`; the first copy keeps the template's names
+def copy_suffix(copy):
+    return f"_{copy}"
+
+
+# Align the parts of an sfdmu composite key value with the parts of its spec. sfdmu drops empty and false
+# parts when it joins a key, so a value can have fewer parts than its spec; each value part is matched, in
+# order, to the first spec part whose known values allow it. Returns the spec part index of every value part,
+# or None when no alignment exists.
+def align_parts(values, domains, start=0):
+    if not values:
+        return []
+    for index in range(start, len(domains) - len(values) + 1):
+        if domains[index] is None or values[0] in domains[index]:
+            rest = align_parts(values[1:], domains, index + 1)
+            if rest is not None:
+                return [index] + rest
+    return None
+
+
+# CatalogGenerator writes a copy of a template dataset scaled by a factor. Every object except the shared
+# reference data is repeated once per scale step, with the names, codes and SKUs of each copy suffixed by its
+# number and every lookup and composite key rewritten to point at the records of the same copy, so the output
+# loads with its references intact. The template is held in memory; the output is written row by row.
+class CatalogGenerator:
+
+    def __init__(self, template, shared):
+        self.dataset = Dataset(template)
+        self.shared = set(shared)
+        self.rows = {obj.sobject: [row for row in self._read(obj)] for obj in self.dataset.objects}
+        self.names = {
+            (obj.sobject, field): {row[obj.columns.index(field)] for row in self.rows[obj.sobject]}
+            for obj in self.dataset.objects
+            for field in NAME_FIELDS & set(obj.columns)
+        }
+        self.plans = {obj.sobject: self._plan(obj) for obj in self.dataset.objects}
+        self.compiled = {obj.sobject: self._compile(obj) for obj in self.dataset.objects}
+
+    @staticmethod
+    def _read(obj):
+        if not os.path.exists(obj.csv_path):
+            return
+        with open(obj.csv_path, newline="", encoding="utf-8-sig") as f:
+            rows = csv.reader(f)
+            next(rows, None)
+            for row in rows:
+                yield row + [""] * (len(obj.columns) - len(row))
+
+    def scaled(self, sobject):
+        return sobject in self.dataset.by_name and sobject not in self.shared
+
+    # Known values of each part of a key spec on an object (None when any value may occur) and whether the
+    # part names a record of a scaled object
+    def _key_parts(self, sobject, spec):
+        domains, renamed = [], []
+        for part in key_spec_parts(spec):
+            if "." in part:
+                relationship, field = part.split(".", 1)
+                target = self.dataset.relationship_target(relationship)
+            else:
+                target, field = sobject, part
+            domains.append(self.names.get((target, field)) if field in NAME_FIELDS else None)
+            renamed.append(field in NAME_FIELDS and self.scaled(target))
+        return domains, renamed
+
+    # How each column of an object is rewritten in later copies: renamed, rewritten as a key or kept
+    def _plan(self, obj):
+        plan = []
+        for column in obj.columns:
+            if column == obj.key_column:
+                plan.append(("key",) + self._key_parts(obj.sobject, column))
+                continue
+            lookup = next((lookup for lookup in obj.lookups if lookup.column == column), None)
+            if lookup is not None:
+                plan.append(("key",) + self._key_parts(lookup.target, lookup.spec))
+            elif column in NAME_FIELDS or column in UNIQUE_FIELDS:
+                plan.append(("rename",))
+            else:
+                plan.append(None)
+        return plan
+
+    # Split a key value into its parts, flagging those that name records of scaled objects
+    @staticmethod
+    def _split_key(value, domains, renamed):
+        parts = value.split(KEY_SEPARATOR)
+        indexes = align_parts(parts, domains)
+        if indexes is None:
+            return value
+        return tuple((part, renamed[index]) for part, index in zip(parts, indexes))
+
+    # Work out once per template row how each of its values changes between copies: a plain string is kept,
+    # a tuple holds the parts of a value with the ones to suffix flagged
+    def _compile(self, obj):
+        plan = self.plans[obj.sobject]
+        compiled = []
+        for row in self.rows[obj.sobject]:
+            cells = []
+            for value, step in zip(row, plan):
+                if step is None or not value:
+                    cells.append(value)
+                elif step[0] == "rename":
+                    cells.append(((value, True),))
+                else:
+                    cells.append(self._split_key(value, step[1], step[2]))
+            compiled.append(cells)
+        return compiled
+
+    # Rows of an object for copy number `copy`
+    def copies(self, obj, copy):
+        if copy == 1:
+            yield from self.rows[obj.sobject]
+            return
+        suffix = copy_suffix(copy)
+        for cells in self.compiled[obj.sobject]:
+            yield [
+                cell if isinstance(cell, str)
+                else KEY_SEPARATOR.join(part + suffix if renamed else part for part, renamed in cell)
+                for cell in cells
+            ]
+
+    # Write the scaled dataset to output, streaming every CSV; returns the row count per object
+    def write(self, output, scale):
+        os.makedirs(output, exist_ok=True)
+        shutil.copyfile(os.path.join(self.dataset.directory, "export.json"), os.path.join(output, "export.json"))
+        counts = {}
+        for obj in self.dataset.objects:
+            if not os.path.exists(obj.csv_path):
+                continue
+            copies = scale if self.scaled(obj.sobject) else 1
+            count = 0
+            with open(os.path.join(output, os.path.basename(obj.csv_path)), "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(obj.columns)
+                for copy in range(1, copies + 1):
+                    for row in self.copies(obj, copy):
+                        writer.writerow(row)
+                        count += 1
+            counts[obj.sobject] = count
+        return counts
+
+
+# GenerateScaledCatalog builds a load-testing dataset from the multicurrency dataset: products, categories,
+# classifications, attribute definitions, selling model options, price book entries in every template currency,
+# price adjustment tiers and the other product data are repeated scale times, while currencies, catalogs,
+# selling models, picklists, price books and adjustment schedules are shared.
+class GenerateScaledCatalog(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "scale": {
+            "description": "Number of copies of the product data to generate",
+            "required": True,
+        },
+        "output": {
+            "description": "Directory to write the generated sfdmu dataset to",
+            "required": True,
+        },
+        "template": {
+            "description": f"sfdmu dataset to scale. Defaults to {DEFAULT_TEMPLATE}",
+        },
+        "shared": {
+            "description": f"Objects written only once. Defaults to {', '.join(DEFAULT_SHARED_OBJECTS)}",
+        },
+        "validate": {
+            "description": "Check the references of the generated dataset afterwards. Its keys are indexed in "
+            "memory, so this is best left off for very large outputs. Defaults to False",
+        },
+    }
+
+    # Initialize the task options
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        self.scale = int(self.options["scale"])
+        if self.scale < 1:
+            raise TaskOptionsError("scale must be at least 1")
+        self.template = self.options.get("template") or DEFAULT_TEMPLATE
+        if not os.path.exists(os.path.join(self.template, "export.json")):
+            raise TaskOptionsError(f"No export.json in {self.template}")
+        if os.path.abspath(self.options["output"]) == os.path.abspath(self.template):
+            raise TaskOptionsError("output must not be the template dataset")
+        self.shared = process_list_arg(self.options.get("shared")) or DEFAULT_SHARED_OBJECTS
+        self.validate = process_bool_arg(self.options.get("validate") or False)
+
+    # Generate the dataset and report its size
+    def _run_task(self):
+        start = time.perf_counter()
+        generator = CatalogGenerator(self.template, self.shared)
+        counts = generator.write(self.options["output"], self.scale)
+        elapsed = time.perf_counter() - start
+        for sobject, count in counts.items():
+            self.logger.info(f"{sobject:<32} {count:>10}")
+        self.logger.info(
+            f"Wrote {sum(counts.values())} rows at scale {self.scale} to {self.options['output']} in {elapsed:.1f}s"
+        )
+        self.return_values = {"rows": counts, "elapsed": elapsed}
+
+        if self.validate:
+            validator = DatasetValidator(self.options["output"]).validate()
+            if validator.errors:
+                for error in validator.errors[:5]:
+                    self.logger.error(error)
+                raise CumulusCIException(f"The generated dataset has {len(validator.errors)} broken references")
+            self.logger.info(f"Checked {validator.lookups} references of the generated dataset")
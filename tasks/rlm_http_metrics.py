@@ -0,0 +1,118 @@
+import atexit
+import csv
+import json
+import math
+import os
+import re
+import threading
+from urllib.parse import urlparse
+
+# Salesforce record IDs (15 or 18 characters, containing at least one digit) inside a URL path
+ID_PATTERN = re.compile(r"/(?=\w*\d)[a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?(?=/|$)")
+VERSION_PATTERN = re.compile(r"^/services/data/v\d+\.\d+")
+
+
+# Reduce a request URL to its endpoint template: no host, API version, query string or record IDs
+def endpoint_template(url):
+    path = VERSION_PATTERN.sub("", urlparse(url).path)
+    return ID_PATTERN.sub("/{id}", path) or "/"
+
+
+# Nearest-rank percentile of an already sorted list
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+# MetricsRecorder collects one sample per HTTP call and summarizes them per endpoint
+class MetricsRecorder:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []
+
+    # Hook called by ConnectClient after every request
+    def record(self, method, url, status, latency, request_bytes, response_bytes, retries):
+        with self.lock:
+            self.samples.append(
+                {
+                    "method": method.upper(),
+                    "endpoint": endpoint_template(url),
+                    "status": status,
+                    "latency": latency,
+                    "request_bytes": request_bytes,
+                    "response_bytes": response_bytes,
+                    "retries": retries,
+                }
+            )
+
+    def reset(self):
+        with self.lock:
+            self.samples = []
+
+    # Per-endpoint call counts, latency percentiles (in milliseconds), bytes, retries and statuses
+    def summary(self):
+        with self.lock:
+            samples = list(self.samples)
+        endpoints = {}
+        for sample in samples:
+            endpoints.setdefault(f"{sample['method']} {sample['endpoint']}", []).append(sample)
+        rows = []
+        for endpoint, endpoint_samples in sorted(endpoints.items()):
+            latencies = sorted(sample["latency"] * 1000 for sample in endpoint_samples)
+            statuses = {}
+            for sample in endpoint_samples:
+                statuses[str(sample["status"])] = statuses.get(str(sample["status"]), 0) + 1
+            rows.append(
+                {
+                    "endpoint": endpoint,
+                    "calls": len(endpoint_samples),
+                    "p50_ms": percentile(latencies, 50),
+                    "p95_ms": percentile(latencies, 95),
+                    "p99_ms": percentile(latencies, 99),
+                    "total_ms": sum(latencies),
+                    "request_bytes": sum(sample["request_bytes"] for sample in endpoint_samples),
+                    "response_bytes": sum(sample["response_bytes"] for sample in endpoint_samples),
+                    "retries": sum(sample["retries"] for sample in endpoint_samples),
+                    "statuses": statuses,
+                }
+            )
+        return {"total_calls": len(samples), "endpoints": rows}
+
+    # Write the summary as CSV when the path ends in .csv, JSON otherwise
+    def write(self, path):
+        summary = self.summary()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", newline="") as f:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(
+                    f,
+                    fieldnames=["endpoint", "calls", "p50_ms", "p95_ms", "p99_ms", "total_ms",
+                                "request_bytes", "response_bytes", "retries", "statuses"],
+                )
+                writer.writeheader()
+                for row in summary["endpoints"]:
+                    writer.writerow({**row, "statuses": json.dumps(row["statuses"])})
+            else:
+                json.dump(summary, f, indent=2)
+        return summary
+
+
+# Process-wide recorder shared by every task in a `cci task run` or `cci flow run`
+recorder = MetricsRecorder()
+
+_report_paths = set()
+_report_lock = threading.Lock()
+
+
+# Write the shared recorder's summary to path when the process exits, i.e. at the end of the task or flow
+def report_at_exit(path):
+    with _report_lock:
+        if path in _report_paths:
+            return
+        _report_paths.add(path)
+    atexit.register(recorder.write, path)
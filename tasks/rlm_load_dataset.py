@@ -0,0 +1,564 @@
+import csv
+import io
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+from cumulusci.core.utils import process_bool_arg
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+from tasks.rlm_connect_client import ConnectClient
+from tasks.rlm_org_state import content_hash, load_state, org_key, path_hash, save_state, state_path
+from tasks.rlm_polling import poll
+from tasks.rlm_sfdmu_dataset import Dataset, composite_key, key_spec_parts
+
+# Records per sObject Collections request, the API maximum
+COLLECTION_SIZE = 200
+
+# Rows per object and operation from which a Bulk API 2.0 job is used instead of sObject Collections
+DEFAULT_BULK_THRESHOLD = 2000
+
+SUPPORTED_OPERATIONS = {"Insert", "Upsert", "Update", "Readonly"}
+BULK_FINAL_STATES = {"JobComplete", "Failed", "Aborted"}
+INTEGER_TYPES = {"int", "long"}
+NUMBER_TYPES = {"double", "currency", "percent"}
+MAX_LOGGED_ERRORS = 5
+
+
+# A lookup value in a dataset row that matches no record in the dataset or the org
+class UnresolvedLookup(Exception):
+    pass
+
+
+# Render a value from a query result the way the same value is written in a dataset CSV
+def key_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return "" if value is None else str(value)
+
+
+# Value at a Relationship.Field path of a query result record
+def record_path(record, path):
+    for part in path.split("."):
+        if not isinstance(record, dict):
+            return None
+        record = record.get(part)
+    return record
+
+
+# Convert a CSV value to the JSON type of the field it is written to; empty values become None
+def field_value(value, field):
+    if value in (None, ""):
+        return None
+    if field["type"] == "boolean":
+        return value.lower() == "true"
+    if field["type"] in INTEGER_TYPES:
+        return int(float(value))
+    if field["type"] in NUMBER_TYPES:
+        return float(value)
+    return value
+
+
+# CSV body of a Bulk API 2.0 ingest job for API records; None is sent as #N/A so the field is cleared
+def bulk_csv(records):
+    columns = sorted({column for record in records for column in record if column != "attributes"})
+    data = io.StringIO()
+    writer = csv.writer(data, lineterminator="\n")
+    writer.writerow(columns)
+    for record in records:
+        writer.writerow(
+            ["#N/A" if record.get(column, "") is None else key_value(record.get(column, "")) for column in columns]
+        )
+    return data.getvalue().encode()
+
+
+# LoadDataset loads an sfdmu dataset directory (export.json plus CSVs) without the sfdmu CLI. Objects are
+# loaded as soon as every object they look up has been loaded, several at a time, through sObject Collections
+# or Bulk API 2.0, and lookups and composite external IDs are resolved in memory. A manifest of row hashes
+# and record IDs is kept per org so incremental runs only send the rows that changed since the last load.
+class LoadDataset(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "access_token": {
+            "description": "The access token for the org. Defaults to the project default",
+        },
+        "dataset": {
+            "description": "Path of the sfdmu dataset directory containing export.json",
+            "required": True,
+        },
+        "max_workers": {
+            "description": "Number of objects loaded at the same time. Defaults to 4",
+        },
+        "bulk_threshold": {
+            "description": f"Rows per object from which Bulk API 2.0 is used. Defaults to {DEFAULT_BULK_THRESHOLD}",
+        },
+        "incremental": {
+            "description": "Only send rows that changed since the last load of this dataset into the org. Defaults to False",
+        },
+        "delete_removed": {
+            "description": "Delete records loaded earlier whose rows have since been removed from the dataset. Defaults to False",
+        },
+    }
+
+    # Initialize the task options
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        self.dataset_path = self.options["dataset"]
+        if not os.path.exists(os.path.join(self.dataset_path, "export.json")):
+            raise TaskOptionsError(f"No export.json in {self.dataset_path}")
+        self.max_workers = int(self.options.get("max_workers") or 4)
+        self.bulk_threshold = int(self.options.get("bulk_threshold") or DEFAULT_BULK_THRESHOLD)
+        self.incremental = process_bool_arg(self.options.get("incremental") or False)
+        self.delete_removed = process_bool_arg(self.options.get("delete_removed") or False)
+
+    # Prepare runtime by setting up access token, instance URL and the shared Connect API client
+    def _prep_runtime(self):
+        self.access_token = self.options.get("access_token", self.org_config.access_token)
+        self.instance_url = self.options.get("instance_url", self.org_config.instance_url)
+        self.client = ConnectClient.from_task(self)
+
+    # Load every object of the dataset, starting each one as soon as its lookup targets are loaded
+    def _run_task(self):
+        self._prep_runtime()
+        self.dataset = Dataset(self.dataset_path)
+        waves = self.dataset.waves()
+        self.logger.info(
+            f"Loading {len(self.dataset.objects)} objects from {self.dataset_path} "
+            f"({len(waves)} dependency levels, {self.max_workers} at a time)"
+        )
+        self.lock = threading.Lock()
+        self.describes = {}
+        self.indexes = {}
+        self.results = {}
+        self.manifest_path = state_path(
+            self.project_config,
+            org_key(self.org_config, self.instance_url),
+            "datasets",
+            os.path.basename(os.path.normpath(self.dataset_path)),
+        )
+        self.previous_manifest = load_state(self.manifest_path).get("objects", {}) if self.incremental else {}
+        self.manifest = {}
+        self.dependencies = self.dataset.dependencies()
+        self.untouched = set()
+        pending = {name: set(deps) for name, deps in self.dependencies.items()}
+        loaded = set()
+        failed = set()
+        futures = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or futures:
+                for name, deps in list(pending.items()):
+                    if deps & failed:
+                        del pending[name]
+                        self.results[name] = self._blocked(name, deps & failed)
+                        failed.add(name)
+                        # Keep what the last load recorded, so the IDs of its records are still tracked
+                        if name in self.previous_manifest:
+                            self.manifest[name] = self.previous_manifest[name]
+                    elif deps <= loaded:
+                        del pending[name]
+                        futures[executor.submit(self._load_object, self.dataset.by_name[name])] = name
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = futures.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        self.results[name] = {"failed": 1, "errors": [str(e)]}
+                    (failed if self.results[name].get("failed") else loaded).add(name)
+        if self.delete_removed:
+            self._delete_removed(waves)
+        save_state(self.manifest_path, {"dataset": self.dataset_path, "objects": self.manifest})
+
+        self.return_values = {"objects": self.results}
+        self._log_results()
+        self._raise_failures()
+
+    # Result of an object left out because objects it looks up failed; its rows would only fail on their lookups
+    def _blocked(self, name, parents):
+        parents = sorted(parents)
+        return {
+            "operation": self.dataset.by_name[name].operation,
+            "failed": 0,
+            "blocked_by": parents,
+            "errors": [f"Not loaded because {', '.join(parents)} failed"],
+        }
+
+    # Fail the task naming the objects that failed and the objects left out because of them
+    def _raise_failures(self):
+        failed = {name: result for name, result in self.results.items() if result.get("failed")}
+        if not failed:
+            return
+        blocked = sorted(name for name, result in self.results.items() if result.get("blocked_by"))
+        raise CumulusCIException(
+            "Dataset load failed for "
+            + "; ".join(f"{name} ({result['failed']} rows: {result['errors'][0]})" for name, result in failed.items())
+            + (f". Not loaded because of these failures: {', '.join(blocked)}" if blocked else "")
+        )
+
+    def _log_results(self):
+        self.logger.info(
+            f"{'Object':<32} {'Operation':<9} {'Inserted':>8} {'Updated':>8} {'Deleted':>8} {'Skipped':>8} "
+            f"{'Failed':>7} {'Secs':>6}"
+        )
+        for obj in self.dataset.objects:
+            result = self.results.get(obj.sobject, {})
+            self.logger.info(
+                f"{obj.sobject:<32} {obj.operation:<9} {result.get('inserted', 0):>8} {result.get('updated', 0):>8} "
+                f"{result.get('deleted', 0):>8} {result.get('skipped', 0):>8} {result.get('failed', 0):>7} "
+                f"{result.get('elapsed', 0):>6.1f}"
+            )
+            for error in result.get("errors", [])[:MAX_LOGGED_ERRORS]:
+                self.logger.error(f"  {obj.sobject}: {error}")
+
+    # Load one object, writing parents before children when the object looks itself up. In incremental mode
+    # an object whose definition and CSV are unchanged is not touched at all, as long as none of the objects it
+    # looks up were loaded again and the org still holds as many of its records as after the last load;
+    # otherwise only rows whose hash differs from the manifest are sent.
+    def _load_object(self, obj):
+        start = time.perf_counter()
+        if obj.operation not in SUPPORTED_OPERATIONS:
+            raise CumulusCIException(f"Unsupported operation {obj.operation} for {obj.sobject}")
+        result = {
+            "operation": obj.operation,
+            "inserted": 0,
+            "updated": 0,
+            "deleted": 0,
+            "skipped": 0,
+            "failed": 0,
+            "errors": [],
+            "failed_keys": set(),
+        }
+        object_hash = content_hash(obj.query, obj.operation, obj.external_id, path_hash(obj.csv_path))
+        previous = self.previous_manifest.get(obj.sobject) or {}
+        previous_rows = previous.get("rows", {})
+        previous_ids = previous.get("ids", {})
+        if previous.get("hash") == object_hash and self._unchanged_in_org(obj, previous):
+            rows = list(obj.iter_rows())
+            self._publish_index(obj, rows, previous_ids)
+            result["skipped"] = len(rows)
+            self.manifest[obj.sobject] = previous
+            with self.lock:
+                self.untouched.add(obj.sobject)
+            return self._finish(obj, result, start)
+
+        fields = self._describe(obj.sobject)
+        self._bind_lookups(obj, fields)
+        existing = self._query_index(obj.sobject, obj.key_parts)
+        parent_lookups = [lookup for lookup in obj.lookups if lookup.target != obj.sobject]
+        ids = {}
+        hashes = {}
+        rows = []
+        unchanged = []
+        for row in obj.iter_rows():
+            key = obj.row_key(row)
+            # Rows sharing a key are all inserted the first time, but only the first one is matched to the
+            # existing record afterwards, so a later row never overwrites the record of an earlier one
+            if key in hashes and key in existing:
+                self.logger.warning(f"{obj.sobject}: skipping row with duplicate key {key}")
+                result["skipped"] += 1
+                continue
+            # The hash covers the IDs the row's lookups resolve to, so a row is sent again when a parent record
+            # it points at was recreated
+            hashes[key] = content_hash(
+                row,
+                [self._resolve(lookup, row[lookup.column]) for lookup in parent_lookups if row.get(lookup.column)],
+            )
+            if previous_rows.get(key) == hashes[key] and existing.get(key) == previous_ids.get(key):
+                ids[key] = previous_ids[key]
+                unchanged.append(row)
+            else:
+                rows.append(row)
+        result["skipped"] += len(unchanged)
+        self._publish_index(obj, unchanged, ids)
+        pending = rows
+        while pending:
+            ready = [row for row in pending if self._parents_loaded(obj, row)]
+            if not ready:
+                for row in pending:
+                    self._fail(result, obj.row_key(row), "parent record is neither in the dataset nor the org")
+                break
+            self._write_rows(obj, fields, ready, existing, ids, result)
+            self._publish_index(obj, ready, ids)
+            ready_ids = {id(row) for row in ready}
+            pending = [row for row in pending if id(row) not in ready_ids]
+
+        loaded_keys = [key for key in hashes if key in ids and key not in result["failed_keys"]]
+        removed = {key: record_id for key, record_id in previous_ids.items() if key not in hashes}
+        if removed and not self.delete_removed:
+            self.logger.info(f"{obj.sobject}: {len(removed)} rows were removed from the dataset; set delete_removed to delete them")
+        self.manifest[obj.sobject] = {
+            "hash": None if result["failed"] else object_hash,
+            "count": None if result["failed"] else self.client.query_count(f"SELECT COUNT() FROM {obj.sobject}"),
+            "rows": {key: hashes[key] for key in loaded_keys},
+            "ids": {**removed, **{key: ids[key] for key in loaded_keys}},
+            "removed": sorted(removed),
+        }
+        return self._finish(obj, result, start)
+
+    # Whether an object recorded as loaded can be left alone: every object it looks up was left alone too, so
+    # the lookup IDs in the org are still the ones it was loaded with, and the org holds as many of its records
+    # as right after the last load
+    def _unchanged_in_org(self, obj, previous):
+        with self.lock:
+            reloaded = self.dependencies[obj.sobject] - self.untouched
+        if reloaded:
+            self.logger.info(f"{obj.sobject}: checking every row, {', '.join(sorted(reloaded))} was loaded again")
+            return False
+        count = self.client.query_count(f"SELECT COUNT() FROM {obj.sobject}")
+        if previous.get("count") is None or count != previous["count"]:
+            self.logger.info(f"{obj.sobject}: checking every row, the org holds {count} records, not {previous.get('count')}")
+            return False
+        return True
+
+    def _finish(self, obj, result, start):
+        result.pop("failed_keys", None)
+        result["elapsed"] = time.perf_counter() - start
+        self.logger.info(
+            f"{obj.sobject}: {result['inserted']} inserted, {result['updated']} updated, "
+            f"{result['skipped']} skipped, {result['failed']} failed in {result['elapsed']:.1f}s"
+        )
+        return result
+
+    # Field describes of an object keyed by field name
+    def _describe(self, sobject):
+        with self.lock:
+            if sobject in self.describes:
+                return self.describes[sobject]
+        response = self.client.request("get", self.client.build_url(f"sobjects/{sobject}/describe"), cache="revalidate")
+        if response is None:
+            raise CumulusCIException(f"Could not describe {sobject}")
+        fields = {field["name"]: field for field in response.get("fields", [])}
+        with self.lock:
+            self.describes[sobject] = fields
+        return fields
+
+    # Use the describe to find the field and target object behind each lookup column
+    def _bind_lookups(self, obj, fields):
+        relationships = {field["relationshipName"]: field for field in fields.values() if field.get("relationshipName")}
+        for lookup in obj.lookups:
+            field = relationships.get(lookup.relationship) or fields.get(lookup.field)
+            if field is None:
+                continue
+            lookup.field = field["name"]
+            targets = field.get("referenceTo") or []
+            if targets and lookup.target not in targets:
+                lookup.target = targets[0]
+
+    # Map of composite key to record ID for the records of an object already in the org
+    def _query_index(self, sobject, parts):
+        query_fields = ["Id"] + [part for i, part in enumerate(parts) if part not in parts[:i] and part != "Id"]
+        records = self.client.query(f"SELECT {', '.join(query_fields)} FROM {sobject}")
+        if records is None:
+            raise CumulusCIException(f"Could not query existing {sobject} records")
+        return {composite_key(key_value(record_path(record, part)) for part in parts): record["Id"] for record in records}
+
+    # Record ID a lookup value points at: rows loaded by this task first, then records already in the org
+    def _resolve(self, lookup, value):
+        with self.lock:
+            loaded = self.indexes.get(("loaded", lookup.target, lookup.spec), {})
+            if value in loaded:
+                return loaded[value]
+            org = self.indexes.get(("org", lookup.target, lookup.spec))
+        if org is None:
+            org = self._query_index(lookup.target, key_spec_parts(lookup.spec))
+            with self.lock:
+                org = self.indexes.setdefault(("org", lookup.target, lookup.spec), org)
+        return org.get(value)
+
+    # A row is ready when every lookup it makes to its own object can be resolved
+    def _parents_loaded(self, obj, row):
+        return all(
+            not row.get(lookup.column) or self._resolve(lookup, row[lookup.column])
+            for lookup in obj.self_lookups
+        )
+
+    # Make the IDs of loaded rows available to lookups from other objects, keyed by each column they look up by
+    def _publish_index(self, obj, rows, ids):
+        specs = {lookup.spec for other in self.dataset.objects for lookup in other.lookups if lookup.target == obj.sobject}
+        with self.lock:
+            for spec in specs:
+                if spec not in obj.columns:
+                    continue
+                index = self.indexes.setdefault(("loaded", obj.sobject, spec), {})
+                for row in rows:
+                    record_id = ids.get(obj.row_key(row))
+                    if row.get(spec) and record_id:
+                        index[row[spec]] = record_id
+
+    # Split rows into inserts and updates according to the object's operation and send them
+    def _write_rows(self, obj, fields, rows, existing, ids, result):
+        inserts, updates = self._split_rows(obj, fields, rows, existing, ids, result)
+        self._send(obj, "insert", inserts, ids, result)
+        self._send(obj, "update", updates, ids, result)
+
+    # (key, record) pairs to insert and to update for rows, given the IDs of the existing records by key
+    def _split_rows(self, obj, fields, rows, existing, ids, result):
+        inserts, updates = [], []
+        for row in rows:
+            key = obj.row_key(row)
+            record_id = existing.get(key)
+            if record_id:
+                ids[key] = record_id
+            if obj.operation == "Readonly" or (record_id and obj.operation == "Insert"):
+                result["skipped"] += 1
+                continue
+            if not record_id and obj.operation == "Update":
+                self._fail(result, key, "no matching record to update")
+                continue
+            try:
+                record = self._build_record(obj, fields, row, update=bool(record_id))
+            except UnresolvedLookup as e:
+                self._fail(result, key, str(e))
+                continue
+            if record_id:
+                updates.append((key, {**record, "Id": record_id}))
+            else:
+                inserts.append((key, record))
+        return inserts, updates
+
+    # Build the API record for a row: writable value columns converted to their field types, plus resolved lookups
+    def _build_record(self, obj, fields, row, update):
+        access = "updateable" if update else "createable"
+        record = {"attributes": {"type": obj.sobject}}
+        for column in obj.value_columns:
+            field = fields.get(column)
+            if field is None or not field.get(access):
+                continue
+            value = field_value(row.get(column), field)
+            if value is not None or update:
+                record[column] = value
+        for lookup in obj.lookups:
+            field = fields.get(lookup.field)
+            if field is None or not field.get(access):
+                continue
+            value = row.get(lookup.column)
+            if not value:
+                if update:
+                    record[lookup.field] = None
+                continue
+            record_id = self._resolve(lookup, value)
+            if record_id is None:
+                raise UnresolvedLookup(f"{lookup.column} '{value}' not found")
+            record[lookup.field] = record_id
+        return record
+
+    def _fail(self, result, key, message):
+        result["failed"] += 1
+        result["errors"].append(f"{key}: {message}")
+        result["failed_keys"].add(key)
+
+    # Write records through Bulk API 2.0 when there are many of them, sObject Collections otherwise
+    def _send(self, obj, operation, pairs, ids, result):
+        if not pairs:
+            return
+        if len(pairs) >= self.bulk_threshold:
+            self._send_bulk(obj, operation, pairs, ids, result)
+        else:
+            self._send_collections(obj, operation, pairs, ids, result)
+
+    def _send_collections(self, obj, operation, pairs, ids, result):
+        url = self.client.build_url("composite/sobjects")
+        method = "post" if operation == "insert" else "patch"
+        counter = "inserted" if operation == "insert" else "updated"
+        for start in range(0, len(pairs), COLLECTION_SIZE):
+            chunk = pairs[start:start + COLLECTION_SIZE]
+            response = self.client.request(
+                method, url, json={"allOrNone": False, "records": [record for _, record in chunk]}
+            )
+            if response is None:
+                for key, _ in chunk:
+                    self._fail(result, key, f"{operation} request failed")
+                continue
+            for (key, _), outcome in zip(chunk, response):
+                if outcome.get("success"):
+                    ids[key] = outcome["id"]
+                    result[counter] += 1
+                else:
+                    messages = "; ".join(error.get("message", "") for error in outcome.get("errors", []))
+                    self._fail(result, key, messages)
+
+    # Run one Bulk API 2.0 ingest job for the records, then read back the IDs of inserted rows by their keys
+    def _send_bulk(self, obj, operation, pairs, ids, result):
+        info, failed_rows, error = self._run_ingest_job(obj.sobject, operation, bulk_csv([record for _, record in pairs]))
+        if info is None:
+            for key, _ in pairs:
+                self._fail(result, key, error)
+            return
+        errors = {row.get("Id"): row.get("sf__Error", "") for row in failed_rows}
+        counter = "inserted" if operation == "insert" else "updated"
+        # Failed rows come back with the API columns only, so they are matched to dataset rows by record ID
+        # for updates and by whether the key can be found in the org afterwards for inserts
+        if operation == "insert":
+            existing = self._query_index(obj.sobject, obj.key_parts)
+            for key, _ in pairs:
+                if key in existing:
+                    ids[key] = existing[key]
+                    result[counter] += 1
+                else:
+                    self._fail(result, key, next(iter(errors.values()), "bulk insert failed"))
+        else:
+            for key, record in pairs:
+                if record["Id"] in errors:
+                    self._fail(result, key, errors[record["Id"]])
+                else:
+                    result[counter] += 1
+
+    # Create, upload, close and wait for one Bulk API 2.0 ingest job. Returns the final job info and its failed
+    # rows, or None, no rows and the reason when the job did not complete.
+    def _run_ingest_job(self, sobject, operation, data):
+        job = self.client.request(
+            "post",
+            self.client.build_url("jobs/ingest"),
+            json={"object": sobject, "operation": operation, "contentType": "CSV", "lineEnding": "LF"},
+        )
+        if job is None:
+            return None, [], f"bulk {operation} job could not be created"
+        job_url = self.client.build_url(f"jobs/ingest/{job['id']}")
+        headers = {**self.client.build_headers(), "Content-Type": "text/csv"}
+        upload = self.client.send("put", f"{job_url}/batches", data=data, headers=headers)
+        if not upload.ok or self.client.request("patch", job_url, json={"state": "UploadComplete"}) is None:
+            self.client.request("patch", job_url, json={"state": "Aborted"})
+            return None, [], f"bulk {operation} upload failed: {upload.text}"
+
+        def finished():
+            info = self.client.request("get", job_url)
+            return info if info and info.get("state") in BULK_FINAL_STATES else None
+
+        info, elapsed, _ = poll(finished)
+        if info is None or info["state"] != "JobComplete":
+            return None, [], f"bulk {operation} job did not complete after {elapsed:.0f}s"
+        failures = self.client.send("get", f"{job_url}/failedResults", headers=self.client.build_headers())
+        return info, list(csv.DictReader(io.StringIO(failures.text))) if failures.ok else [], None
+
+    # Delete the records of rows removed from the dataset since the last load, children before parents
+    def _delete_removed(self, waves):
+        url = self.client.build_url("composite/sobjects")
+        for wave in reversed(waves):
+            for sobject in wave:
+                entry = self.manifest.get(sobject) or {}
+                result = self.results.get(sobject, {})
+                removed = [key for key in entry.get("removed", []) if key in entry.get("ids", {})]
+                for start in range(0, len(removed), COLLECTION_SIZE):
+                    chunk = removed[start:start + COLLECTION_SIZE]
+                    response = self.client.request(
+                        "delete", url, params={"ids": ",".join(entry["ids"][key] for key in chunk), "allOrNone": "false"}
+                    )
+                    for key, outcome in zip(chunk, response or [{}] * len(chunk)):
+                        if outcome.get("success") or any(
+                            error.get("statusCode") == "ENTITY_IS_DELETED" for error in outcome.get("errors", [])
+                        ):
+                            del entry["ids"][key]
+                            result["deleted"] = result.get("deleted", 0) + 1
+                        else:
+                            messages = "; ".join(error.get("message", "") for error in outcome.get("errors", []))
+                            result["failed"] = result.get("failed", 0) + 1
+                            result.setdefault("errors", []).append(f"{key}: delete failed {messages}".rstrip())
+                entry["removed"] = [key for key in entry.get("removed", []) if key in entry.get("ids", {})]
+                if result.get("deleted") and entry.get("count") is not None:
+                    entry["count"] = self.client.query_count(f"SELECT COUNT() FROM {sobject}")
@@ -0,0 +1,787 @@
+import argparse
+import csv
+import glob
+import hashlib
+import io
+import itertools
+import os
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from tasks.rlm_http_metrics import ID_PATTERN
+from tasks.rlm_sfdmu_dataset import Dataset, RELATIONSHIP_TARGETS
+
+# Context mappings the standard context definitions expose, keyed by base reference
+STANDARD_CONTEXT_MAPPINGS = {
+    "SalesTransactionContext__stdctx": ["SalesTransaction", "QuoteEntitiesMapping", "OrderEntitiesMapping"],
+    "ProductDiscoveryContext__stdctx": ["ProductDiscoveryMapping"],
+    "CartContext__stdctx": ["CartOperation"],
+}
+
+# Records the org is seeded with, matching what prepare_core deploys and loads
+SEED_RECORDS = {
+    "DecisionTable": [
+        {"DeveloperName": "RLM_ProductQualification", "Status": "Active"},
+    ] + [
+        {"DeveloperName": name, "Status": "Draft"}
+        for name in (
+            "Price_Book_Entry_Decision_Table",
+            "Price_Book_Entry_Decision_Table_v2",
+            "Bundle_Based_Adjustment_Decision_Table",
+            "Price_Adjustment_Tier_Decision_Table",
+            "Tiered_Adjustment_Tier_Decision_Table",
+            "Attribute_Based_Adjustment_Decision_Table",
+            "Derived_Pricing_Entries_Decision_Table",
+            "Contract_Pricing_Entries_Decision_Table",
+            "Asset_Action_Source_Entries_Decision_Table",
+        )
+    ],
+    "ExpressionSetVersion": [
+        {"ApiName": name, "Name": name, "IsActive": False, "VersionNumber": 1}
+        for name in (
+            "RLM_DefaultPricingProcedure",
+            "RLM_ProductDiscoveryPricingProcedure",
+            "RLM_QualificationProcedure",
+        )
+    ],
+    "Pricebook2": [
+        {"Name": "Standard Price Book", "IsStandard": True, "IsActive": True},
+    ],
+    "ProrationPolicy": [
+        {"Name": "Default Proration Policy"},
+    ],
+    "PriceAdjustmentSchedule": [
+        {"Name": "Standard Price Adjustment Tier"},
+        {"Name": "Standard Attribute Based Adjustment"},
+        {"Name": "Standard Bundle Based Adjustment"},
+        {"Name": "Standard Volume Based Adjustment"},
+        {"Name": "Standard Tier Based Adjustment"},
+    ],
+    "User": [
+        {"Username": "admin@rlm.example", "Alias": "admin"},
+    ] + [
+        {"Username": f"partner{number}@rlm.example", "Alias": f"prtnr{number}"} for number in range(1, 51)
+    ],
+    "PermissionSetLicense": [
+        {"DeveloperName": name}
+        for name in (
+            "RevenueLifecycleManagementUserPsl",
+            "OmniStudioDesigner",
+            "CorePricingDesignTime",
+            "BREDesigner",
+            "DocGenDesignerPsl",
+            "ClauseManagementUser",
+            "ProductCatalogManagementAdministratorPsl",
+            "ContractManagementUser",
+            "ProductDiscoveryUserPsl",
+            "BRERuntime",
+            "IndustriesConfiguratorPsl",
+            "ObligationManagementUser",
+            "Microsoft365WordPsl",
+            "DynamicRevenueOrchestratorUserPsl",
+            "DocumentBuilderUserPsl",
+        )
+    ],
+    "PermissionSetGroup": [
+        {"DeveloperName": name} for name in ("RLM_PSL", "RLM_NGP", "RLM_PD", "RLM_CLM", "RLM_DRO")
+    ],
+    "PermissionSet": [
+        {"Name": name}
+        for name in (
+            "IndustriesConfiguratorPlatformApi",
+            "ProductConfigurationRulesDesigner",
+            "ProductCatalogManagementAdministrator",
+            "ProductCatalogManagementViewer",
+        )
+    ],
+}
+
+# Setup objects no dataset describes, with their lookup fields
+SETUP_OBJECTS = {
+    "PermissionSetAssignment": ["AssigneeId", "PermissionSetId", "PermissionSetGroupId"],
+    "PermissionSetLicenseAssign": ["AssigneeId", "PermissionSetLicenseId"],
+}
+
+SOQL_PATTERN = re.compile(
+    r"SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<sobject>\w+)(?:\s+WHERE\s+(?P<where>.+?))?(?:\s+ORDER BY\s+.+?)?(?:\s+LIMIT\s+(?P<limit>\d+))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+CONDITION_PATTERN = re.compile(
+    r"(?P<field>\w+)\s*(?:(?P<in>IN)\s*\((?P<values>[^)]*)\)|=\s*(?P<value>'(?:[^'\\]|\\.)*'|\w+))",
+    re.IGNORECASE,
+)
+QUOTED_PATTERN = re.compile(r"'((?:[^'\\]|\\.)*)'")
+REFERENCE_PATTERN = re.compile(r"@\{([^}]+)\}")
+CONTEXT_DEFINITION_PATH = re.compile(r"/connect/context-definitions(/\w+)?$")
+DESCRIBE_PATH = re.compile(r"/sobjects/\w+/describe$")
+
+# Records per page of a query result, as the org returns them; the rest is read through nextRecordsUrl
+QUERY_PAGE_SIZE = 2000
+
+BOOLEAN_FIELD_PATTERN = re.compile(r"^(Is|Has|Should)[A-Z]")
+
+# Fields the stand-in org never lets a client write
+READ_ONLY_FIELDS = {"Id", "IsDeleted", "IsStandard", "LatestSimulationResult"}
+
+
+# Error raised by a route to produce a Salesforce-style error response
+class MockError(Exception):
+
+    def __init__(self, status, message, error_code="INVALID_INPUT"):
+        super().__init__(message)
+        self.status = status
+        self.body = [{"message": message, "errorCode": error_code}]
+
+
+# MockOrg holds the in-memory state of a stand-in org and answers the REST and Connect API calls made by
+# the tasks in tasks/, with configurable latency and injected errors and throttling
+class MockOrg:
+
+    def __init__(
+        self,
+        latency=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=0,
+        seed=None,
+        datasets_path=os.path.join("datasets", "sfdmu"),
+        api_limit=15000,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.api_limit = api_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.schema = self.load_schema(datasets_path)
+        self.routes = [
+            ("GET", re.compile(r"^connect/context-definitions$"), self.list_context_definitions),
+            ("POST", re.compile(r"^connect/context-definitions$"), self.create_context_definition),
+            ("GET", re.compile(r"^connect/context-definitions/(\w+)$"), self.get_context_definition),
+            ("PATCH", re.compile(r"^connect/context-definitions/(\w+)$"), self.update_context_definition),
+            ("PATCH", re.compile(r"^connect/context-definitions/(\w+)/context-mappings$"), self.update_context_mappings),
+            ("GET", re.compile(r"^connect/core-pricing/sync/syncData$"), self.start_pricing_sync),
+            ("GET", re.compile(r"^query$"), self.query),
+            ("GET", re.compile(r"^query/([\w-]+)$"), self.query_more),
+            ("POST", re.compile(r"^composite$"), self.composite),
+            ("GET", re.compile(r"^sobjects/(\w+)/describe$"), self.describe),
+            ("POST", re.compile(r"^composite/sobjects$"), self.create_records),
+            ("PATCH", re.compile(r"^composite/sobjects$"), self.update_records),
+            ("DELETE", re.compile(r"^composite/sobjects$"), self.delete_records),
+            ("POST", re.compile(r"^jobs/ingest$"), self.create_ingest_job),
+            ("PUT", re.compile(r"^jobs/ingest/(\w+)/batches$"), self.upload_ingest_data),
+            ("PATCH", re.compile(r"^jobs/ingest/(\w+)$"), self.close_ingest_job),
+            ("GET", re.compile(r"^jobs/ingest/(\w+)$"), self.get_ingest_job),
+            ("GET", re.compile(r"^jobs/ingest/(\w+)/failedResults$"), self.ingest_failed_results),
+            ("GET", re.compile(r"^/services/oauth2/userinfo$"), self.userinfo),
+            ("GET", re.compile(r"^/services/data$"), self.api_versions),
+            ("GET", re.compile(r"^limits$"), self.limits),
+            ("POST", re.compile(r"^connect/(?:pcm|cpq)/catalogs$"), self.list_catalogs),
+            ("GET", re.compile(r"^connect/pcm/catalogs/(\w+)$"), self.get_catalog),
+            ("POST", re.compile(r"^connect/cpq/catalogs/(\w+)$"), self.get_catalog),
+            ("GET", re.compile(r"^connect/pcm/catalogs/(\w+)/categories$"), self.list_categories),
+            ("POST", re.compile(r"^connect/cpq/categories$"), self.list_categories),
+            ("GET", re.compile(r"^connect/pcm/categories/(\w+)$"), self.get_category),
+            ("POST", re.compile(r"^connect/(?:pcm|cpq)/products$"), self.list_products),
+            ("GET", re.compile(r"^connect/pcm/products/(\w+)$"), self.get_product),
+            ("POST", re.compile(r"^connect/cpq/products/(\w+)$"), self.get_product),
+            ("POST", re.compile(r"^connect/cpq/qualification$"), self.qualify_products),
+        ]
+        self.instance_url = "http://127.0.0.1"
+        self.reset()
+
+    # Forget every record and counter
+    def reset(self):
+        with self.lock:
+            self.ids = itertools.count(1)
+            self.context_definitions = {}
+            self.ingest_jobs = {}
+            self.query_cursors = {}
+            self.records = {}
+            self.by_id = {}
+            for sobject, records in SEED_RECORDS.items():
+                for record in records:
+                    self.store(sobject, dict(record))
+            self.stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0, "errors": 0, "throttled": 0, "endpoints": {}}
+
+    # Snapshot of the request counters
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.stats))
+
+    # Generate a Salesforce-shaped 18 character ID
+    def new_id(self, prefix):
+        return f"{prefix}{next(self.ids):012d}AAA"
+
+    # Add a record to the org, giving it an ID; the caller holds the lock
+    def store(self, sobject, record):
+        record["Id"] = self.new_id("a0" + str(len(self.records) % 10))
+        self.records.setdefault(sobject, []).append(record)
+        self.by_id[record["Id"]] = record
+        return record
+
+    # Field describes for every object of the sfdmu datasets, derived from their queries and CSV headers
+    @staticmethod
+    def load_schema(datasets_path):
+        schema = {}
+        for export in glob.glob(os.path.join(datasets_path, "*", "export.json")):
+            dataset = Dataset(os.path.dirname(export))
+            for obj in dataset.objects:
+                fields = schema.setdefault(obj.sobject, {"Id": {"name": "Id", "type": "id"}})
+                for name in obj.fields + obj.value_columns:
+                    fields.setdefault(name, {"name": name, "type": "boolean" if BOOLEAN_FIELD_PATTERN.match(name) else "string"})
+                for lookup in obj.lookups:
+                    fields[lookup.field] = {"name": lookup.field, "type": "reference"}
+                for name, field in fields.items():
+                    if name != "Id" and name.endswith("Id") and field["type"] in ("string", "reference"):
+                        relationship = name[:-2]
+                        field.update(
+                            type="reference",
+                            relationshipName=relationship,
+                            referenceTo=[RELATIONSHIP_TARGETS.get(relationship, relationship)],
+                        )
+        for sobject, lookups in SETUP_OBJECTS.items():
+            fields = schema.setdefault(sobject, {"Id": {"name": "Id", "type": "id"}})
+            for name in lookups:
+                fields[name] = {"name": name, "type": "reference", "relationshipName": name[:-2], "referenceTo": []}
+        for fields in schema.values():
+            for name, field in fields.items():
+                field.setdefault("relationshipName", None)
+                field.setdefault("referenceTo", [])
+                field["createable"] = field["updateable"] = name not in READ_ONLY_FIELDS
+        return schema
+
+    # Count a request and its payload sizes
+    def record(self, method, path, bytes_in, bytes_out, status):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_in"] += bytes_in
+            self.stats["bytes_out"] += bytes_out
+            if status == 429:
+                self.stats["throttled"] += 1
+            elif status >= 500:
+                self.stats["errors"] += 1
+            key = f"{method} {ID_PATTERN.sub('/{id}', path)}"
+            self.stats["endpoints"][key] = self.stats["endpoints"].get(key, 0) + 1
+
+    # Decide whether to delay, fail or throttle a request before it is handled
+    def inject(self):
+        if self.latency:
+            time.sleep(self.latency)
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            return 429, [{"message": "Too many requests", "errorCode": "REQUEST_LIMIT_EXCEEDED"}]
+        if roll < self.throttle_rate + self.error_rate:
+            return 503, [{"message": "Injected server error", "errorCode": "SERVER_UNAVAILABLE"}]
+        return None
+
+    # Route a request to its handler and return (status, body)
+    def dispatch(self, method, path, params, body):
+        endpoint = re.sub(r"^/services/data/v\d+\.\d+/", "", path).rstrip("/")
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(endpoint)
+            if route_method == method and match:
+                try:
+                    return handler(*match.groups(), params=params, body=body)
+                except MockError as e:
+                    return e.status, e.body
+        return 404, [{"message": f"The requested resource does not exist: {method} {path}", "errorCode": "NOT_FOUND"}]
+
+    # GET connect/context-definitions
+    def list_context_definitions(self, params, body):
+        with self.lock:
+            definitions = [
+                {key: definition[key] for key in ("contextDefinitionId", "developerName", "name", "isActive")}
+                for definition in self.context_definitions.values()
+            ]
+        return 200, {"contextDefinitionList": definitions}
+
+    # POST connect/context-definitions
+    def create_context_definition(self, params, body):
+        body = body or {}
+        with self.lock:
+            if any(d["developerName"] == body.get("developerName") for d in self.context_definitions.values()):
+                raise MockError(400, f"Duplicate developer name {body.get('developerName')}", "DUPLICATE_VALUE")
+            context_id = self.new_id("11O")
+            mappings = STANDARD_CONTEXT_MAPPINGS.get(body.get("baseReference"), ["Default"])
+            self.context_definitions[context_id] = {
+                **body,
+                "contextDefinitionId": context_id,
+                "isActive": False,
+                "contextDefinitionVersionList": [
+                    {
+                        "contextDefinitionVersionId": self.new_id("11P"),
+                        "contextMappings": [
+                            {"contextMappingId": self.new_id("11j"), "name": name, "isDefault": False}
+                            for name in mappings
+                        ],
+                    }
+                ],
+            }
+        return 201, {"contextDefinitionId": context_id, "isSuccess": True}
+
+    # GET connect/context-definitions/{id}
+    def get_context_definition(self, context_id, params, body):
+        with self.lock:
+            if context_id not in self.context_definitions:
+                raise MockError(404, f"No context definition {context_id}", "NOT_FOUND")
+            return 200, json.loads(json.dumps(self.context_definitions[context_id]))
+
+    # PATCH connect/context-definitions/{id}
+    def update_context_definition(self, context_id, params, body):
+        with self.lock:
+            definition = self.context_definitions.get(context_id)
+            if definition is None:
+                raise MockError(404, f"No context definition {context_id}", "NOT_FOUND")
+            if "isActive" in (body or {}):
+                definition["isActive"] = str(body["isActive"]).lower() == "true"
+        return 200, {"contextDefinitionId": context_id, "isSuccess": True}
+
+    # PATCH connect/context-definitions/{id}/context-mappings
+    def update_context_mappings(self, context_id, params, body):
+        with self.lock:
+            definition = self.context_definitions.get(context_id)
+            if definition is None:
+                raise MockError(404, f"No context definition {context_id}", "NOT_FOUND")
+            mappings = {m["contextMappingId"]: m for m in definition["contextDefinitionVersionList"][0]["contextMappings"]}
+            for update in (body or {}).get("contextMappings", []):
+                mapping = mappings.get(update.get("contextMappingId"))
+                if mapping is None:
+                    raise MockError(400, f"No context mapping {update.get('contextMappingId')}")
+                if str(update.get("isDefault")).lower() == "true":
+                    for other in mappings.values():
+                        other["isDefault"] = False
+                    mapping["isDefault"] = True
+        return 200, {"contextDefinitionId": context_id, "isSuccess": True}
+
+    # GET connect/core-pricing/sync/syncData; the org only acknowledges the request and exposes no status to poll
+    def start_pricing_sync(self, params, body):
+        return 200, {"success": True}
+
+    # GET query?q=SOQL, supporting field lists, COUNT(), and AND-ed equality / IN filters, paged like the org
+    def query(self, params, body):
+        soql = (params.get("q") or [""])[0]
+        match = SOQL_PATTERN.match(soql.strip())
+        if not match:
+            raise MockError(400, f"Unsupported query: {soql}", "MALFORMED_QUERY")
+        filters = []
+        for condition in CONDITION_PATTERN.finditer(match.group("where") or ""):
+            if condition.group("in"):
+                values = {v.replace("\\'", "'") for v in QUOTED_PATTERN.findall(condition.group("values"))}
+            else:
+                values = {condition.group("value").strip("'").replace("\\'", "'")}
+            filters.append((condition.group("field"), values))
+        with self.lock:
+            records = [
+                record
+                for record in self.records.get(match.group("sobject"), [])
+                if all(self.filter_value(record, field) in values for field, values in filters)
+            ]
+        if match.group("limit"):
+            records = records[: int(match.group("limit"))]
+        if match.group("fields").strip().upper() == "COUNT()":
+            return 200, {"totalSize": len(records), "done": True, "records": []}
+        fields = [field.strip() for field in match.group("fields").split(",")]
+        with self.lock:
+            cursor = self.new_id("01g")
+            self.query_cursors[cursor] = (match.group("sobject"), fields, records)
+        return self.query_more(f"{cursor}-0", params, body)
+
+    # GET query/{cursor}-{offset}: the next page of a query result
+    def query_more(self, locator, params, body):
+        cursor, _, offset = locator.rpartition("-")
+        with self.lock:
+            if cursor not in self.query_cursors:
+                raise MockError(400, f"Invalid query locator {locator}", "INVALID_QUERY_LOCATOR")
+            sobject, fields, records = self.query_cursors[cursor]
+            start = int(offset or 0)
+            page = [self.select(sobject, record, fields) for record in records[start:start + QUERY_PAGE_SIZE]]
+            response = {"totalSize": len(records), "done": start + QUERY_PAGE_SIZE >= len(records), "records": page}
+            if response["done"]:
+                del self.query_cursors[cursor]
+            else:
+                response["nextRecordsUrl"] = f"/services/data/v62.0/query/{cursor}-{start + QUERY_PAGE_SIZE}"
+        return 200, response
+
+    # GET /services/oauth2/userinfo
+    def userinfo(self, params, body):
+        return 200, {"user_id": "005000000000001AAA", "profile": f"{self.instance_url}/005000000000001AAA"}
+
+    # GET /services/data
+    def api_versions(self, params, body):
+        return 200, [
+            {"label": "Winter '25", "url": "/services/data/v62.0", "version": "62.0"},
+        ]
+
+    # GET limits, counting every request served so far against the daily API limit
+    def limits(self, params, body):
+        return 200, {"DailyApiRequests": {"Max": self.api_limit, "Remaining": self.api_remaining()}}
+
+    def api_remaining(self):
+        with self.lock:
+            return max(0, self.api_limit - self.stats["requests"])
+
+    # Catalog, category or product in the summary shape of the Product Catalog Management APIs
+    def catalog_item(self, record):
+        return {"id": record["Id"], "name": record.get("Name"), "description": record.get("Description")}
+
+    # One record of an object by ID, or a NOT_FOUND error
+    def find(self, sobject, record_id):
+        with self.lock:
+            record = self.by_id.get(record_id)
+        if record is None or record not in self.records.get(sobject, []):
+            raise MockError(404, f"No {sobject} with ID {record_id}", "NOT_FOUND")
+        return record
+
+    # POST connect/pcm/catalogs and connect/cpq/catalogs
+    def list_catalogs(self, params, body):
+        with self.lock:
+            catalogs = [self.catalog_item(record) for record in self.records.get("ProductCatalog", [])]
+        return 200, {"catalogs": catalogs, "count": len(catalogs)}
+
+    # GET connect/pcm/catalogs/{id} and POST connect/cpq/catalogs/{id}
+    def get_catalog(self, catalog_id, params, body):
+        return 200, {"catalogs": [self.catalog_item(self.find("ProductCatalog", catalog_id))]}
+
+    # GET connect/pcm/catalogs/{id}/categories and POST connect/cpq/categories
+    def list_categories(self, catalog_id=None, params=None, body=None):
+        catalog_id = catalog_id or (body or {}).get("catalogId")
+        with self.lock:
+            categories = [
+                dict(self.catalog_item(record), parentCategoryId=record.get("ParentCategoryId"))
+                for record in self.records.get("ProductCategory", [])
+                if not catalog_id or record.get("CatalogId") == catalog_id
+            ]
+        return 200, {"categories": categories, "count": len(categories)}
+
+    # GET connect/pcm/categories/{id}
+    def get_category(self, category_id, params, body):
+        return 200, {"categories": [self.catalog_item(self.find("ProductCategory", category_id))]}
+
+    # POST connect/pcm/products and connect/cpq/products
+    def list_products(self, params, body):
+        with self.lock:
+            products = [self.catalog_item(record) for record in self.records.get("Product2", [])]
+        return 200, {"products": products, "count": len(products)}
+
+    # GET connect/pcm/products/{id} and POST connect/cpq/products/{id}
+    def get_product(self, product_id, params, body):
+        return 200, {"products": [self.catalog_item(self.find("Product2", product_id))]}
+
+    # POST connect/cpq/qualification, qualifying every product asked about
+    def qualify_products(self, params, body):
+        products = (body or {}).get("productIds") or []
+        return 200, {"qualificationResults": [{"productId": product, "isQualified": True} for product in products]}
+
+    # Value of a record field as written in a SOQL filter; field names are case-insensitive as in SOQL
+    @staticmethod
+    def filter_value(record, field):
+        field = next((name for name in record if name.lower() == field.lower()), field)
+        value = record.get(field)
+        return str(value).lower() if isinstance(value, bool) else str(value)
+
+    # Shape a record as a query result, following Relationship.Field paths through lookup IDs
+    def select(self, sobject, record, fields):
+        result = {"attributes": {"type": sobject}}
+        for field in fields:
+            path = field.split(".")
+            target, source = result, record
+            for relationship in path[:-1]:
+                parent = self.by_id.get(source.get(relationship + "Id")) if source else None
+                if parent is None:
+                    target.setdefault(relationship, None)
+                    source = None
+                    break
+                target = target.setdefault(relationship, {"attributes": {}}) or {}
+                source = parent
+            if source is not None:
+                target[path[-1]] = source.get(path[-1])
+        return result
+
+    # GET sobjects/{name}/describe
+    def describe(self, sobject, params, body):
+        if sobject not in self.schema:
+            raise MockError(404, f"The requested resource does not exist: {sobject}", "NOT_FOUND")
+        return 200, {"name": sobject, "fields": list(self.schema[sobject].values())}
+
+    # Check a record's fields and lookups against the schema; returns the errors of a collections result
+    def validate(self, sobject, record):
+        fields = self.schema.get(sobject, {})
+        for name, value in record.items():
+            field = fields.get(name)
+            if field is None:
+                return [{"statusCode": "INVALID_FIELD", "message": f"No such column '{name}' on {sobject}", "fields": [name]}]
+            if field["type"] == "reference" and value and value not in self.by_id:
+                return [{"statusCode": "INVALID_CROSS_REFERENCE_KEY", "message": f"Invalid {name}: {value}", "fields": [name]}]
+        return []
+
+    # POST composite/sobjects
+    def create_records(self, params, body):
+        results = []
+        with self.lock:
+            for record in (body or {}).get("records", []):
+                record = dict(record)
+                sobject = record.pop("attributes", {}).get("type")
+                errors = self.validate(sobject, record)
+                if errors:
+                    results.append({"success": False, "errors": errors})
+                    continue
+                results.append({"id": self.store(sobject, record)["Id"], "success": True, "errors": []})
+        return 200, results
+
+    # PATCH composite/sobjects
+    def update_records(self, params, body):
+        results = []
+        with self.lock:
+            for record in (body or {}).get("records", []):
+                record = dict(record)
+                sobject = record.pop("attributes", {}).get("type")
+                existing = self.by_id.get(record.pop("Id", None))
+                errors = self.validate(sobject, record)
+                if existing is None:
+                    errors = [{"statusCode": "ENTITY_IS_DELETED", "message": "entity is deleted", "fields": []}]
+                if errors:
+                    results.append({"success": False, "errors": errors})
+                    continue
+                existing.update(record)
+                results.append({"id": existing["Id"], "success": True, "errors": []})
+        return 200, results
+
+    # DELETE composite/sobjects?ids=...
+    def delete_records(self, params, body):
+        results = []
+        with self.lock:
+            for record_id in ",".join(params.get("ids", [])).split(","):
+                record = self.by_id.pop(record_id, None)
+                if record is None:
+                    results.append({"id": record_id, "success": False, "errors": [{"statusCode": "ENTITY_IS_DELETED", "message": "entity is deleted"}]})
+                    continue
+                for records in self.records.values():
+                    if record in records:
+                        records.remove(record)
+                        break
+                results.append({"id": record_id, "success": True, "errors": []})
+        return 200, results
+
+    # POST jobs/ingest
+    def create_ingest_job(self, params, body):
+        body = body or {}
+        with self.lock:
+            job_id = self.new_id("750")
+            self.ingest_jobs[job_id] = {
+                "id": job_id,
+                "object": body.get("object"),
+                "operation": body.get("operation"),
+                "state": "Open",
+                "data": "",
+                "failed": [],
+                "numberRecordsProcessed": 0,
+                "numberRecordsFailed": 0,
+            }
+        return 200, self.ingest_job_info(job_id)
+
+    def ingest_job_info(self, job_id):
+        job = self.ingest_jobs.get(job_id)
+        if job is None:
+            raise MockError(404, f"No ingest job {job_id}", "NOT_FOUND")
+        return {key: value for key, value in job.items() if key not in ("data", "failed")}
+
+    # PUT jobs/ingest/{id}/batches with a CSV body
+    def upload_ingest_data(self, job_id, params, body):
+        with self.lock:
+            job = self.ingest_jobs.get(job_id)
+            if job is None or job["state"] != "Open":
+                raise MockError(400, f"Job {job_id} is not open", "INVALIDJOBSTATE")
+            job["data"] += body or ""
+        return 201, None
+
+    # PATCH jobs/ingest/{id}; closing the job processes its rows right away
+    def close_ingest_job(self, job_id, params, body):
+        with self.lock:
+            job = self.ingest_jobs.get(job_id)
+            if job is None:
+                raise MockError(404, f"No ingest job {job_id}", "NOT_FOUND")
+            if (body or {}).get("state") == "Aborted":
+                job["state"] = "Aborted"
+                return 200, self.ingest_job_info(job_id)
+            for row in csv.DictReader(io.StringIO(job["data"])):
+                record = {key: None if value == "#N/A" else value for key, value in row.items() if value != ""}
+                errors = self.validate(job["object"], {k: v for k, v in record.items() if k != "Id"})
+                existing = self.by_id.get(record.get("Id")) if job["operation"] == "update" else None
+                if job["operation"] == "update" and existing is None:
+                    errors = errors or [{"statusCode": "ENTITY_IS_DELETED", "message": "entity is deleted"}]
+                if errors:
+                    job["failed"].append({"sf__Id": "", "sf__Error": f"{errors[0]['statusCode']}:{errors[0]['message']}", **row})
+                elif existing is not None:
+                    existing.update(record)
+                else:
+                    self.store(job["object"], record)
+                job["numberRecordsProcessed"] += 1
+            job["numberRecordsFailed"] = len(job["failed"])
+            job["state"] = "JobComplete"
+            return 200, self.ingest_job_info(job_id)
+
+    # GET jobs/ingest/{id}
+    def get_ingest_job(self, job_id, params, body):
+        with self.lock:
+            return 200, self.ingest_job_info(job_id)
+
+    # GET jobs/ingest/{id}/failedResults as CSV
+    def ingest_failed_results(self, job_id, params, body):
+        with self.lock:
+            failed = list(self.ingest_jobs.get(job_id, {}).get("failed", []))
+        output = io.StringIO()
+        if failed:
+            writer = csv.DictWriter(output, fieldnames=list(failed[0]))
+            writer.writeheader()
+            writer.writerows(failed)
+        return 200, output.getvalue()
+
+    # POST composite, resolving @{referenceId.path} references between subrequests
+    def composite(self, params, body):
+        results = {}
+        responses = []
+        failed = False
+        for subrequest in (body or {}).get("compositeRequest", []):
+            if failed and body.get("allOrNone"):
+                status, sub_body = 400, [{"message": "Processing halted", "errorCode": "PROCESSING_HALTED"}]
+            else:
+                try:
+                    url = self.resolve_references(subrequest["url"], results)
+                    sub_body = json.loads(self.resolve_references(json.dumps(subrequest.get("body")), results))
+                    parsed = urlparse(url)
+                    status, sub_body = self.dispatch(subrequest["method"].upper(), parsed.path, parse_qs(parsed.query), sub_body)
+                except MockError as e:
+                    status, sub_body = e.status, e.body
+                failed = failed or status >= 400
+            results[subrequest["referenceId"]] = sub_body
+            responses.append({"body": sub_body, "httpHeaders": {}, "httpStatusCode": status, "referenceId": subrequest["referenceId"]})
+        return 200, {"compositeResponse": responses}
+
+    # Replace @{ref.path[0].field} expressions with values from earlier subresponses
+    def resolve_references(self, text, results):
+        def resolve(match):
+            reference, *path = re.split(r"\.|\[(\d+)\]\.?", match.group(1))
+            value = results.get(reference)
+            for part in filter(None, path):
+                try:
+                    value = value[int(part)] if part.isdigit() else value[part]
+                except (KeyError, IndexError, TypeError):
+                    raise MockError(400, f"Invalid reference {match.group(0)}", "INVALID_REFERENCE")
+            return str(value)
+
+        return REFERENCE_PATTERN.sub(resolve, text)
+
+
+# Request handler that feeds HTTP requests into the MockOrg of its server
+class MockOrgHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, delayed ACKs add ~40 ms to every keep-alive request
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_any(self):
+        org = self.server.org
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        parsed = urlparse(self.path)
+        injected = org.inject()
+        if injected:
+            status, body = injected
+        else:
+            if "text/csv" in (self.headers.get("Content-Type") or ""):
+                payload = raw.decode()
+            else:
+                try:
+                    payload = json.loads(raw) if raw else None
+                except ValueError:
+                    payload = None
+            status, body = org.dispatch(self.command, parsed.path, parse_qs(parsed.query), payload)
+        if isinstance(body, str):
+            data, content_type = body.encode(), "text/csv"
+        else:
+            data, content_type = (json.dumps(body).encode() if body is not None else b""), "application/json"
+        etag = None
+        if self.command == "GET" and status == 200:
+            # Context definitions carry an ETag and describes honour If-Modified-Since (the schema never changes)
+            if CONTEXT_DEFINITION_PATH.search(parsed.path):
+                etag = '"' + hashlib.sha1(data).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    status, data = 304, b""
+            elif DESCRIBE_PATH.search(parsed.path) and self.headers.get("If-Modified-Since"):
+                status, data = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Sforce-Limit-Info", f"api-usage={org.api_limit - org.api_remaining()}/{org.api_limit}")
+        if status == 429:
+            self.send_header("Retry-After", str(org.retry_after))
+        self.end_headers()
+        self.wfile.write(data)
+        org.record(self.command, parsed.path, len(raw), len(data), status)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = handle_any
+
+
+# MockOrgServer runs a MockOrg on a local port in a background thread
+class MockOrgServer:
+
+    def __init__(self, org=None, host="127.0.0.1", port=0):
+        self.org = org or MockOrg()
+        self.httpd = ThreadingHTTPServer((host, port), MockOrgHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.org = self.org
+        self.org.instance_url = self.url
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# Run the stand-in org from the command line: python -m tasks.rlm_mock_org --port 8765
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Salesforce endpoints used by tasks/")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    args = parser.parse_args()
+    org = MockOrg(latency=args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate)
+    server = MockOrgServer(org, args.host, args.port)
+    print(f"Mock org listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
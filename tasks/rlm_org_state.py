@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+from urllib.parse import urlparse
+
+from cumulusci.core.config import OrgConfig
+
+# Directory under the project cache (.cci) holding state the RLM tasks keep per org between runs
+STATE_DIRECTORY = "rlm"
+
+
+# Stable identifier of the org a task runs against: its org ID, or its host when the ID is not known
+def org_key(org_config, instance_url=None):
+    try:
+        org_id = org_config.org_id
+    except (AttributeError, KeyError, TypeError):
+        org_id = None
+    if org_id:
+        return org_id
+    host = urlparse(instance_url or org_config.instance_url).netloc
+    return re.sub(r"[^\w.-]", "_", host)
+
+
+# Copy of an org config taken right after its token was refreshed, for tasks that run alongside each other.
+# Refreshing it does nothing, so those tasks never call out to refresh the org or save it from their threads.
+class RefreshedOrgConfig(OrgConfig):
+    def refresh_oauth_token(self, keychain, connected_app=None, is_sandbox=False):
+        pass
+
+    @property
+    def org_id(self):
+        return self.config.get("org_id") or super().org_id
+
+
+# Snapshot of a freshly refreshed org config with the token, instance URL and identity it resolved to
+def refreshed_org_config(org_config):
+    config = dict(org_config.config)
+    config["access_token"] = org_config.access_token
+    config["instance_url"] = org_config.instance_url
+    for key in ("username", "org_id"):
+        try:
+            config[key] = getattr(org_config, key)
+        except (AttributeError, KeyError, TypeError):
+            pass
+    return RefreshedOrgConfig(config, org_config.name, org_config.keychain, org_config.global_org)
+
+
+# Directory holding every state file of an org
+def state_dir(project_config, org):
+    return os.path.join(str(project_config.cache_dir), STATE_DIRECTORY, org)
+
+
+# Path of a JSON state file for an org, e.g. .cci/rlm/<org>/datasets/multicurrency.json
+def state_path(project_config, org, *names):
+    return os.path.join(state_dir(project_config, org), *names) + ".json"
+
+
+# Read a state file, returning an empty dict when it does not exist or cannot be parsed
+def load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# Write a state file atomically so an interrupted run never leaves a truncated file behind
+def save_state(path, state):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+# Delete a state file if it exists
+def clear_state(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Short content hash of JSON-serializable values
+def content_hash(*values):
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:16]
+
+
+# Content hash of a file, or of every file below a directory together with their relative paths
+def path_hash(path):
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        files = sorted(
+            os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+        )
+    else:
+        files = [path] if os.path.exists(path) else []
+    for file_path in files:
+        digest.update(os.path.relpath(file_path, path).encode())
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
@@ -0,0 +1,212 @@
+from urllib.parse import urlencode
+
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+from cumulusci.core.utils import process_list_arg
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+from tasks.rlm_connect_client import ConnectClient, soql_in
+from tasks.rlm_load_dataset import COLLECTION_SIZE, MAX_LOGGED_ERRORS
+
+# How each option's names are resolved and assigned, licenses first so the permission sets that need them
+# can be assigned in the same run
+PERMISSION_KINDS = {
+    "permission_set_licenses": {
+        "sobject": "PermissionSetLicense",
+        "name": "DeveloperName",
+        "assignment": "PermissionSetLicenseAssign",
+        "lookup": "PermissionSetLicenseId",
+        "label": "permission set licenses",
+    },
+    "permission_set_groups": {
+        "sobject": "PermissionSetGroup",
+        "name": "DeveloperName",
+        "assignment": "PermissionSetAssignment",
+        "lookup": "PermissionSetGroupId",
+        "label": "permission set groups",
+    },
+    "permission_sets": {
+        "sobject": "PermissionSet",
+        "name": "Name",
+        "assignment": "PermissionSetAssignment",
+        "lookup": "PermissionSetId",
+        "label": "permission sets",
+    },
+}
+
+# Queries a composite request may carry, the API maximum
+MAX_COMPOSITE_QUERIES = 5
+
+# IDs per IN (...) clause when reading the existing assignments of many users
+USER_CHUNK_SIZE = 200
+
+
+# AssignPermissions assigns permission set licenses, permission set groups and permission sets to any number
+# of users in one pass. Users and permissions are resolved together in a single composite request, the
+# existing PermissionSetLicenseAssign and PermissionSetAssignment rows of every user are read in a few more,
+# and only the missing assignments are inserted through sObject Collections 200 at a time.
+class AssignPermissions(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "access_token": {
+            "description": "The access token for the org. Defaults to the project default",
+        },
+        "users": {
+            "description": "Users to assign to, by username (anything containing @) or alias. Defaults to the "
+            "running user",
+        },
+        "permission_set_licenses": {
+            "description": "Developer names of the permission set licenses to assign",
+        },
+        "permission_set_groups": {
+            "description": "Developer names of the permission set groups to assign",
+        },
+        "permission_sets": {
+            "description": "API names of the permission sets to assign",
+        },
+    }
+
+    # Initialize the task options
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        self.names = {kind: process_list_arg(self.options.get(kind)) or [] for kind in PERMISSION_KINDS}
+        if not any(self.names.values()):
+            raise TaskOptionsError(f"Specify at least one of {', '.join(PERMISSION_KINDS)}")
+        self.users = process_list_arg(self.options.get("users")) or []
+
+    # Prepare runtime by setting up access token, instance URL and the shared Connect API client
+    def _prep_runtime(self):
+        self.access_token = self.options.get("access_token", self.org_config.access_token)
+        self.instance_url = self.options.get("instance_url", self.org_config.instance_url)
+        self.client = ConnectClient.from_task(self)
+        if not self.users:
+            if not self.org_config.username:
+                raise TaskOptionsError("No users given and the org has no running user")
+            self.users = [self.org_config.username]
+
+    # Resolve users and permissions, diff against the existing assignments and insert the missing ones
+    def _run_task(self):
+        self._prep_runtime()
+        users, permissions = self._resolve()
+        user_ids = sorted(set(users.values()))
+        existing = self._existing(user_ids)
+
+        assignments = []
+        self.return_values = {"users": len(user_ids), "assigned": 0, "existing": 0}
+        for kind, config in PERMISSION_KINDS.items():
+            missing = [
+                {"attributes": {"type": config["assignment"]}, "AssigneeId": user_id, config["lookup"]: permission_id}
+                for user_id in user_ids
+                for permission_id in permissions[kind].values()
+                if (user_id, permission_id) not in existing
+            ]
+            already = len(user_ids) * len(permissions[kind]) - len(missing)
+            if permissions[kind]:
+                self.logger.info(
+                    f"{len(missing)} {config['label']} to assign, {already} already assigned to {len(user_ids)} users"
+                )
+            self.return_values["existing"] += already
+            assignments.extend(missing)
+
+        errors = self._insert(assignments, {user_id: name for name, user_id in users.items()})
+        self.return_values["assigned"] = len(assignments) - len(errors)
+        if errors:
+            for error in errors[:MAX_LOGGED_ERRORS]:
+                self.logger.error(error)
+            raise CumulusCIException(f"Could not insert {len(errors)} of {len(assignments)} assignments")
+        self.logger.info(f"Assigned {len(assignments)} permissions to {len(user_ids)} users")
+
+    # User IDs by the given username or alias and permission IDs by kind and name, from one composite request
+    def _resolve(self):
+        usernames = [user for user in self.users if "@" in user]
+        aliases = [user for user in self.users if "@" not in user]
+        queries = {}
+        if usernames:
+            queries["usernames"] = f"SELECT Id, Username FROM User WHERE Username IN {soql_in(usernames)}"
+        if aliases:
+            queries["aliases"] = f"SELECT Id, Alias FROM User WHERE Alias IN {soql_in(aliases)}"
+        for kind, config in PERMISSION_KINDS.items():
+            if self.names[kind]:
+                queries[kind] = (
+                    f"SELECT Id, {config['name']} FROM {config['sobject']} "
+                    f"WHERE {config['name']} IN {soql_in(self.names[kind])}"
+                )
+        results = self._query_all(queries)
+
+        users = {record["Username"]: record["Id"] for record in results.get("usernames", [])}
+        users.update({record["Alias"]: record["Id"] for record in results.get("aliases", [])})
+        missing = [user for user in self.users if user not in users]
+        if missing:
+            raise CumulusCIException(f"No users with username or alias {', '.join(missing)}")
+
+        permissions = {}
+        for kind, config in PERMISSION_KINDS.items():
+            permissions[kind] = {record[config["name"]]: record["Id"] for record in results.get(kind, [])}
+            missing = [name for name in self.names[kind] if name not in permissions[kind]]
+            if missing:
+                raise CumulusCIException(f"No {config['label']} named {', '.join(missing)}")
+        return users, permissions
+
+    # (user ID, permission ID) pairs already assigned: licenses, groups and permission sets
+    def _existing(self, user_ids):
+        lookups = {}
+        for config in PERMISSION_KINDS.values():
+            lookups.setdefault(config["assignment"], []).append(config["lookup"])
+        queries, fields_by_ref = {}, {}
+        for start in range(0, len(user_ids), USER_CHUNK_SIZE):
+            chunk = soql_in(user_ids[start:start + USER_CHUNK_SIZE])
+            for assignment, fields in lookups.items():
+                ref = f"{assignment}_{start}"
+                queries[ref] = f"SELECT AssigneeId, {', '.join(fields)} FROM {assignment} WHERE AssigneeId IN {chunk}"
+                fields_by_ref[ref] = fields
+        existing = set()
+        for ref, records in self._query_all(queries).items():
+            fields = fields_by_ref[ref]
+            for record in records:
+                existing.update((record["AssigneeId"], record[field]) for field in fields if record.get(field))
+        return existing
+
+    # Run queries keyed by reference, MAX_COMPOSITE_QUERIES to a composite request, and return every record of
+    # each one, following nextRecordsUrl for large results
+    def _query_all(self, queries):
+        results = {}
+        refs = list(queries)
+        for start in range(0, len(refs), MAX_COMPOSITE_QUERIES):
+            subrequests = [
+                self.client.subrequest("get", f"query?{urlencode({'q': queries[ref]})}", ref)
+                for ref in refs[start:start + MAX_COMPOSITE_QUERIES]
+            ]
+            responses = self.client.composite(subrequests)
+            if responses is None:
+                raise CumulusCIException("Could not query users and permissions")
+            for subrequest in subrequests:
+                ref = subrequest["referenceId"]
+                response = responses.get(ref) or {}
+                if response.get("httpStatusCode", 500) >= 400:
+                    raise CumulusCIException(f"Query {queries[ref]} failed: {response.get('body')}")
+                body = response["body"]
+                records = body.get("records", [])
+                while not body.get("done", True) and body.get("nextRecordsUrl"):
+                    body = self.client.request("get", f"{self.client.instance_url}{body['nextRecordsUrl']}")
+                    if body is None:
+                        raise CumulusCIException(f"Could not read all results of {queries[ref]}")
+                    records.extend(body.get("records", []))
+                results[ref] = records
+        return results
+
+    # Insert assignments through sObject Collections; returns the errors of the records that failed
+    def _insert(self, assignments, names):
+        url = self.client.build_url("composite/sobjects")
+        errors = []
+        for start in range(0, len(assignments), COLLECTION_SIZE):
+            chunk = assignments[start:start + COLLECTION_SIZE]
+            response = self.client.request("post", url, json={"allOrNone": False, "records": chunk})
+            if response is None:
+                errors.extend(f"{names[record['AssigneeId']]}: insert request failed" for record in chunk)
+                continue
+            for record, outcome in zip(chunk, response):
+                if not outcome.get("success"):
+                    messages = "; ".join(error.get("message", "") for error in outcome.get("errors", []))
+                    errors.append(f"{names[record['AssigneeId']]}: {record['attributes']['type']} {messages}")
+        return errors
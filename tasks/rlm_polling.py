@@ -0,0 +1,40 @@
+import random
+import time
+
+from tasks.rlm_trace import trace_span
+
+DEFAULT_INITIAL_DELAY = 1
+DEFAULT_MAX_DELAY = 30
+DEFAULT_TIMEOUT = 600
+
+
+# Delays of an exponential backoff with jitter: each wait is drawn between half and all of the
+# current step, so concurrent pollers against the same org do not fall into lockstep
+def backoff_delays(initial_delay=DEFAULT_INITIAL_DELAY, max_delay=DEFAULT_MAX_DELAY, factor=2):
+    delay = initial_delay
+    while True:
+        yield random.uniform(delay / 2, delay)
+        delay = min(max_delay, delay * factor)
+
+
+# Call check() until it returns a truthy result or the timeout passes, backing off between attempts.
+# Returns (result, elapsed seconds, attempts); result is the last falsy value on timeout.
+def poll(
+    check,
+    timeout=DEFAULT_TIMEOUT,
+    initial_delay=DEFAULT_INITIAL_DELAY,
+    max_delay=DEFAULT_MAX_DELAY,
+    sleep=None,
+):
+    start = time.monotonic()
+    delays = backoff_delays(initial_delay, max_delay)
+    attempts = 0
+    while True:
+        attempts += 1
+        result = check()
+        elapsed = time.monotonic() - start
+        if result or elapsed >= timeout:
+            return result, elapsed, attempts
+        delay = min(next(delays), max(0, timeout - elapsed))
+        with trace_span("sleep", "sleep", seconds=delay):
+            (sleep or time.sleep)(delay)
@@ -0,0 +1,576 @@
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+from cumulusci.core.utils import process_bool_arg, process_list_arg
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+from tasks.rlm_connect_client import ConnectClient
+from tasks.rlm_http_metrics import percentile
+
+DEFAULT_COLLECTION = os.path.join("postman", "RLM.postman_collection.json")
+DEFAULT_ENVIRONMENT = os.path.join("postman", "RLM QuantumBit Default Environment.postman_environment.json")
+
+# Folders run once before the load folders to capture record IDs into the environment
+DEFAULT_SETUP_FOLDERS = ["Set Environment Variables (Runner)"]
+
+# Read-only folders replayed by every virtual user
+DEFAULT_FOLDERS = ["Product Catalog Management", "Product Discovery"]
+
+VARIABLE_PATTERN = re.compile(r"\{\{([^{}]+)\}\}")
+
+# Postman's dynamic variables, resolved afresh on every use
+DYNAMIC_VARIABLES = {
+    "$guid": lambda: str(uuid.uuid4()),
+    "$randomUUID": lambda: str(uuid.uuid4()),
+    "$timestamp": lambda: str(int(time.time())),
+    "$isoTimestamp": lambda: time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+    "$randomInt": lambda: str(random.randint(0, 1000)),
+}
+
+# Bound on requests per sequence so a setNextRequest loop in a script cannot run forever
+MAX_PASSES = 10
+
+# Node.js program that runs pre-request and test scripts with the parts of the pm API the collection uses.
+# It reads one JSON message per line and answers with the variables the script set, the headers it added,
+# the outcome of its tests and any setNextRequest call.
+SANDBOX_SCRIPT = r"""
+const readline = require("readline");
+const vm = require("vm");
+
+function expect(actual) {
+    const check = (ok, message) => { if (!ok) throw new Error(message); };
+    const show = (value) => JSON.stringify(value);
+    const assertions = {
+        eql: (expected) => check(show(actual) === show(expected), `expected ${show(actual)} to deeply equal ${show(expected)}`),
+        equal: (expected) => check(actual === expected, `expected ${show(actual)} to equal ${show(expected)}`),
+        oneOf: (list) => check(list.includes(actual), `expected ${show(actual)} to be one of ${show(list)}`),
+        include: (part) => check(actual != null && actual.includes(part), `expected ${show(actual)} to include ${show(part)}`),
+        above: (n) => check(actual > n, `expected ${show(actual)} to be above ${n}`),
+        below: (n) => check(actual < n, `expected ${show(actual)} to be below ${n}`),
+        status: (code) => check(actual.code === code, `expected status ${code} but got ${actual.code}`),
+    };
+    const chain = new Proxy(function () {}, {
+        get: (target, name) => assertions[name] || chain,
+        apply: () => chain,
+    });
+    return chain;
+}
+expect.fail = (message) => { throw new Error(message || "expect.fail()"); };
+
+function scope(values, updates) {
+    return {
+        get: (key) => (key in updates ? updates[key] : values[key]) ?? undefined,
+        has: (key) => (key in updates ? updates[key] !== null : key in values),
+        set: (key, value) => { if (value !== undefined) updates[key] = value; },
+        unset: (key) => { updates[key] = null; },
+        toObject: () => Object.fromEntries(
+            Object.entries({ ...values, ...updates }).filter(([, value]) => value !== null)
+        ),
+    };
+}
+
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+    const message = JSON.parse(line);
+    const result = { environment: {}, variables: {}, headers: [], tests: {}, errors: [] };
+    const environment = scope(message.environment, result.environment);
+    const locals = scope(message.variables, result.variables);
+    const variables = {
+        ...locals,
+        get: (key) => { const value = locals.get(key); return value !== undefined ? value : environment.get(key); },
+    };
+    const response = message.response;
+    const tests = {};
+    const pm = {
+        environment,
+        variables,
+        collectionVariables: environment,
+        globals: environment,
+        expect,
+        test: (name, fn) => {
+            try {
+                fn();
+                tests[name] = true;
+            } catch (e) {
+                tests[name] = false;
+                result.errors.push(`${name}: ${e.message}`);
+            }
+        },
+        request: {
+            url: message.request.url,
+            method: message.request.method,
+            headers: {
+                add: (header) => result.headers.push(header),
+                upsert: (header) => result.headers.push(header),
+            },
+        },
+        response: response && {
+            code: response.code,
+            status: response.status,
+            responseTime: response.time,
+            headers: { get: (name) => response.headers[name.toLowerCase()] },
+            json: () => JSON.parse(response.body),
+            text: () => response.body,
+            to: { have: { status: (code) => expect({ code: response.code }).to.have.status(code) } },
+        },
+        visualizer: { set: () => {} },
+    };
+    const postman = {
+        setNextRequest: (name) => { result.next = name; },
+        setEnvironmentVariable: environment.set,
+        getEnvironmentVariable: environment.get,
+        clearEnvironmentVariable: environment.unset,
+        setGlobalVariable: environment.set,
+        getGlobalVariable: environment.get,
+    };
+    const context = {
+        pm,
+        postman,
+        tests,
+        console: { log: () => {}, info: () => {}, warn: () => {}, error: () => {} },
+        responseBody: response ? response.body : undefined,
+        responseCode: response ? { code: response.code, name: response.status } : undefined,
+        responseTime: response ? response.time : undefined,
+        JSON,
+    };
+    try {
+        vm.runInNewContext(message.script, context, { timeout: 5000 });
+    } catch (e) {
+        result.errors.push(e.message);
+    }
+    for (const [name, passed] of Object.entries(tests)) {
+        result.tests[name] = Boolean(passed);
+    }
+    process.stdout.write(JSON.stringify(result) + "\n");
+});
+"""
+
+
+# Replace {{variables}} with their values from the first scope that has them; unknown names are left alone,
+# as Postman does
+def substitute(text, *scopes):
+    def replace(match):
+        name = match.group(1).strip()
+        if name in DYNAMIC_VARIABLES:
+            return DYNAMIC_VARIABLES[name]()
+        for values in scopes:
+            if values.get(name) is not None:
+                return str(values[name])
+        return match.group(0)
+
+    return VARIABLE_PATTERN.sub(replace, text) if isinstance(text, str) else text
+
+
+# Enabled values of a Postman environment file
+def load_environment(path):
+    with open(path) as f:
+        environment = json.load(f)
+    return {value["key"]: value.get("value", "") for value in environment.get("values", []) if value.get("enabled", True)}
+
+
+# One request of a collection with the scripts it inherits from the collection and its folders
+class PostmanRequest:
+
+    def __init__(self, item, folder, prerequest, test):
+        request = item["request"]
+        url = request.get("url", "")
+        self.name = item["name"]
+        self.folder = folder
+        self.method = request.get("method", "GET").upper()
+        self.url = url.get("raw", "") if isinstance(url, dict) else url
+        self.headers = [header for header in request.get("header", []) if not header.get("disabled")]
+        self.body = request.get("body") or {}
+        self.prerequest = prerequest + script_of(item, "prerequest")
+        self.test = test + script_of(item, "test")
+
+    @property
+    def key(self):
+        return f"{self.folder}/{self.name}"
+
+    def __repr__(self):
+        return f"PostmanRequest({self.method} {self.key})"
+
+
+# Source of an item's script for an event, as a one element list, or an empty list when it has none
+def script_of(item, listen):
+    scripts = []
+    for event in item.get("event", []):
+        if event.get("listen") == listen and not event.get("disabled"):
+            source = event.get("script", {}).get("exec", [])
+            source = "\n".join(source) if isinstance(source, list) else source
+            if source.strip():
+                scripts.append(source)
+    return scripts
+
+
+# A Postman v2.1 collection; folders are looked up by name at any depth, or by their path such as
+# "Salesforce Pricing/3-Part Simple Request"
+class PostmanCollection:
+
+    def __init__(self, path):
+        with open(path) as f:
+            self.collection = json.load(f)
+        self.folders = {}
+        self._visit(self.collection, [], script_of(self.collection, "prerequest"), script_of(self.collection, "test"))
+
+    def _visit(self, folder, path, prerequest, test):
+        sequence = []
+        for item in folder.get("item", []):
+            if "item" in item:
+                child_path = path + [item["name"]]
+                child = self._visit(
+                    item, child_path, prerequest + script_of(item, "prerequest"), test + script_of(item, "test")
+                )
+                self.folders.setdefault(item["name"], child)
+                self.folders["/".join(child_path)] = child
+                sequence.extend(child)
+            elif "request" in item:
+                sequence.append(PostmanRequest(item, "/".join(path), prerequest, test))
+        return sequence
+
+    # Requests of a folder, including those of its subfolders, in collection order
+    def requests(self, folder):
+        if folder not in self.folders:
+            raise TaskOptionsError(f"Folder {folder} is not in the collection")
+        return self.folders[folder]
+
+
+# ScriptSandbox runs collection scripts in a long-lived Node.js process. Each virtual user has its own, so the
+# users' scripts run side by side instead of queueing on one process.
+class ScriptSandbox:
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            ["node", "-e", SANDBOX_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+
+    def run(self, script, request, response, environment, variables):
+        message = {
+            "script": script,
+            "request": request,
+            "response": response,
+            "environment": environment,
+            "variables": variables,
+        }
+        self.process.stdin.write(json.dumps(message, default=str) + "\n")
+        self.process.stdin.flush()
+        line = self.process.stdout.readline()
+        if not line:
+            raise CumulusCIException("The script sandbox exited unexpectedly")
+        return json.loads(line)
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(timeout=10)
+
+
+# ReplayPostmanCollection replays folders of the RLM Postman collection against an org, resolving {{variables}}
+# and running the collection's pre-request and test scripts so IDs captured by one request feed the next. Setup
+# folders run once, and the load is not replayed when any of them fails; the load folders are then replayed by
+# several concurrent virtual users, each with its own copy of the environment and its own script sandbox, and
+# per-request latency percentiles and throughput are reported.
+class ReplayPostmanCollection(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "access_token": {
+            "description": "The access token for the org. Defaults to the project default",
+        },
+        "collection": {
+            "description": f"Path of the Postman collection. Defaults to {DEFAULT_COLLECTION}",
+        },
+        "environment": {
+            "description": f"Path of the Postman environment. Defaults to {DEFAULT_ENVIRONMENT}",
+        },
+        "setup": {
+            "description": f"Folders run once before the load. Defaults to {', '.join(DEFAULT_SETUP_FOLDERS)}",
+        },
+        "folders": {
+            "description": f"Folders replayed by every virtual user. Defaults to {', '.join(DEFAULT_FOLDERS)}",
+        },
+        "users": {
+            "description": "Number of concurrent virtual users. Defaults to 1",
+        },
+        "iterations": {
+            "description": "Number of times each virtual user replays the folders. Defaults to 1",
+        },
+        "variables": {
+            "description": "Map of environment variables overriding the environment file",
+        },
+        "output": {
+            "description": "Path of a JSON file to write the report to",
+        },
+        "fail_on_error": {
+            "description": "Fail when any request returns an error status or fails a test. Defaults to True",
+        },
+    }
+
+    # Initialize the task options
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        self.collection_path = self.options.get("collection") or DEFAULT_COLLECTION
+        self.environment_path = self.options.get("environment") or DEFAULT_ENVIRONMENT
+        for path in (self.collection_path, self.environment_path):
+            if not os.path.exists(path):
+                raise TaskOptionsError(f"File not found: {path}")
+        setup = self.options.get("setup")
+        self.setup_folders = DEFAULT_SETUP_FOLDERS if setup is None else process_list_arg(setup) or []
+        self.folders = process_list_arg(self.options.get("folders")) or DEFAULT_FOLDERS
+        self.users = int(self.options.get("users") or 1)
+        self.iterations = int(self.options.get("iterations") or 1)
+        self.fail_on_error = process_bool_arg(self.options.get("fail_on_error", True))
+
+    # Prepare runtime by setting up access token, instance URL and the shared Connect API client
+    def _prep_runtime(self):
+        self.access_token = self.options.get("access_token", self.org_config.access_token)
+        self.instance_url = self.options.get("instance_url", self.org_config.instance_url)
+        self.client = ConnectClient.from_task(self, pool_size=max(self.users, 10))
+
+    # Run the setup folders, replay the load folders with every virtual user and report the results
+    def _run_task(self):
+        self._prep_runtime()
+        self.collection = PostmanCollection(self.collection_path)
+        setup = [request for folder in self.setup_folders for request in self.collection.requests(folder)]
+        load = [request for folder in self.folders for request in self.collection.requests(folder)]
+        self.samples = []
+        self.samples_lock = threading.Lock()
+        self.phase = "setup"
+        self.scripts = bool(shutil.which("node"))
+        if not self.scripts:
+            self.logger.warning(
+                "node was not found: the collection's pre-request and test scripts are SKIPPED, so no tests are "
+                "checked and no IDs are captured into the environment; requests that use captured IDs will fail"
+            )
+
+        environment = self._initial_environment()
+        if setup:
+            self.logger.info(f"Running {len(setup)} setup requests from {', '.join(self.setup_folders)}")
+            with self._sandbox() as sandbox:
+                self._run_sequence(setup, environment, {}, "setup", sandbox)
+            setup_errors = sum(sample["failed"] for sample in self.samples)
+            if setup_errors:
+                message = f"{setup_errors} of {len(self.samples)} setup requests failed"
+                if self.fail_on_error:
+                    raise CumulusCIException(f"{message}; the load folders were not replayed")
+                self.logger.warning(f"{message}; the load replays with whatever the setup captured")
+        self.phase = "load"
+
+        self.logger.info(
+            f"Replaying {len(load)} requests from {', '.join(self.folders)} with {self.users} virtual users "
+            f"x {self.iterations} iterations"
+        )
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.users) as executor:
+            futures = [executor.submit(self._run_user, load, environment, user) for user in range(self.users)]
+            for future in futures:
+                future.result()
+        wall = time.perf_counter() - start
+
+        report = self._report(wall)
+        self.return_values = report
+        self._log_report(report)
+        if self.options.get("output"):
+            with open(self.options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+        if self.fail_on_error and report["errors"]:
+            raise CumulusCIException(f"{report['errors']} of {report['requests']} replayed requests failed")
+
+    # Environment file values, pointed at the org, overlaid with the variables option
+    def _initial_environment(self):
+        environment = load_environment(self.environment_path)
+        environment.update({"url": self.instance_url, "_endpoint": self.instance_url})
+        if not environment.get("version"):
+            environment["version"] = self.project_config.project__package__api_version
+        environment.update(self.options.get("variables") or {})
+        return environment
+
+    # Script sandbox of one virtual user, or None when node is not available
+    @contextmanager
+    def _sandbox(self):
+        sandbox = ScriptSandbox() if self.scripts else None
+        try:
+            yield sandbox
+        finally:
+            if sandbox:
+                sandbox.close()
+
+    # Replay the load folders iterations times with a private copy of the environment and its own sandbox
+    def _run_user(self, load, environment, user):
+        with self._sandbox() as sandbox:
+            for iteration in range(self.iterations):
+                self._run_sequence(load, dict(environment), {}, f"user {user + 1}", sandbox)
+
+    # Run requests in order, following setNextRequest calls made by their scripts
+    def _run_sequence(self, sequence, environment, variables, label, sandbox):
+        positions = {request.name: index for index, request in enumerate(sequence)}
+        index = 0
+        executed = 0
+        while index < len(sequence) and executed < len(sequence) * MAX_PASSES:
+            executed += 1
+            next_request = self._execute(sequence[index], environment, variables, label, sandbox)
+            if next_request is None:
+                index += 1
+            elif next_request == "":
+                self.logger.info(f"{label}: stopped after {sequence[index].key}")
+                return
+            elif next_request in positions:
+                index = positions[next_request]
+            else:
+                self.logger.warning(f"{label}: setNextRequest to unknown request {next_request}, stopping")
+                return
+
+    # Send one request between its pre-request and test scripts; returns the next request a script chose, "" to
+    # stop, or None to continue in order
+    def _execute(self, request, environment, variables, label, sandbox):
+        extra_headers = []
+        errors = []
+        script_request = {"method": request.method, "url": request.url}
+        for script in request.prerequest:
+            outcome = self._run_script(sandbox, script, script_request, None, environment, variables)
+            extra_headers.extend(outcome.get("headers", []))
+            errors.extend(outcome.get("errors", []))
+
+        url = substitute(request.url, variables, environment)
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        for header in request.headers + extra_headers:
+            headers[header["key"]] = substitute(header.get("value", ""), variables, environment)
+        kwargs = {"headers": headers}
+        if request.body.get("mode") == "raw" and request.body.get("raw"):
+            kwargs["data"] = substitute(request.body["raw"], variables, environment).encode()
+            language = request.body.get("options", {}).get("raw", {}).get("language", "json")
+            if language == "json" and not any(key.lower() == "content-type" for key in headers):
+                headers["Content-Type"] = "application/json"
+        elif request.body.get("mode") in ("urlencoded", "formdata"):
+            kwargs["data"] = {
+                field["key"]: substitute(field.get("value", ""), variables, environment)
+                for field in request.body[request.body["mode"]]
+                if not field.get("disabled")
+            }
+
+        start = time.perf_counter()
+        try:
+            response = self.client.send(request.method, url, **kwargs)
+            status, body, response_headers = response.status_code, response.text, dict(response.headers)
+        except requests.RequestException as e:
+            status, body, response_headers = 0, "", {}
+            errors.append(str(e))
+        latency = time.perf_counter() - start
+
+        next_request = None
+        tests = {}
+        script_response = {
+            "code": status,
+            "status": response.reason if status else "",
+            "time": round(latency * 1000),
+            "headers": {key.lower(): value for key, value in response_headers.items()},
+            "body": body,
+        }
+        for script in request.test:
+            outcome = self._run_script(sandbox, script, script_request, script_response, environment, variables)
+            tests.update(outcome.get("tests", {}))
+            errors.extend(outcome.get("errors", []))
+            if "next" in outcome:
+                next_request = outcome["next"] or ""
+
+        # A script that throws fails the request too, as in Newman; a failed capture must not pass unnoticed
+        failed = status == 0 or status >= 400 or bool(errors) or not all(tests.values())
+        if failed:
+            detail = "; ".join(errors) or body[:200]
+            self.logger.warning(f"{label}: {request.method} {request.key} returned {status}: {detail}")
+        with self.samples_lock:
+            self.samples.append(
+                {
+                    "phase": self.phase,
+                    "request": request.key,
+                    "method": request.method,
+                    "status": status,
+                    "latency": latency,
+                    "failed": failed,
+                }
+            )
+        return next_request
+
+    # Run a script and apply the variables it set; a no-op when node is not available
+    def _run_script(self, sandbox, script, request, response, environment, variables):
+        if not sandbox:
+            return {}
+        outcome = sandbox.run(script, request, response, environment, variables)
+        for values, updates in ((environment, outcome.get("environment", {})), (variables, outcome.get("variables", {}))):
+            for key, value in updates.items():
+                if value is None:
+                    values.pop(key, None)
+                else:
+                    values[key] = value
+        return outcome
+
+    # Per-request latency percentiles (in milliseconds), errors and the throughput of the load phase
+    def _report(self, wall):
+        load = [sample for sample in self.samples if sample["phase"] == "load"]
+        by_request = {}
+        for sample in load:
+            by_request.setdefault(sample["request"], []).append(sample)
+        rows = []
+        for name, samples in by_request.items():
+            latencies = sorted(sample["latency"] * 1000 for sample in samples)
+            statuses = {}
+            for sample in samples:
+                statuses[str(sample["status"])] = statuses.get(str(sample["status"]), 0) + 1
+            rows.append(
+                {
+                    "request": name,
+                    "method": samples[0]["method"],
+                    "calls": len(samples),
+                    "errors": sum(sample["failed"] for sample in samples),
+                    "p50_ms": percentile(latencies, 50),
+                    "p95_ms": percentile(latencies, 95),
+                    "p99_ms": percentile(latencies, 99),
+                    "statuses": statuses,
+                }
+            )
+        latencies = sorted(sample["latency"] * 1000 for sample in load)
+        return {
+            "users": self.users,
+            "iterations": self.iterations,
+            "requests": len(load),
+            "errors": sum(sample["failed"] for sample in load),
+            "setup_errors": sum(sample["failed"] for sample in self.samples if sample["phase"] == "setup"),
+            "scripts": self.scripts,
+            "wall": wall,
+            "throughput": len(load) / wall if wall else 0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "by_request": rows,
+        }
+
+    def _log_report(self, report):
+        self.logger.info("")
+        self.logger.info(f"{'Request':<60} {'Calls':>6} {'Errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for row in report["by_request"]:
+            self.logger.info(
+                f"{row['request'][:60]:<60} {row['calls']:>6} {row['errors']:>6} "
+                f"{row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} {row['p99_ms']:>8.0f}"
+            )
+        if report["requests"]:
+            self.logger.info(
+                f"{report['requests']} requests in {report['wall']:.1f}s ({report['throughput']:.1f}/s), "
+                f"p50 {report['p50_ms']:.0f} ms, p95 {report['p95_ms']:.0f} ms, p99 {report['p99_ms']:.0f} ms, "
+                f"{report['errors']} errors"
+            )
+        if not report["scripts"]:
+            self.logger.warning("Collection scripts were skipped (node not found): no tests checked, nothing captured")
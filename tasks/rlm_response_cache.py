@@ -0,0 +1,142 @@
+import glob
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from tasks.rlm_org_state import clear_state, content_hash, load_state, save_state, state_dir
+
+# Directory below an org's state directory holding its cached GET responses
+CACHE_DIRECTORY = "responses"
+
+# Version prefix of REST and Connect API paths, stripped to find the resource a URL belongs to
+API_PATH_PATTERN = re.compile(r"^/services/data/v[\d.]+/")
+
+# Resources whose writes may touch anything, so a write to them drops every cached response of the org
+COMPOSITE_RESOURCES = {"composite", "composite/batch", "composite/tree"}
+
+# Cache directories are shared by every client of the same org in the process
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _directory_lock(directory):
+    with _locks_lock:
+        return _locks.setdefault(directory, threading.Lock())
+
+
+# Resource family of a URL: the first two segments of its path below the API version, e.g.
+# connect/context-definitions for connect/context-definitions/11O.../context-mappings
+def resource_family(url):
+    path = API_PATH_PATTERN.sub("", urlparse(url).path).strip("/")
+    return "/".join(path.split("/")[:2])
+
+
+# ResponseCache keeps decoded GET responses of one org on disk below .cci/rlm/<org>/responses, keyed by URL,
+# query parameters and API version. Entries the server gave an ETag or Last-Modified are always revalidated
+# with a conditional GET; others are served locally until they are ttl seconds old, unless the caller asks for
+# revalidation, in which case the Date of the stored response is sent as If-Modified-Since (as sObject
+# describes support) so changes made by deploys outside the client are never missed. The least recently used
+# entries are evicted once the directory grows past max_bytes, and a write through the client drops the cached
+# responses of the resource family it wrote to.
+class ResponseCache:
+
+    def __init__(self, directory, api_version, ttl, max_bytes):
+        self.directory = directory
+        self.api_version = api_version
+        self.ttl = float(ttl)
+        self.max_bytes = int(max_bytes)
+        self.lock = _directory_lock(directory)
+
+    # Cache of the org a task runs against
+    @classmethod
+    def for_org(cls, project_config, org, api_version, settings):
+        return cls(
+            os.path.join(state_dir(project_config, org), CACHE_DIRECTORY),
+            api_version,
+            settings["cache_ttl"],
+            settings["cache_max_bytes"],
+        )
+
+    # Entry files are prefixed with a hash of their resource family so invalidation needs no reads
+    def _path(self, url, params):
+        family = content_hash(resource_family(url))
+        return os.path.join(self.directory, f"{family}-{content_hash(self.api_version, url, params)}.json")
+
+    # The cached entry for a request, marked as recently used, or None
+    def get(self, url, params=None):
+        path = self._path(url, params)
+        entry = load_state(path)
+        if not entry:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    # Whether an entry can be used without asking the server
+    def fresh(self, entry, revalidate=False):
+        return not revalidate and not self.validators(entry) and time.time() - entry["stored"] < self.ttl
+
+    # Conditional request headers that revalidate an entry
+    @staticmethod
+    def validators(entry, revalidate=False):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        elif revalidate and entry.get("date"):
+            headers["If-Modified-Since"] = entry["date"]
+        return headers
+
+    # Store a successful response and evict the least recently used entries beyond max_bytes
+    def put(self, url, params, response, body):
+        entry = {
+            "url": url,
+            "params": params,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "date": response.headers.get("Date"),
+            "stored": time.time(),
+            "body": body,
+        }
+        with self.lock:
+            save_state(self._path(url, params), entry)
+            self._evict()
+
+    # Restart the age of an entry the server confirmed unchanged
+    def revalidated(self, url, params, entry):
+        entry["stored"] = time.time()
+        with self.lock:
+            save_state(self._path(url, params), entry)
+
+    # Drop the cached responses a write to url may have changed
+    def invalidate(self, url):
+        family = resource_family(url)
+        pattern = "*.json" if family in COMPOSITE_RESOURCES else f"{content_hash(family)}-*.json"
+        with self.lock:
+            for path in glob.glob(os.path.join(self.directory, pattern)):
+                clear_state(path)
+
+    def clear(self):
+        with self.lock:
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                clear_state(path)
+
+    def _evict(self):
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            clear_state(path)
+            total -= size
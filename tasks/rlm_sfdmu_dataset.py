@@ -0,0 +1,167 @@
+import csv
+import json
+import os
+import re
+
+# Lookup relationships whose target object is not named after the relationship itself
+RELATIONSHIP_TARGETS = {
+    "BasedOn": "ProductClassification",
+    "Catalog": "ProductCatalog",
+    "ChildProduct": "Product2",
+    "ChildSellingModel": "ProductSellingModel",
+    "ExpressionSetDefinitionVer": "ExpressionSetDefinitionVersion",
+    "MasterRecord": "Account",
+    "OverriddenProductAttributeDefinition": "ProductAttributeDefinition",
+    "Parent": "Account",
+    "ParentCategory": "ProductCategory",
+    "ParentProduct": "Product2",
+    "ParentProductSellingModel": "ProductSellingModel",
+    "ParentSellingModel": "ProductSellingModel",
+    "Picklist": "AttributePicklist",
+    "Product": "Product2",
+    "ProductClassificationAttribute": "ProductClassificationAttr",
+    "ReportsTo": "Contact",
+    "RootBundle": "Product2",
+    "RootProductSellingModel": "ProductSellingModel",
+}
+
+QUERY_PATTERN = re.compile(r"SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<sobject>\w+)", re.IGNORECASE | re.DOTALL)
+KEY_PREFIX = "$$"
+KEY_SEPARATOR = ";"
+
+# Fields tried, in order, as the external ID of objects whose export.json entry does not name one
+DEFAULT_KEY_FIELDS = ["Name", "DeveloperName", "ApiName"]
+
+
+# Join the parts of a composite external ID the way sfdmu writes them: empty and false parts are dropped
+def composite_key(values):
+    return KEY_SEPARATOR.join(str(value) for value in values if value not in (None, "", "false"))
+
+
+# Split a key spec such as "$$Name$Catalog.Name" or "Name;Catalog.Name" into its parts
+def key_spec_parts(spec):
+    if spec.startswith(KEY_PREFIX):
+        return spec[len(KEY_PREFIX):].split("$")
+    return [part.strip() for part in re.split(r"[;,]", spec) if part.strip()]
+
+
+# Name of the lookup field behind a relationship name
+def lookup_field(relationship):
+    if relationship.endswith("__r"):
+        return relationship[:-3] + "__c"
+    return relationship + "Id"
+
+
+# Lookup column of a dataset CSV, e.g. "ParentCategory.$$Name$Catalog.Name$ParentCategory.Name"
+class Lookup:
+
+    def __init__(self, column):
+        self.column = column
+        self.relationship, self.spec = column.split(".", 1)
+        self.field = lookup_field(self.relationship)
+        self.target = None
+
+    def __repr__(self):
+        return f"Lookup({self.column} -> {self.target})"
+
+
+# One object of an sfdmu export.json together with the layout of its CSV file
+class DatasetObject:
+
+    def __init__(self, directory, definition):
+        match = QUERY_PATTERN.match(definition["query"].strip())
+        self.query = definition["query"]
+        self.sobject = match.group("sobject")
+        self.fields = [field.strip() for field in match.group("fields").split(",") if field.strip()]
+        self.operation = definition.get("operation", "Upsert")
+        self.excluded = str(definition.get("excluded", False)).lower() == "true"
+        self.csv_path = os.path.join(directory, f"{self.sobject}.csv")
+        self.columns = []
+        if os.path.exists(self.csv_path):
+            with open(self.csv_path, newline="", encoding="utf-8-sig") as f:
+                self.columns = next(csv.reader(f), [])
+        self.external_id = definition.get("externalId") or next(
+            (field for field in DEFAULT_KEY_FIELDS if field in self.columns), "Name"
+        )
+        self.key_parts = key_spec_parts(self.external_id)
+        self.key_column = next((c for c in self.columns if c.startswith(KEY_PREFIX)), None)
+        self.lookups = [
+            Lookup(column) for column in self.columns if "." in column and not column.startswith(KEY_PREFIX)
+        ]
+        lookup_fields = {lookup.field for lookup in self.lookups}
+        self.value_columns = [
+            column
+            for column in self.columns
+            if "." not in column and not column.startswith(KEY_PREFIX) and column != "Id" and column not in lookup_fields
+        ]
+
+    # Lookups whose target is this object itself (e.g. ProductCategory.ParentCategory)
+    @property
+    def self_lookups(self):
+        return [lookup for lookup in self.lookups if lookup.target == self.sobject]
+
+    # External ID of a CSV row, built from its key part columns when the CSV has them all and taken from
+    # the sfdmu key column otherwise (parts reached through a lookup are only present there)
+    def row_key(self, row):
+        if self.key_column and not all(part in row for part in self.key_parts):
+            return row.get(self.key_column) or ""
+        return composite_key(row.get(part, "") for part in self.key_parts)
+
+    # Stream the CSV rows as dicts without loading the file into memory
+    def iter_rows(self):
+        if not os.path.exists(self.csv_path):
+            return
+        with open(self.csv_path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+
+    def __repr__(self):
+        return f"DatasetObject({self.sobject}, {self.operation}, {self.external_id})"
+
+
+# An sfdmu dataset directory: export.json plus one CSV per object
+class Dataset:
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "export.json")) as f:
+            self.export = json.load(f)
+        self.objects = [
+            DatasetObject(directory, definition)
+            for object_set in self.export.get("objectSets", [])
+            for definition in object_set.get("objects", [])
+        ]
+        self.objects = [obj for obj in self.objects if not obj.excluded]
+        self.by_name = {obj.sobject: obj for obj in self.objects}
+        for obj in self.objects:
+            for lookup in obj.lookups:
+                lookup.target = self.relationship_target(lookup.relationship)
+
+    # Object a relationship points at, using the known aliases and falling back to the relationship name
+    def relationship_target(self, relationship):
+        return RELATIONSHIP_TARGETS.get(relationship, relationship)
+
+    # Dataset objects each object depends on through its lookups (self-references excluded)
+    def dependencies(self):
+        return {
+            obj.sobject: {
+                lookup.target
+                for lookup in obj.lookups
+                if lookup.target in self.by_name and lookup.target != obj.sobject
+            }
+            for obj in self.objects
+        }
+
+    # Objects grouped into waves that can be loaded in parallel, each wave depending only on earlier ones
+    def waves(self):
+        pending = self.dependencies()
+        done = set()
+        waves = []
+        while pending:
+            wave = [name for name, deps in pending.items() if deps <= done]
+            if not wave:
+                raise ValueError(f"Circular lookups between {', '.join(sorted(pending))}")
+            waves.append(wave)
+            done.update(wave)
+            for name in wave:
+                del pending[name]
+        return waves
@@ -0,0 +1,422 @@
+import csv
+import itertools
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+
+from tasks.rlm_load_dataset import (
+    DEFAULT_BULK_THRESHOLD,
+    MAX_LOGGED_ERRORS,
+    SUPPORTED_OPERATIONS,
+    LoadDataset,
+    bulk_csv,
+    key_value,
+    record_path,
+)
+from tasks.rlm_org_state import org_key, state_dir
+from tasks.rlm_sfdmu_dataset import KEY_SEPARATOR, Dataset, composite_key, key_spec_parts
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_MAX_JOBS = 4
+
+# Index entries held in memory before the whole index moves to SQLite
+DEFAULT_INDEX_MEMORY = 200000
+
+# Directory below an org's state directory holding the spilled indexes of running loads
+INDEX_DIRECTORY = "stream"
+
+# Rows written to the index per SQLite statement
+INDEX_BATCH_SIZE = 5000
+
+# Errors kept per object; the counts stay exact
+MAX_KEPT_ERRORS = 100
+
+
+# Resident set size of the process in bytes: current from /proc where there is one, else the peak so far
+def resident_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# ExternalIdIndex maps external ID keys to record IDs for any number of named indexes (one per object and
+# key spec). Entries live in dictionaries until there are more than memory_limit of them, after which
+# everything moves to a SQLite file so memory no longer grows with the size of the data.
+class ExternalIdIndex:
+
+    def __init__(self, path, memory_limit):
+        self.path = path
+        self.memory_limit = memory_limit
+        self.lock = threading.Lock()
+        self.memory = {}
+        self.size = 0
+        self.db = None
+
+    @property
+    def spilled(self):
+        return self.db is not None
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute("CREATE TABLE ids (name TEXT, key TEXT, id TEXT, PRIMARY KEY (name, key)) WITHOUT ROWID")
+        return db
+
+    # Move every entry to SQLite; the caller holds the lock
+    def _spill(self):
+        self.db = self._connect()
+        self.db.execute("BEGIN")
+        for name, entries in self.memory.items():
+            self.db.executemany("INSERT OR REPLACE INTO ids VALUES (?, ?, ?)", ((name, k, v) for k, v in entries.items()))
+        self.db.execute("COMMIT")
+        self.memory = {}
+
+    def _add(self, name, batch):
+        with self.lock:
+            if not self.spilled and self.size + len(batch) > self.memory_limit:
+                self._spill()
+            if self.spilled:
+                self.db.executemany("INSERT OR REPLACE INTO ids VALUES (?, ?, ?)", ((name, k, v) for k, v in batch))
+            else:
+                entries = self.memory.setdefault(name, {})
+                before = len(entries)
+                entries.update(batch)
+                self.size += len(entries) - before
+
+    # Replace the entries of an index with (key, record ID) pairs, read as they are produced
+    def replace(self, name, pairs):
+        with self.lock:
+            self.size -= len(self.memory.pop(name, {}))
+            if self.spilled:
+                self.db.execute("DELETE FROM ids WHERE name = ?", (name,))
+        pairs = iter(pairs)
+        while True:
+            batch = list(itertools.islice(pairs, INDEX_BATCH_SIZE))
+            if not batch:
+                break
+            self._add(name, batch)
+
+    def get(self, name, key):
+        with self.lock:
+            if not self.spilled:
+                return self.memory.get(name, {}).get(key)
+            row = self.db.execute("SELECT id FROM ids WHERE name = ? AND key = ?", (name, key)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+                os.remove(self.path)
+            self.memory = {}
+            self.size = 0
+
+
+# Read-only mapping view of one named index, for code that expects a dict of key to record ID
+class IndexView:
+
+    def __init__(self, index, name):
+        self.index = index
+        self.name = name
+
+    def get(self, key, default=None):
+        record_id = self.index.get(self.name, key)
+        return default if record_id is None else record_id
+
+
+# StreamLoadDataset loads sfdmu datasets too large to hold in memory, such as generated catalogs with
+# hundreds of thousands of products and price book entries per currency. Each CSV is read in chunks; lookups
+# are resolved against an external ID index of the records in the org, queried page by page after each
+# parent object is loaded and spilled to SQLite once it is large; and every chunk becomes a Bulk API 2.0 job,
+# with at most max_jobs jobs in flight across all objects so reading waits for the org instead of piling up
+# chunks. Peak memory is set by chunk_size, max_jobs and index_memory, not by the size of the files. Rows that
+# look up a parent row of their own object are set aside in a temporary file and loaded in a later pass.
+class StreamLoadDataset(LoadDataset):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "access_token": {
+            "description": "The access token for the org. Defaults to the project default",
+        },
+        "dataset": {
+            "description": "Path of the sfdmu dataset directory containing export.json",
+            "required": True,
+        },
+        "max_workers": {
+            "description": "Number of objects read at the same time. Defaults to 4",
+        },
+        "bulk_threshold": {
+            "description": "Rows from which an object is loaded through Bulk API 2.0 rather than sObject "
+            f"Collections. Defaults to {DEFAULT_BULK_THRESHOLD}",
+        },
+        "chunk_size": {
+            "description": f"Rows per chunk and Bulk API 2.0 job. Defaults to {DEFAULT_CHUNK_SIZE}",
+        },
+        "max_jobs": {
+            "description": f"Bulk API 2.0 jobs in flight at once across all objects. Defaults to {DEFAULT_MAX_JOBS}",
+        },
+        "index_memory": {
+            "description": "External ID index entries kept in memory before the index moves to a SQLite file. "
+            f"Defaults to {DEFAULT_INDEX_MEMORY}",
+        },
+    }
+
+    # Initialize the task options
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.chunk_size = int(self.options.get("chunk_size") or DEFAULT_CHUNK_SIZE)
+        self.max_jobs = int(self.options.get("max_jobs") or DEFAULT_MAX_JOBS)
+        self.index_memory = int(self.options.get("index_memory") or DEFAULT_INDEX_MEMORY)
+        if self.chunk_size < 1 or self.max_jobs < 1:
+            raise TaskOptionsError("chunk_size and max_jobs must be at least 1")
+
+    # Load the objects wave by wave, the objects of a wave side by side, sharing the Bulk API 2.0 job slots. An
+    # object that looks up an object that failed is left out.
+    def _run_task(self):
+        self._prep_runtime()
+        self.dataset = Dataset(self.dataset_path)
+        waves = self.dataset.waves()
+        self.logger.info(
+            f"Streaming {len(self.dataset.objects)} objects from {self.dataset_path} in chunks of {self.chunk_size} "
+            f"rows, at most {self.max_jobs} Bulk API 2.0 jobs at a time"
+        )
+        self.lock = threading.Lock()
+        self.describes = {}
+        self.results = {}
+        self.fresh = set()
+        self.index_locks = {}
+        self.index = ExternalIdIndex(
+            os.path.join(
+                state_dir(self.project_config, org_key(self.org_config, self.instance_url)),
+                INDEX_DIRECTORY,
+                os.path.basename(os.path.normpath(self.dataset_path)) + ".sqlite",
+            ),
+            self.index_memory,
+        )
+        self.slots = threading.BoundedSemaphore(self.max_jobs)
+        # Objects that failed, or were left out because an object they look up failed
+        dependencies = self.dataset.dependencies()
+        failed = set()
+        start_rss = resident_bytes()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_jobs) as self.jobs:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    for wave in waves:
+                        futures = {}
+                        for name in wave:
+                            if dependencies[name] & failed:
+                                self.results[name] = self._blocked(name, dependencies[name] & failed)
+                            else:
+                                futures[executor.submit(self._stream_object, self.dataset.by_name[name])] = name
+                        for future, name in futures.items():
+                            try:
+                                self.results[name] = future.result()
+                            except Exception as e:
+                                self.results[name] = {"failed": 1, "errors": [str(e)]}
+                        failed.update(
+                            name for name in wave if self.results[name].get("failed") or self.results[name].get("blocked_by")
+                        )
+        finally:
+            self.index.close()
+
+        self.return_values = {"objects": self.results, "start_rss": start_rss, "peak_rss": resident_bytes()}
+        self._log_results()
+        self._raise_failures()
+
+    def _log_results(self):
+        self.logger.info(
+            f"{'Object':<32} {'Rows':>9} {'Inserted':>9} {'Updated':>9} {'Skipped':>9} {'Failed':>7} "
+            f"{'Secs':>7} {'Rows/s':>8} {'Peak MB':>8}"
+        )
+        for obj in self.dataset.objects:
+            result = self.results.get(obj.sobject, {})
+            self.logger.info(
+                f"{obj.sobject:<32} {result.get('rows', 0):>9} {result.get('inserted', 0):>9} "
+                f"{result.get('updated', 0):>9} {result.get('skipped', 0):>9} {result.get('failed', 0):>7} "
+                f"{result.get('elapsed', 0):>7.1f} {result.get('rows_per_second', 0):>8.0f} "
+                f"{result.get('peak_rss', 0) / 1e6:>8.0f}"
+            )
+            for error in result.get("errors", [])[:MAX_LOGGED_ERRORS]:
+                self.logger.error(f"  {obj.sobject}: {error}")
+
+    # Stream one object's CSV into the org. Each pass reads its rows chunk by chunk; rows whose parent in the
+    # same object is not loaded yet go to a temporary file that the next pass reads, once the jobs of this
+    # pass are done and the object's index has been refreshed.
+    def _stream_object(self, obj):
+        start = time.perf_counter()
+        if obj.operation not in SUPPORTED_OPERATIONS:
+            raise CumulusCIException(f"Unsupported operation {obj.operation} for {obj.sobject}")
+        result = {
+            "operation": obj.operation,
+            "rows": 0,
+            "inserted": 0,
+            "updated": 0,
+            "skipped": 0,
+            "failed": 0,
+            "errors": [],
+            "peak_rss": resident_bytes(),
+        }
+        fields = self._describe(obj.sobject)
+        self._bind_lookups(obj, fields)
+        rows, bulk, spill = obj.iter_rows(), None, None
+        try:
+            while True:
+                existing = IndexView(self.index, self._ensure_index(obj.sobject, obj.key_parts))
+                deferred = tempfile.TemporaryFile("w+", newline="", encoding="utf-8") if obj.self_lookups else None
+                writer = csv.DictWriter(deferred, fieldnames=obj.columns, extrasaction="ignore") if deferred else None
+                read = postponed = 0
+                futures = []
+                for chunk, last in self._chunks(rows):
+                    if bulk is None:
+                        bulk = not last or len(chunk) >= self.bulk_threshold
+                    read += len(chunk)
+                    ready = []
+                    for row in chunk:
+                        if writer is not None and not self._parents_loaded(obj, row):
+                            writer.writerow(row)
+                            postponed += 1
+                        else:
+                            ready.append(row)
+                    inserts, updates = self._split_rows(obj, fields, ready, existing, {}, result)
+                    for operation, pairs in (("insert", inserts), ("update", updates)):
+                        if not pairs:
+                            continue
+                        if bulk:
+                            futures.append(self._submit_job(obj, operation, pairs, result))
+                        else:
+                            self._send_collections(obj, operation, pairs, {}, result)
+                    with self.lock:
+                        result["rows"] += len(ready)
+                        result["peak_rss"] = max(result["peak_rss"], resident_bytes())
+                wait(futures)
+                if spill is not None:
+                    spill.close()
+                spill, rows = deferred, None
+                if not postponed:
+                    break
+                self._invalidate(obj.sobject)
+                spill.seek(0)
+                rows = csv.DictReader(spill)
+                if postponed == read:
+                    for row in rows:
+                        result["rows"] += 1
+                        self._fail(result, obj.row_key(row), "parent record is neither in the dataset nor the org")
+                    break
+        finally:
+            if spill is not None:
+                spill.close()
+        self._invalidate(obj.sobject)
+        return self._finish(obj, result, start)
+
+    def _finish(self, obj, result, start):
+        result["elapsed"] = time.perf_counter() - start
+        result["rows_per_second"] = result["rows"] / result["elapsed"] if result["elapsed"] else 0
+        self.logger.info(
+            f"{obj.sobject}: {result['rows']} rows, {result['inserted']} inserted, {result['updated']} updated, "
+            f"{result['skipped']} skipped, {result['failed']} failed in {result['elapsed']:.1f}s "
+            f"({result['rows_per_second']:.0f} rows/s, peak RSS {result['peak_rss'] / 1e6:.0f} MB)"
+        )
+        return result
+
+    # Lists of up to chunk_size rows, each with whether it is the last one; one chunk is read ahead
+    def _chunks(self, rows):
+        chunk = list(itertools.islice(rows, self.chunk_size))
+        while chunk:
+            following = list(itertools.islice(rows, self.chunk_size))
+            yield chunk, not following
+            chunk = following
+
+    # Encode the records as a Bulk API 2.0 job and start it once a job slot is free; waiting for the slot is
+    # what keeps the reader from getting ahead of the org
+    def _submit_job(self, obj, operation, pairs, result):
+        data = bulk_csv([record for _, record in pairs])
+        self.slots.acquire()
+        future = self.jobs.submit(self._run_job, obj, operation, data, len(pairs), result)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def _run_job(self, obj, operation, data, count, result):
+        counter = "inserted" if operation == "insert" else "updated"
+        try:
+            info, failed_rows, error = self._run_ingest_job(obj.sobject, operation, data)
+        except Exception as e:
+            info, failed_rows, error = None, [], f"bulk {operation} job failed: {e}"
+        with self.lock:
+            if info is None:
+                result["failed"] += count
+                self._keep_error(result, f"{count} rows: {error}")
+                return
+            failed = len(failed_rows) or int(info.get("numberRecordsFailed") or 0)
+            result[counter] += count - failed
+            result["failed"] += failed
+            for row in failed_rows[:MAX_KEPT_ERRORS]:
+                self._keep_error(result, f"{row.get('Id') or operation}: {row.get('sf__Error', '')}")
+
+    @staticmethod
+    def _keep_error(result, message):
+        if len(result["errors"]) < MAX_KEPT_ERRORS:
+            result["errors"].append(message)
+
+    def _fail(self, result, key, message):
+        with self.lock:
+            result["failed"] += 1
+            self._keep_error(result, f"{key}: {message}")
+
+    # Record ID a lookup value points at, from the index of the records of the lookup's target in the org
+    def _resolve(self, lookup, value):
+        return self.index.get(self._ensure_index(lookup.target, key_spec_parts(lookup.spec)), value)
+
+    # Name of the index of an object's records by a key, querying the org for it unless it is current
+    def _ensure_index(self, sobject, parts):
+        name = f"{sobject}:{KEY_SEPARATOR.join(parts)}"
+        with self.lock:
+            if name in self.fresh:
+                return name
+            lock = self.index_locks.setdefault(name, threading.Lock())
+        with lock:
+            with self.lock:
+                if name in self.fresh:
+                    return name
+            self.index.replace(name, self._org_keys(sobject, parts))
+            with self.lock:
+                self.fresh.add(name)
+        return name
+
+    # Mark the indexes of an object as stale after records were written to it
+    def _invalidate(self, sobject):
+        with self.lock:
+            self.fresh = {name for name in self.fresh if not name.startswith(f"{sobject}:")}
+
+    # (key, record ID) pairs of the records of an object in the org, read one page of results at a time
+    def _org_keys(self, sobject, parts):
+        query_fields = ["Id"] + [part for i, part in enumerate(parts) if part not in parts[:i] and part != "Id"]
+        response = self.client.request(
+            "get", self.client.build_url("query"), params={"q": f"SELECT {', '.join(query_fields)} FROM {sobject}"}
+        )
+        while True:
+            if response is None:
+                raise CumulusCIException(f"Could not query existing {sobject} records")
+            for record in response.get("records", []):
+                yield composite_key(key_value(record_path(record, part)) for part in parts), record["Id"]
+            if response.get("done", True) or not response.get("nextRecordsUrl"):
+                return
+            response = self.client.request("get", f"{self.client.instance_url}{response['nextRecordsUrl']}")
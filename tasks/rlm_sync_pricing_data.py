@@ -1,9 +1,12 @@
-import requests
 from cumulusci.tasks.sfdx import SFDXBaseTask
+from cumulusci.core.exceptions import CumulusCIException
 from cumulusci.core.keychain import BaseProjectKeychain
 from abc import abstractmethod
+from tasks.rlm_connect_client import ConnectClient
 
 # ExtendStandardContext is a custom task that extends the SFDXBaseTask provided by CumulusCI.
+# The sync endpoint only acknowledges the request with {"success": true}; the org exposes no job or status
+# API for the sync, so the task cannot wait for it to finish and fails only when the request is not accepted.
 class SyncPricingData(SFDXBaseTask):
     
     # Task options are used to set up configuration settings for this particular task.
@@ -32,6 +35,7 @@ class SyncPricingData(SFDXBaseTask):
         self._load_keychain()
         self.access_token = self.options.get("access_token", self.org_config.access_token)
         self.instance_url = self.options.get("instance_url", self.org_config.instance_url)
+        self.client = ConnectClient.from_task(self)
 
     # Execute the task after preparation, where the core functionality will be implemented
     def _run_task(self):
@@ -43,28 +47,18 @@ class SyncPricingData(SFDXBaseTask):
         url, headers = self._build_url_and_headers("connect/core-pricing/sync/syncData")
 
         response = self._make_request("get", url, headers=headers)
-        if response:
-            self.success = response.get('success')
-            if self.success:
-                self.logger.info(f"Sync Process Success: {self.success}")
+        self.success = bool(response and response.get('success'))
+        if not self.success:
+            raise CumulusCIException(f"Pricing sync was not accepted: {response}")
+        self.logger.info(f"Sync Process Success: {self.success}")
 
     # Helper to construct the request URL and headers for making API calls
     def _build_url_and_headers(self, endpoint):
-        url = f"{self.instance_url}/services/data/v{self.project_config.project__package__api_version}/{endpoint}"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json",
-        }
-        return url, headers
+        return self.client.build_url(endpoint), self.client.build_headers()
 
-    # Make an HTTP request using the requests library and handle the response
+    # Make an HTTP request through the shared pooled Connect API client and handle the response
     def _make_request(self, method, url, **kwargs):
-        response = requests.request(method, url, **kwargs)
-        if response.ok:
-            return response.json()
-        else:
-            self.logger.error(f"Failed {method.upper()} request to {url}: {response.text}")
-            return None
+        return self.client.request(method, url, **kwargs)
 
     # Abstract method to get the keychain class, needs to be implemented by subclasses
     @abstractmethod
@@ -0,0 +1,251 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+from cumulusci.core.exceptions import TaskOptionsError
+from cumulusci.core.flowrunner import FlowCallback, FlowCoordinator
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+from tasks.rlm_connect_client import add_request_hook, remove_request_hook
+from tasks.rlm_http_metrics import endpoint_template
+
+DEFAULT_OUTPUT = "trace.json"
+DEFAULT_TOP = 10
+
+# The tracer recording the current run, if any; spans are no-ops without one
+_active = None
+_active_lock = threading.Lock()
+
+
+# Span of the active tracer, or nothing when no trace is being recorded
+@contextlib.contextmanager
+def trace_span(name, category, **args):
+    tracer = _active
+    if tracer is None:
+        yield
+        return
+    with tracer.span(name, category, **args):
+        yield
+
+
+# Tracer records a timeline of a run as Chrome trace events (https://ui.perfetto.dev or chrome://tracing):
+# flow steps, every Connect API call and every wait between polls, each on the track of the thread it ran in so
+# nested spans stack under their step. Calls made from worker threads carry the step they belong to in their
+# args. Nothing is patched: the client reports calls through its request hooks, and steps and polling waits
+# open spans through trace_span, which only records while a tracer is recording.
+class Tracer:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.threads = {}
+        self.local = threading.local()
+        self.steps = []
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    # Microseconds since the trace started
+    def _us(self, timestamp):
+        return round((timestamp - self.origin) * 1e6)
+
+    # Step the calling thread is running, or the latest step still running elsewhere
+    def current_step(self):
+        stack = getattr(self.local, "steps", None)
+        if stack:
+            return stack[-1]
+        with self.lock:
+            return self.steps[-1] if self.steps else None
+
+    def add(self, name, category, start, end, **args):
+        thread = threading.current_thread()
+        step = self.current_step()
+        if step and category != "step":
+            args.setdefault("step", step)
+        with self.lock:
+            self.threads.setdefault(thread.ident, thread.name)
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": self._us(start),
+                    "dur": max(0, self._us(end) - self._us(start)),
+                    "pid": self.pid,
+                    "tid": thread.ident,
+                    "args": args,
+                }
+            )
+
+    # Open a span on the calling thread and return its start time
+    def begin(self, name, category):
+        if category == "step":
+            self.local.steps = getattr(self.local, "steps", []) + [name]
+            with self.lock:
+                self.steps.append(name)
+        return time.perf_counter()
+
+    # Close a span opened with begin
+    def end(self, name, category, start, **args):
+        end = time.perf_counter()
+        if category == "step":
+            self.local.steps = self.local.steps[:-1]
+            with self.lock:
+                self.steps.remove(name)
+        self.add(name, category, start, end, **args)
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        start = self.begin(name, category)
+        try:
+            yield args
+        finally:
+            self.end(name, category, start, **args)
+
+    # Request hook: the call ended now and took latency seconds
+    def record_request(self, method, url, status, latency, request_bytes, response_bytes, retries):
+        end = time.perf_counter()
+        self.add(
+            f"{method.upper()} {endpoint_template(url)}",
+            "http",
+            end - latency,
+            end,
+            status=status,
+            request_bytes=request_bytes,
+            response_bytes=response_bytes,
+            retries=retries,
+        )
+
+    # Record while the block runs: this tracer takes the spans opened through trace_span and is registered as
+    # a request hook of the Connect API client, and both are undone when the block exits
+    @contextlib.contextmanager
+    def recording(self):
+        global _active
+        with _active_lock:
+            if _active is not None:
+                raise TaskOptionsError("A trace is already being recorded")
+            _active = self
+        add_request_hook(self.record_request)
+        try:
+            yield self
+        finally:
+            remove_request_hook(self.record_request)
+            with _active_lock:
+                _active = None
+
+    # Write the events, with thread names, as a Chrome trace file
+    def write(self, path):
+        with self.lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": metadata + sorted(events, key=lambda e: e["ts"]), "displayTimeUnit": "ms"}, f)
+
+    # Text summary: the slowest steps, the time spent in API calls and the time spent waiting between polls
+    def summary(self, top=DEFAULT_TOP):
+        with self.lock:
+            events = list(self.events)
+        if not events:
+            return ["No spans were recorded"]
+        wall = max(1e-6, (max(e["ts"] + e["dur"] for e in events) - min(e["ts"] for e in events)) / 1e6)
+        lines = [f"Traced {wall:.1f}s"]
+
+        steps = sorted((e for e in events if e["cat"] == "step"), key=lambda e: -e["dur"])
+        if steps:
+            lines.append("Slowest steps:")
+            for event in steps[:top]:
+                lines.append(f"  {event['dur'] / 1e6:>8.1f}s {event['dur'] / 1e4 / wall:>5.1f}%  {event['name']}")
+
+        for category, title in (("http", "HTTP calls"), ("sleep", "Sleeping")):
+            totals = {}
+            for event in events:
+                if event["cat"] == category:
+                    name = (event["args"].get("step") or "(no step)") if category == "sleep" else event["name"]
+                    count, total = totals.get(name, (0, 0))
+                    totals[name] = (count + 1, total + event["dur"])
+            if not totals:
+                continue
+            overall = sum(total for _, total in totals.values()) / 1e6
+            calls = sum(count for count, _ in totals.values())
+            lines.append(f"{title}: {overall:.1f}s in {calls} {'calls' if category != 'sleep' else 'sleeps'}")
+            for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1])[:top]:
+                lines.append(f"  {total / 1e6:>8.1f}s {count:>6}x  {name}")
+        return lines
+
+
+# FlowCallback that records a span per flow step
+class TracingCallback(FlowCallback):
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self.starts = {}
+
+    def pre_task(self, step):
+        name = f"{step.step_num} {step.task_name}"
+        self.starts[str(step.step_num)] = (name, self.tracer.begin(name, "step"))
+
+    def post_task(self, step, result):
+        name, start = self.starts.pop(str(step.step_num))
+        status = "failed" if result.exception else "ok"
+        self.tracer.end(name, "step", start, task=step.task_config.get("class_path"), status=status)
+
+
+# TraceFlow runs a flow like `cci flow run` while recording a timeline of its steps, Connect API calls and
+# polling waits, then writes it as a Chrome trace and logs a summary of the biggest time consumers.
+class TraceFlow(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "flow": {
+            "description": "Name of the flow to run",
+            "required": True,
+        },
+        "output": {
+            "description": f"Path of the trace file. Defaults to {DEFAULT_OUTPUT}; the summary is written next to it",
+        },
+        "top": {
+            "description": f"Number of entries in each section of the summary. Defaults to {DEFAULT_TOP}",
+        },
+    }
+
+    # Initialize the task options
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        self.output = self.options.get("output") or DEFAULT_OUTPUT
+        self.top = int(self.options.get("top") or DEFAULT_TOP)
+
+    # Run the flow under the tracer and write the trace even when the flow fails
+    def _run_task(self):
+        tracer = Tracer()
+        coordinator = FlowCoordinator(
+            self.project_config,
+            self.project_config.get_flow(self.options["flow"]),
+            name=self.options["flow"],
+            callbacks=TracingCallback(tracer),
+        )
+        try:
+            with tracer.recording(), tracer.span(self.options["flow"], "flow"):
+                coordinator.run(self.org_config)
+        finally:
+            write_trace(tracer, self.output, self.top, self.logger)
+        self.return_values = {"trace": self.output}
+
+
+# Write a trace and its summary (<output>_summary.txt) and log the summary
+def write_trace(tracer, output, top, logger):
+    tracer.write(output)
+    lines = tracer.summary(top)
+    with open(os.path.splitext(output)[0] + "_summary.txt", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    for line in lines:
+        logger.info(line)
+    logger.info(f"Trace written to {output}")
@@ -0,0 +1,206 @@
+import csv
+import glob
+import os
+import time
+
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+from cumulusci.core.utils import process_bool_arg, process_list_arg
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+from tasks.rlm_sfdmu_dataset import Dataset, composite_key, key_spec_parts
+
+DEFAULT_DATASETS_PATH = os.path.join("datasets", "sfdmu")
+MAX_LOGGED_ERRORS = 5
+
+
+# Function computing the value a dataset row (a list of CSV values) has for a key spec: the column of that name
+# when the CSV has it (sfdmu writes composite lookup keys such as $$Name$Catalog.Name as a column), otherwise
+# the key parts joined the way sfdmu joins them. Returns None when the CSV lacks a part, so the key cannot be
+# computed offline.
+def spec_reader(obj, spec):
+    if spec in obj.columns:
+        index = obj.columns.index(spec)
+        return lambda row: row[index]
+    parts = key_spec_parts(spec)
+    if not all(part in obj.columns for part in parts):
+        return None
+    indexes = [obj.columns.index(part) for part in parts]
+    if len(indexes) == 1:
+        return lambda row: row[indexes[0]]
+    return lambda row: composite_key(row[index] for index in indexes)
+
+
+# Referential integrity of one sfdmu dataset, checked without an org. Every lookup column is matched against a
+# hash index of the key it names on the object it points at, built from that object's CSV. Objects are read in
+# dependency order and each CSV is read once, indexing its keys and checking its lookups in the same pass; only
+# lookups to an object that has not been read yet (its own parent rows, say) are kept until the end.
+class DatasetValidator:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.dataset = Dataset(directory)
+        self.indexes = {}
+        self.indexed = set()
+        self.deferred = []
+        self.errors = []
+        self.duplicates = {}
+        self.unchecked = set()
+        self.rows = 0
+        self.lookups = 0
+
+    # Index key specs of every object: its external ID and every key spec other objects look it up by
+    def _specs(self):
+        specs = {obj.sobject: {obj.external_id} for obj in self.dataset.objects}
+        for obj in self.dataset.objects:
+            for lookup in obj.lookups:
+                if lookup.target in specs:
+                    specs[lookup.target].add(lookup.spec)
+        return specs
+
+    # Read every CSV once and return self for chaining
+    def validate(self):
+        specs = self._specs()
+        try:
+            order = [name for wave in self.dataset.waves() for name in wave]
+        except ValueError:
+            order = [obj.sobject for obj in self.dataset.objects]
+        for name in order:
+            self._read(self.dataset.by_name[name], specs[name])
+        for obj, line, lookup, value in self.deferred:
+            if value not in self.indexes[(lookup.target, self._parts(lookup))]:
+                self._broken(obj, line, lookup, value)
+        self.deferred = []
+        return self
+
+    def _read(self, obj, specs):
+        # The external ID is indexed by the same key the loader matches rows on, which may come from the sfdmu
+        # key column when its parts are reached through lookups
+        key_parts = tuple(obj.key_parts)
+        if obj.key_column and not all(part in obj.columns for part in obj.key_parts):
+            key_reader = spec_reader(obj, obj.key_column)
+        else:
+            key_reader = spec_reader(obj, obj.external_id) or (lambda row: "")
+        readers = {}
+        for spec in specs:
+            parts = tuple(key_spec_parts(spec))
+            reader = key_reader if parts == key_parts else spec_reader(obj, spec)
+            if reader and parts not in readers:
+                readers[parts] = (self.indexes.setdefault((obj.sobject, parts), set()), reader)
+        keys = self.indexes.setdefault((obj.sobject, key_parts), set())
+        readers.pop(key_parts, None)
+        lookups = [
+            (lookup, obj.columns.index(lookup.column), self.indexes.setdefault((lookup.target, self._parts(lookup)), set()))
+            for lookup in obj.lookups
+            if self._checkable(lookup)
+        ]
+        width = len(obj.columns)
+        if not os.path.exists(obj.csv_path):
+            self.indexed.add(obj.sobject)
+            return
+        with open(obj.csv_path, newline="", encoding="utf-8-sig") as f:
+            rows = csv.reader(f)
+            next(rows, None)
+            for line, row in enumerate(rows, start=2):
+                if len(row) < width:
+                    row += [""] * (width - len(row))
+                self.rows += 1
+                key = key_reader(row)
+                if key:
+                    if key in keys:
+                        self.duplicates.setdefault(obj.sobject, []).append((line, key))
+                    keys.add(key)
+                for index, reader in readers.values():
+                    value = reader(row)
+                    if value:
+                        index.add(value)
+                for lookup, column, index in lookups:
+                    value = row[column]
+                    if not value:
+                        continue
+                    self.lookups += 1
+                    if lookup.target not in self.indexed:
+                        self.deferred.append((obj, line, lookup, value))
+                    elif value not in index:
+                        self._broken(obj, line, lookup, value)
+        self.indexed.add(obj.sobject)
+
+    @staticmethod
+    def _parts(lookup):
+        return tuple(key_spec_parts(lookup.spec))
+
+    # A lookup can be checked offline when its target is in the dataset and the key it uses can be computed
+    # from the target's CSV; the others resolve against the org at load time
+    def _checkable(self, lookup):
+        target = self.dataset.by_name.get(lookup.target)
+        computable = spec_reader(target, lookup.spec) is not None or (
+            self._parts(lookup) == tuple(target.key_parts) and target.key_column
+        ) if target else False
+        if lookup.spec == "Id" or not computable:
+            self.unchecked.add(f"{lookup.column} -> {lookup.target}")
+            return False
+        return True
+
+    def _broken(self, obj, line, lookup, value):
+        self.errors.append(f"{obj.sobject}.csv line {line}: {lookup.column} '{value}' matches no {lookup.target} row")
+
+
+# ValidateDatasets checks the sfdmu datasets for broken references before anything is loaded, so a row that
+# points at a missing product, selling model or parent category fails in CI instead of halfway through a load.
+class ValidateDatasets(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "datasets": {
+            "description": f"sfdmu dataset directories to check. Defaults to every dataset below {DEFAULT_DATASETS_PATH}",
+        },
+        "fail_on_error": {
+            "description": "Fail the task when a dataset has broken references. Defaults to True",
+        },
+    }
+
+    # Initialize the task options
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        self.datasets = process_list_arg(self.options.get("datasets")) or sorted(
+            os.path.dirname(path) for path in glob.glob(os.path.join(DEFAULT_DATASETS_PATH, "*", "export.json"))
+        )
+        for directory in self.datasets:
+            if not os.path.exists(os.path.join(directory, "export.json")):
+                raise TaskOptionsError(f"No export.json in {directory}")
+        self.fail_on_error = process_bool_arg(self.options.get("fail_on_error", True))
+
+    # Validate every dataset and report its broken references
+    def _run_task(self):
+        self.return_values = {}
+        failed = []
+        for directory in self.datasets:
+            start = time.perf_counter()
+            validator = DatasetValidator(directory).validate()
+            elapsed = time.perf_counter() - start
+            self.logger.info(
+                f"{directory}: {validator.rows} rows, {validator.lookups} lookups, "
+                f"{len(validator.errors)} broken in {elapsed:.2f}s"
+            )
+            for error in validator.errors[:MAX_LOGGED_ERRORS]:
+                self.logger.error(f"  {error}")
+            if len(validator.errors) > MAX_LOGGED_ERRORS:
+                self.logger.error(f"  ... and {len(validator.errors) - MAX_LOGGED_ERRORS} more")
+            for sobject, duplicates in validator.duplicates.items():
+                lines = ", ".join(f"{line} ({key})" for line, key in duplicates[:MAX_LOGGED_ERRORS])
+                self.logger.warning(f"  {sobject}.csv repeats external IDs on lines {lines}")
+            if validator.unchecked:
+                self.logger.info(f"  Resolved against the org at load time: {', '.join(sorted(validator.unchecked))}")
+            self.return_values[directory] = {
+                "rows": validator.rows,
+                "lookups": validator.lookups,
+                "errors": validator.errors,
+                "duplicates": {sobject: len(duplicates) for sobject, duplicates in validator.duplicates.items()},
+                "unchecked": sorted(validator.unchecked),
+                "elapsed": elapsed,
+            }
+            if validator.errors:
+                failed.append(directory)
+
+        if failed and self.fail_on_error:
+            raise CumulusCIException(f"Broken references in {', '.join(failed)}")
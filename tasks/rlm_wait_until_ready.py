@@ -0,0 +1,165 @@
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+from cumulusci.core.utils import import_global
+from cumulusci.tasks.sfdx import SFDXBaseTask
+
+from tasks.rlm_connect_client import ConnectClient, soql_in
+from tasks.rlm_extend_stdctx import listed_context_definitions
+from tasks.rlm_polling import DEFAULT_MAX_DELAY, DEFAULT_TIMEOUT, poll
+
+
+# Probe: every named decision table exists, optionally with the given status
+def decision_table_probe(client, spec):
+    names = spec["developer_names"]
+    records = client.query(
+        f"SELECT DeveloperName, Status FROM DecisionTable WHERE DeveloperName IN {soql_in(names)}"
+    )
+    if records is None:
+        return False, "query failed"
+    statuses = {record["DeveloperName"]: record["Status"] for record in records}
+    pending = [
+        name
+        for name in names
+        if name not in statuses or (spec.get("status") and statuses[name] != spec["status"])
+    ]
+    return not pending, f"waiting for {', '.join(pending)}" if pending else "ready"
+
+
+# Probe: every named context definition exists and is active
+def context_definition_probe(client, spec):
+    response = client.request("get", client.build_url("connect/context-definitions"))
+    if response is None:
+        return False, "listing failed"
+    definitions = {
+        definition.get("developerName"): definition
+        for definition in listed_context_definitions(response)
+    }
+    pending = []
+    for name in spec["developer_names"]:
+        definition = definitions.get(name)
+        if definition is None:
+            pending.append(name)
+            continue
+        if "isActive" not in definition:
+            definition = client.request(
+                "get", client.build_url(f"connect/context-definitions/{definition['contextDefinitionId']}")
+            ) or {}
+        if str(definition.get("isActive")).lower() != "true":
+            pending.append(name)
+    return not pending, f"waiting for {', '.join(pending)}" if pending else "ready"
+
+
+# Probe: a SOQL COUNT() query returns at least min_count rows
+def soql_count_probe(client, spec):
+    count = client.query_count(spec["query"])
+    if count is None:
+        return False, "query failed"
+    min_count = int(spec.get("min_count", 1))
+    return count >= min_count, f"{count} of {min_count} rows"
+
+
+# Probe: every record named in record_ids exists, given as the placeholder groups DeployWithRecordIds resolves
+# (an sobject, the field to match on, defaulting to Name, and a map of placeholder to field value), so a flow
+# can wait for exactly the records its next deploy needs
+def record_ids_probe(client, spec):
+    pending = []
+    for group in spec["record_ids"]:
+        field = group.get("field") or "Name"
+        names = sorted(set(group["tokens"].values()))
+        records = client.query(f"SELECT {field} FROM {group['sobject']} WHERE {field} IN {soql_in(names)}")
+        if records is None:
+            return False, "query failed"
+        found = {record[field] for record in records}
+        pending.extend(f"{group['sobject']} {name}" for name in names if name not in found)
+    return not pending, f"waiting for {', '.join(pending)}" if pending else "ready"
+
+
+# Probe: the org has at least min_fraction (default 0.1) of its daily API requests left, and at least
+# min_remaining requests when that is set
+def api_headroom_probe(client, spec):
+    headroom = client.api_headroom(refresh=True)
+    if headroom is None:
+        return False, "limits unavailable"
+    ready = headroom["fraction"] >= float(spec.get("min_fraction", 0.1)) and headroom["remaining"] >= int(
+        spec.get("min_remaining", 0)
+    )
+    return ready, f"{headroom['remaining']} of {headroom['limit']} daily API requests left"
+
+
+PROBES = {
+    "decision_table": decision_table_probe,
+    "context_definition": context_definition_probe,
+    "soql_count": soql_count_probe,
+    "record_ids": record_ids_probe,
+    "api_headroom": api_headroom_probe,
+}
+
+
+# WaitUntilReady polls the org with exponential backoff until every probe passes, replacing fixed sleeps
+class WaitUntilReady(SFDXBaseTask):
+
+    # Task options are used to set up configuration settings for this particular task.
+    task_options = {
+        "access_token": {
+            "description": "The access token for the org. Defaults to the project default",
+        },
+        "probes": {
+            "description": "List of probes, each with a type (decision_table, context_definition, soql_count, "
+            "record_ids, api_headroom) or a class_path to a probe function, plus that probe's settings",
+            "required": True,
+        },
+        "timeout": {
+            "description": f"Seconds to wait for each probe before failing. Defaults to {DEFAULT_TIMEOUT}",
+        },
+        "initial_delay": {
+            "description": "Seconds to wait after the first failed check. Defaults to 1",
+        },
+        "max_delay": {
+            "description": f"Upper bound of the backoff delay in seconds. Defaults to {DEFAULT_MAX_DELAY}",
+        },
+    }
+
+    # Initialize the task options and resolve each probe function
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+        self.env = self._get_env()
+        self.timeout = float(self.options.get("timeout") or DEFAULT_TIMEOUT)
+        self.initial_delay = float(self.options.get("initial_delay") or 1)
+        self.max_delay = float(self.options.get("max_delay") or DEFAULT_MAX_DELAY)
+        self.probes = []
+        for spec in self.options.get("probes") or []:
+            if "class_path" in spec:
+                probe = import_global(spec["class_path"])
+            elif spec.get("type") in PROBES:
+                probe = PROBES[spec["type"]]
+            else:
+                raise TaskOptionsError(f"Unknown probe: {spec}")
+            self.probes.append((spec.get("type") or spec["class_path"], probe, spec))
+
+    # Prepare runtime by setting up access token, instance URL and the shared Connect API client
+    def _prep_runtime(self):
+        self.access_token = self.options.get("access_token", self.org_config.access_token)
+        self.instance_url = self.options.get("instance_url", self.org_config.instance_url)
+        self.client = ConnectClient.from_task(self)
+
+    # Run each probe in turn until it passes, reporting how long it waited
+    def _run_task(self):
+        self._prep_runtime()
+        self.return_values = {"probes": []}
+        for name, probe, spec in self.probes:
+            state = {}
+
+            def check():
+                state["ready"], state["detail"] = probe(self.client, spec)
+                return state["ready"]
+
+            ready, elapsed, attempts = poll(
+                check, self.timeout, self.initial_delay, self.max_delay
+            )
+            self.return_values["probes"].append(
+                {"probe": name, "ready": ready, "elapsed": elapsed, "attempts": attempts}
+            )
+            if not ready:
+                raise CumulusCIException(
+                    f"Timed out after {elapsed:.1f}s waiting for {name} probe: {state['detail']}"
+                )
+            self.logger.info(f"{name} probe ready after {elapsed:.1f}s ({attempts} checks)")
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+from cumulusci.cli.runtime import CliRuntime
+from cumulusci.core.config import OrgConfig, TaskConfig
+from cumulusci.core.utils import import_global
+from cumulusci.utils import cd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Loading the project the way `cci` does puts its tasks directory on CumulusCI's synthetic tasks package,
+# which the test modules import from
+with cd(REPO_ROOT):
+    PROJECT_CONFIG = CliRuntime(load_keychain=False).project_config
+
+from tasks.rlm_extend_stdctx import clear_definition_listings  # noqa: E402
+from tasks.rlm_mock_org import MockOrg, MockOrgServer  # noqa: E402
+
+
+# Every test runs from the repository root, as cci does, with the per-org state kept in its own directory
+@pytest.fixture(autouse=True)
+def project_config(tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setattr(PROJECT_CONFIG, "_cache_dir", tmp_path / ".cci")
+    (tmp_path / ".cci").mkdir()
+    clear_definition_listings()
+    yield PROJECT_CONFIG
+    clear_definition_listings()
+
+
+@pytest.fixture
+def mock_org():
+    return MockOrg()
+
+
+@pytest.fixture
+def mock_server(mock_org):
+    with MockOrgServer(mock_org) as server:
+        yield server
+
+
+# Org config pointing at the stand-in org; the token needs no refresh
+@pytest.fixture
+def org_config(mock_server, monkeypatch):
+    org_config = OrgConfig({"instance_url": mock_server.url, "access_token": "mock-access-token"}, "mock")
+    monkeypatch.setattr(org_config, "refresh_oauth_token", lambda *args, **kwargs: None)
+    return org_config
+
+
+# Build a task of cumulusci.yml against the stand-in org with extra options, without running it
+@pytest.fixture
+def make_task(project_config, org_config):
+    def make(name, **options):
+        task_config = project_config.get_task(name)
+        config = dict(task_config.config)
+        config["options"] = {
+            **(task_config.options or {}),
+            "instance_url": org_config.instance_url,
+            "access_token": org_config.access_token,
+            **options,
+        }
+        return import_global(task_config.class_path)(project_config, TaskConfig(config), org_config)
+
+    return make
+
+
+# Run a task of cumulusci.yml against the stand-in org with extra options and return the task
+@pytest.fixture
+def run_task(make_task):
+    def run(name, **options):
+        task = make_task(name, **options)
+        task()
+        return task
+
+    return run
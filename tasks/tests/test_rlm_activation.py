@@ -0,0 +1,65 @@
+import pytest
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+
+
+def requests_to(mock_org, endpoint):
+    return sum(count for key, count in mock_org.snapshot()["endpoints"].items() if key.endswith(endpoint))
+
+
+def states(mock_org, sobject, key, field):
+    return {record[key]: record[field] for record in mock_org.records[sobject]}
+
+
+def test_activates_the_expression_set_versions_of_the_dataset(run_task, mock_org):
+    task = run_task("activate_expression_sets")
+
+    assert states(mock_org, "ExpressionSetVersion", "ApiName", "IsActive") == {
+        "RLM_DefaultPricingProcedure": False,
+        "RLM_ProductDiscoveryPricingProcedure": True,
+        "RLM_QualificationProcedure": True,
+    }
+    assert task.return_values == {
+        "updated": ["RLM_ProductDiscoveryPricingProcedure", "RLM_QualificationProcedure"],
+        "unchanged": 0,
+    }
+
+
+def test_activates_the_decision_tables_of_the_dataset(run_task, mock_org):
+    run_task("activate_decision_tables")
+
+    statuses = states(mock_org, "DecisionTable", "DeveloperName", "Status")
+    assert statuses["Price_Book_Entry_Decision_Table"] == "Active"
+    assert statuses["Asset_Action_Source_Entries_Decision_Table"] == "Active"
+    assert statuses["RLM_ProductQualification"] == "Active"
+
+
+def test_records_already_in_their_state_are_not_written(run_task, mock_org):
+    run_task("activate_expression_sets")
+    patches = requests_to(mock_org, "/composite/sobjects")
+    assert patches == 1
+
+    again = run_task("activate_expression_sets")
+
+    assert again.return_values == {"updated": [], "unchanged": 2}
+    assert requests_to(mock_org, "/composite/sobjects") == patches
+
+
+def test_names_option_deactivates(run_task, mock_org):
+    run_task("activate_expression_sets")
+    run_task(
+        "activate_expression_sets", dataset=None, names="RLM_QualificationProcedure", active=False
+    )
+
+    assert states(mock_org, "ExpressionSetVersion", "ApiName", "IsActive")["RLM_QualificationProcedure"] is False
+
+
+def test_unknown_names_fail_before_any_update(run_task, mock_org):
+    with pytest.raises(CumulusCIException, match="RLM_Missing"):
+        run_task("activate_expression_sets", dataset=None, names="RLM_QualificationProcedure,RLM_Missing")
+
+    assert not any(states(mock_org, "ExpressionSetVersion", "ApiName", "IsActive").values())
+
+
+def test_names_and_dataset_are_exclusive(run_task):
+    with pytest.raises(TaskOptionsError):
+        run_task("activate_expression_sets", names="RLM_QualificationProcedure")
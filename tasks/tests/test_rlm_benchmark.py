@@ -0,0 +1,62 @@
+import json
+
+import pytest
+from cumulusci.core.exceptions import CumulusCIException
+
+
+# A target that fails fast against the stand-in org
+@pytest.fixture(autouse=True)
+def broken_task(project_config, monkeypatch):
+    monkeypatch.setitem(
+        project_config.config["tasks"],
+        "activate_missing_procedure",
+        {
+            "class_path": "tasks.rlm_activation.SetActivationState",
+            "options": {"sobject": "ExpressionSetVersion", "names": "RLM_Missing"},
+        },
+    )
+
+
+def benchmark(run_task, **options):
+    return run_task(
+        "benchmark_rlm_tasks", flows="extend_context_definitions", iterations=2, latency=0, **options
+    )
+
+
+def test_reports_medians_of_every_target(run_task, tmp_path):
+    output = tmp_path / "results.json"
+
+    task = benchmark(run_task, tasks="sync_pricing_data,wait_for_decision_tables", output=str(output))
+
+    summary = task.return_values["summary"]
+    assert sorted(summary) == ["flow:extend_context_definitions", "task:sync_pricing_data", "task:wait_for_decision_tables"]
+    assert summary["task:sync_pricing_data"]["requests"] == 1
+    assert all(row["failures"] == 0 and row["wall_median"] > 0 for row in summary.values())
+    assert json.loads(output.read_text())["summary"] == summary
+
+
+def test_failed_runs_are_left_out_of_the_medians_and_fail_the_task(make_task):
+    task = make_task(
+        "benchmark_rlm_tasks", tasks="activate_missing_procedure", flows="extend_context_definitions", iterations=2, latency=0
+    )
+
+    with pytest.raises(CumulusCIException, match="2 benchmark runs failed: task:activate_missing_procedure run 1"):
+        task()
+
+    assert task.return_values["summary"]["task:activate_missing_procedure"] == {
+        "wall_median": None,
+        "wall_min": None,
+        "requests": None,
+        "bytes": None,
+        "failures": 2,
+    }
+    assert task.return_values["summary"]["flow:extend_context_definitions"]["failures"] == 0
+
+
+def test_a_target_failing_against_a_passing_baseline_is_a_regression(run_task, tmp_path):
+    baseline = tmp_path / "baseline.json"
+    row = {"wall_median": 10.0, "wall_min": 10.0, "requests": 100, "bytes": 1000, "failures": 0}
+    baseline.write_text(json.dumps({"summary": {"task:activate_missing_procedure": row}}))
+
+    with pytest.raises(CumulusCIException, match="task:activate_missing_procedure failed 2 of 2 runs"):
+        benchmark(run_task, tasks="activate_missing_procedure", baseline=str(baseline))
@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from tasks.rlm_connect_client import (
+    AdaptiveLimiter,
+    ApiHeadroomExceeded,
+    ConnectClient,
+    api_headroom,
+    resolve_settings,
+)
+
+
+@pytest.fixture
+def client(mock_server):
+    settings = resolve_settings(overrides={"backoff_factor": 0, "cache_max_bytes": 0, "max_concurrency": 4})
+    return ConnectClient(mock_server.url, "mock-access-token", "61.0", logging.getLogger(__name__), settings)
+
+
+# Answer the next requests with the given statuses before handling requests normally again
+def answer_with(mock_org, monkeypatch, *statuses):
+    queue = list(statuses)
+    monkeypatch.setattr(
+        mock_org, "inject", lambda: (queue.pop(0), [{"message": "Scripted", "errorCode": "SCRIPTED"}]) if queue else None
+    )
+
+
+def requests_made(mock_org):
+    return mock_org.snapshot()["requests"]
+
+
+def test_limiter_halves_on_throttles_and_grows_back_by_one_per_round():
+    limiter = AdaptiveLimiter(8)
+    limits = []
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(throttled=True, retry_after=0.001)
+        limits.append(limiter.limit)
+    assert limits == [4, 2, 1, 1]
+
+    limiter.acquire()
+    limiter.release()
+    assert limiter.limit == 2
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 8
+    assert limiter.throttled == 4
+
+
+def test_limiter_holds_requests_back_for_the_retry_after():
+    limiter = AdaptiveLimiter(2)
+    limiter.acquire()
+    limiter.release(throttled=True, retry_after=0.3)
+
+    start = time.monotonic()
+    limiter.acquire()
+
+    assert time.monotonic() - start >= 0.25
+
+
+def test_a_throttled_request_waits_without_holding_a_slot(client, mock_org, monkeypatch):
+    answer_with(mock_org, monkeypatch, 429)
+    mock_org.retry_after = 0.6
+    responses = []
+    thread = threading.Thread(target=lambda: responses.append(client.send("get", client.build_url("limits"))))
+    thread.start()
+    while not mock_org.snapshot()["throttled"]:
+        time.sleep(0.01)
+    time.sleep(0.2)
+
+    assert client.limiter.in_flight == 0
+    thread.join()
+    assert responses[0].status_code == 200
+    assert requests_made(mock_org) == 2
+
+
+def test_throttled_requests_are_retried_for_any_method(client, mock_org, monkeypatch):
+    answer_with(mock_org, monkeypatch, 429)
+    mock_org.retry_after = 0.01
+
+    response = client.send("post", client.build_url("connect/pcm/catalogs"), json={})
+
+    assert response.status_code == 200
+    assert requests_made(mock_org) == 2
+
+
+def test_server_errors_are_retried_only_for_idempotent_requests(client, mock_org, monkeypatch):
+    answer_with(mock_org, monkeypatch, 500)
+    assert client.send("get", client.build_url("limits")).status_code == 200
+    assert requests_made(mock_org) == 2
+
+    for status in (500, 503):
+        answer_with(mock_org, monkeypatch, status)
+        assert client.send("post", client.build_url("connect/pcm/catalogs"), json={}).status_code == status
+    assert requests_made(mock_org) == 4
+
+
+def test_requests_stop_once_the_api_headroom_is_used_up(mock_server, mock_org):
+    mock_org.api_limit = 10
+    settings = resolve_settings(overrides={"cache_max_bytes": 0, "min_api_headroom": 0.5})
+    client = ConnectClient(mock_server.url, "mock-access-token", "61.0", logging.getLogger(__name__), settings)
+
+    for _ in range(6):
+        client.send("get", client.build_url("limits"))
+    assert api_headroom(mock_server.url) == {"used": 5, "limit": 10, "remaining": 5, "fraction": 0.5}
+    client.send("get", client.build_url("query"), params={"q": "SELECT Id FROM Product2"})
+
+    with pytest.raises(ApiHeadroomExceeded, match="Only 4 of 10 daily API requests remain"):
+        client.send("get", client.build_url("query"), params={"q": "SELECT Id FROM Product2"})
+    assert client.api_headroom(refresh=True)["remaining"] == 3
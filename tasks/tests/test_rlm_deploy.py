@@ -0,0 +1,52 @@
+import xml.etree.ElementTree as ET
+
+from tasks.rlm_deploy import DEFAULT_TOKEN_PATTERN, METADATA_NAMESPACE, component_key, filter_package_xml, find_tokens
+
+PACKAGE_XML = f"""<?xml version="1.0" encoding="UTF-8"?>
+<Package xmlns="{METADATA_NAMESPACE}">
+    <types><members>Foo</members><members>Bar</members><name>ApexClass</name></types>
+    <types><members>Account.Foo__c</members><members>Contact.Baz__c</members><name>CustomField</name></types>
+    <types><members>Account</members><members>Contact</members><name>CustomObject</name></types>
+    <types><members>fooCard</members><name>LightningComponentBundle</name></types>
+    <version>62.0</version>
+</Package>
+"""
+
+
+def members(package_xml):
+    ns = {"md": METADATA_NAMESPACE}
+    root = ET.fromstring(package_xml)
+    return {
+        types.find("md:name", ns).text: sorted(member.text for member in types.findall("md:members", ns))
+        for types in root.findall("md:types", ns)
+    }
+
+
+def test_find_tokens_collects_placeholders_below_a_path(tmp_path):
+    (tmp_path / "expressionSetDefinition").mkdir()
+    (tmp_path / "expressionSetDefinition" / "a.xml").write_text("<id>__TIERPasID__</id><id>__VOLUMEPasID__</id>")
+    (tmp_path / "b.xml").write_text("__TIERPasID__ and __NotAToken__")
+    (tmp_path / "c.txt").write_text("nothing here")
+
+    assert find_tokens(str(tmp_path), DEFAULT_TOKEN_PATTERN) == {"__TIERPasID__", "__VOLUMEPasID__"}
+    assert find_tokens(str(tmp_path / "missing"), DEFAULT_TOKEN_PATTERN) == set()
+
+
+def test_component_key_groups_the_files_of_a_component():
+    assert component_key("classes/Foo.cls") == "classes/Foo"
+    assert component_key("classes/Foo.cls-meta.xml") == "classes/Foo"
+    assert component_key("lwc/fooCard/fooCard.js") == "lwc/fooCard"
+    assert component_key("objects/Account/fields/Foo__c.field-meta.xml") == "objects/Account/fields/Foo__c"
+    assert component_key("package.xml") is None
+
+
+def test_filter_package_xml_keeps_only_the_given_components():
+    filtered = members(filter_package_xml(PACKAGE_XML.encode(), {"classes/Foo", "lwc/fooCard"}))
+
+    assert filtered == {"ApexClass": ["Foo"], "LightningComponentBundle": ["fooCard"]}
+
+
+def test_filter_package_xml_keeps_child_members_with_their_parent():
+    filtered = members(filter_package_xml(PACKAGE_XML.encode(), {"objects/Account"}))
+
+    assert filtered == {"CustomField": ["Account.Foo__c"], "CustomObject": ["Account"]}
@@ -0,0 +1,53 @@
+import tasks.rlm_extend_contexts as rlm_extend_contexts
+from tasks.rlm_extend_stdctx import ExtendStandardContext, clear_definition_listings
+from tasks.rlm_org_state import RefreshedOrgConfig
+
+
+def active_definitions(mock_org):
+    return sorted(
+        (definition["developerName"], definition["baseReference"])
+        for definition in mock_org.context_definitions.values()
+        if definition["isActive"]
+    )
+
+
+def test_extends_the_three_standard_contexts(run_task, mock_org):
+    task = run_task("extend_stdctx_all")
+
+    assert active_definitions(mock_org) == [
+        ("RLM_CartContext", "CartContext__stdctx"),
+        ("RLM_ProductDiscoveryContext", "ProductDiscoveryContext__stdctx"),
+        ("RLM_SalesTransactionContext", "SalesTransactionContext__stdctx"),
+    ]
+    assert sorted((result["name"], result["status"]) for result in task.return_values["contexts"]) == [
+        ("RLM_CartContext", "Success"),
+        ("RLM_ProductDiscoveryContext", "Success"),
+        ("RLM_SalesTransactionContext", "Success"),
+    ]
+
+
+def test_rerun_in_a_new_process_creates_nothing(run_task, mock_org):
+    run_task("extend_stdctx_all")
+    clear_definition_listings()
+
+    run_task("extend_stdctx_all")
+
+    assert len(mock_org.context_definitions) == 3
+    assert mock_org.snapshot()["endpoints"]["POST /services/data/v61.0/connect/context-definitions"] == 3
+
+
+def test_chains_get_a_snapshot_of_the_refreshed_org(run_task, mock_org, org_config, monkeypatch):
+    chain_org_configs = []
+
+    class RecordingExtendStandardContext(ExtendStandardContext):
+        def _run_task(self):
+            chain_org_configs.append(self.org_config)
+            super()._run_task()
+
+    monkeypatch.setattr(rlm_extend_contexts, "ExtendStandardContext", RecordingExtendStandardContext)
+
+    run_task("extend_stdctx_all")
+
+    assert len(chain_org_configs) == 3
+    assert all(isinstance(config, RefreshedOrgConfig) and config is not org_config for config in chain_org_configs)
+    assert {config.instance_url for config in chain_org_configs} == {org_config.instance_url}
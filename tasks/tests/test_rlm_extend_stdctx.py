@@ -0,0 +1,97 @@
+import re
+
+import pytest
+from cumulusci.core.exceptions import CumulusCIException
+
+from tasks import rlm_mock_org
+from tasks.rlm_extend_stdctx import clear_definition_listings
+from tasks.rlm_mock_org import MockError
+
+
+def definitions(mock_org, developer_name):
+    return [d for d in mock_org.context_definitions.values() if d["developerName"] == developer_name]
+
+
+def default_mappings(definition):
+    return [m["name"] for m in definition["contextDefinitionVersionList"][0]["contextMappings"] if m["isDefault"]]
+
+
+def writes(mock_org):
+    return {
+        endpoint: count
+        for endpoint, count in mock_org.snapshot()["endpoints"].items()
+        if endpoint.split()[0] in ("POST", "PATCH")
+    }
+
+
+@pytest.mark.parametrize("composite", [False, True])
+def test_creates_maps_and_activates_the_context_definition(run_task, mock_org, composite):
+    task = run_task("extendSalesContext", composite=composite)
+
+    [definition] = definitions(mock_org, "RLM_SalesTransactionContext")
+    assert definition["contextDefinitionId"] == task.return_values["contextDefinitionId"]
+    assert definition["baseReference"] == "SalesTransactionContext__stdctx"
+    assert definition["isActive"] is True
+    assert default_mappings(definition) == ["SalesTransaction"]
+
+
+def test_reconcile_leaves_an_up_to_date_definition_alone(run_task, mock_org):
+    created = run_task("extendSalesContext", reconcile=True)
+    before = writes(mock_org)
+    assert before
+
+    again = run_task("extendSalesContext", reconcile=True)
+
+    assert len(definitions(mock_org, "RLM_SalesTransactionContext")) == 1
+    assert again.return_values == {**created.return_values, "isActive": True}
+    assert writes(mock_org) == before
+
+
+# Without an ETag to revalidate against, the definition is still read from the org on every run
+def test_reconcile_follows_the_org_when_definitions_carry_no_etag(run_task, mock_org, monkeypatch):
+    monkeypatch.setattr(rlm_mock_org, "CONTEXT_DEFINITION_PATH", re.compile("^$"))
+    run_task("extendSalesContext", reconcile=True)
+    clear_definition_listings()
+    before = writes(mock_org)
+
+    run_task("extendSalesContext", reconcile=True)
+
+    assert writes(mock_org) == before
+
+    [definition] = definitions(mock_org, "RLM_SalesTransactionContext")
+    definition["isActive"] = False
+    for mapping in definition["contextDefinitionVersionList"][0]["contextMappings"]:
+        mapping["isDefault"] = False
+    clear_definition_listings()
+
+    run_task("extendSalesContext", reconcile=True)
+
+    assert definition["isActive"] is True
+    assert default_mappings(definition) == ["SalesTransaction"]
+
+
+def test_reconcile_recreates_a_definition_deleted_since_the_last_run(run_task, mock_org):
+    run_task("extendSalesContext", reconcile=True)
+    mock_org.context_definitions.clear()
+    clear_definition_listings()
+
+    run_task("extendSalesContext", reconcile=True)
+
+    [definition] = definitions(mock_org, "RLM_SalesTransactionContext")
+    assert definition["isActive"] is True
+
+
+def test_composite_mapping_failure_fails_the_task(run_task, mock_org):
+    def reject(context_id, params, body):
+        raise MockError(400, "Mapping update rejected")
+
+    mock_org.routes = [
+        (method, pattern, reject if handler.__name__ == "update_context_mappings" else handler)
+        for method, pattern, handler in mock_org.routes
+    ]
+
+    with pytest.raises(CumulusCIException, match="default context mapping"):
+        run_task("extendSalesContext", composite=True)
+
+    [definition] = definitions(mock_org, "RLM_SalesTransactionContext")
+    assert default_mappings(definition) == []
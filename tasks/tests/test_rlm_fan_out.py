@@ -0,0 +1,58 @@
+import pytest
+from cumulusci.core.exceptions import CumulusCIException
+from cumulusci.core.keychain import BaseProjectKeychain
+
+from tasks.rlm_mock_org import MockOrg, MockOrgServer
+from tasks.rlm_org_state import RefreshedOrgConfig
+
+SYNC_ENDPOINT = "GET /services/data/v61.0/connect/core-pricing/sync/syncData"
+
+
+# Two connected orgs, alpha and gamma, each a stand-in org of its own, in a keychain that also holds the
+# project's scratch org configs, none of them created
+@pytest.fixture
+def orgs(project_config, monkeypatch):
+    keychain = BaseProjectKeychain(project_config, None)
+    monkeypatch.setattr(project_config, "keychain", keychain)
+    orgs = {}
+    for name in ("alpha", "gamma"):
+        mock_org = MockOrg()
+        server = MockOrgServer(mock_org).__enter__()
+        keychain.set_org(RefreshedOrgConfig({"instance_url": server.url, "access_token": "mock-access-token"}, name))
+        orgs[name] = (mock_org, server)
+    yield {name: mock_org for name, (mock_org, _) in orgs.items()}
+    for _, server in orgs.values():
+        server.__exit__(None, None, None)
+
+
+def test_runs_a_task_in_every_org(run_task, orgs):
+    task = run_task("fan_out", orgs=["alpha", "gamma"], task="sync_pricing_data")
+
+    assert {org: result["status"] for org, result in task.return_values.items()} == {"alpha": "ok", "gamma": "ok"}
+    assert all(mock_org.snapshot()["endpoints"][SYNC_ENDPOINT] == 1 for mock_org in orgs.values())
+
+
+def test_runs_a_flow_in_every_org(run_task, orgs):
+    task = run_task("fan_out", orgs=["alpha", "gamma"], flow="refresh_pricing_and_contexts")
+
+    assert {org: result["status"] for org, result in task.return_values.items()} == {"alpha": "ok", "gamma": "ok"}
+    for mock_org in orgs.values():
+        assert len(mock_org.context_definitions) == 3
+        assert mock_org.snapshot()["endpoints"][SYNC_ENDPOINT] == 1
+
+
+def test_a_failing_org_does_not_stop_the_others(make_task, orgs):
+    orgs["gamma"].routes = [route for route in orgs["gamma"].routes if route[2].__name__ != "start_pricing_sync"]
+    task = make_task("fan_out", orgs=["alpha", "gamma", "missing", "beta"], task="sync_pricing_data")
+
+    with pytest.raises(CumulusCIException, match="did not complete in gamma, missing"):
+        task()
+
+    assert {org: result["status"] for org, result in task.return_values.items()} == {
+        "alpha": "ok",
+        "gamma": "failed",
+        "missing": "failed",
+        "beta": "skipped",
+    }
+    assert task.return_values["beta"]["error"] == "scratch org has not been created"
+    assert orgs["alpha"].snapshot()["endpoints"][SYNC_ENDPOINT] == 1
@@ -0,0 +1,120 @@
+import pytest
+from cumulusci.core.exceptions import CumulusCIException
+from cumulusci.core.flowrunner import FlowCoordinator
+
+import tasks.rlm_flow_scheduler as rlm_flow_scheduler
+from tasks.rlm_org_state import RefreshedOrgConfig, load_state, org_key, state_path
+
+
+# A flow of three steps against the stand-in org; the second fails until the org has RLM_ExtraProcedure
+@pytest.fixture(autouse=True)
+def flow(project_config, monkeypatch):
+    monkeypatch.setitem(
+        project_config.config["tasks"],
+        "activate_extra_procedure",
+        {
+            "class_path": "tasks.rlm_activation.SetActivationState",
+            "options": {"sobject": "ExpressionSetVersion", "names": "RLM_ExtraProcedure"},
+        },
+    )
+    monkeypatch.setitem(
+        project_config.config["flows"],
+        "mock_flow",
+        {
+            "steps": {
+                1: {"task": "activate_expression_sets"},
+                2: {"task": "activate_extra_procedure"},
+                3: {"task": "activate_decision_tables"},
+            }
+        },
+    )
+
+
+def add_extra_procedure(mock_org):
+    with mock_org.lock:
+        mock_org.store(
+            "ExpressionSetVersion",
+            {"ApiName": "RLM_ExtraProcedure", "Name": "RLM_ExtraProcedure", "IsActive": False, "VersionNumber": 1},
+        )
+
+
+def statuses(task):
+    return {step: timing["status"] for step, timing in task.return_values["steps"].items() if timing}
+
+
+def test_runs_independent_steps_and_their_dependents(run_task, mock_org):
+    add_extra_procedure(mock_org)
+
+    task = run_task("prepare_core_parallel", flow="mock_flow", depends_on={1: [], 2: [], 3: [1]})
+
+    assert statuses(task) == {"1": "ok", "2": "ok", "3": "ok"}
+    assert {record["ApiName"]: record["IsActive"] for record in mock_org.records["ExpressionSetVersion"]} == {
+        "RLM_DefaultPricingProcedure": False,
+        "RLM_ProductDiscoveryPricingProcedure": True,
+        "RLM_QualificationProcedure": True,
+        "RLM_ExtraProcedure": True,
+    }
+    assert all(record["Status"] == "Active" for record in mock_org.records["DecisionTable"][:5])
+
+
+def test_a_failed_step_stops_the_steps_after_it(run_task, mock_org):
+    with pytest.raises(CumulusCIException, match="failed at step 2 activate_extra_procedure"):
+        run_task("prepare_core_parallel", flow="mock_flow", depends_on={})
+
+    assert {record["Status"] for record in mock_org.records["DecisionTable"][1:]} == {"Draft"}
+
+
+def test_resume_skips_the_steps_completed_with_the_same_inputs(run_task, mock_org, org_config, project_config):
+    with pytest.raises(CumulusCIException):
+        run_task("prepare_rlm_org_resumable", flow="mock_flow")
+    checkpoint = load_state(state_path(project_config, org_key(org_config), "flows", "mock_flow"))
+    assert sorted(checkpoint["steps"]) == ["1"]
+
+    add_extra_procedure(mock_org)
+    task = run_task("prepare_rlm_org_resumable", flow="mock_flow")
+
+    assert statuses(task) == {"1": "resumed", "2": "ok", "3": "ok"}
+    assert mock_org.records["ExpressionSetVersion"][-1]["IsActive"] is True
+
+
+def test_without_resume_every_step_runs_again(run_task, mock_org):
+    add_extra_procedure(mock_org)
+    run_task("prepare_rlm_org_resumable", flow="mock_flow")
+
+    task = run_task("prepare_rlm_org_resumable", flow="mock_flow", resume=False)
+
+    assert statuses(task) == {"1": "ok", "2": "ok", "3": "ok"}
+
+
+def test_stock_api_tasks_run_alongside_other_steps(make_task, project_config):
+    task = make_task("prepare_rlm_org_parallel")
+    coordinator = FlowCoordinator(project_config, project_config.get_flow("prepare_rlm_org"), name="prepare_rlm_org")
+    lanes = {step.task_name: task._lane(step) for step in coordinator.steps if step.task_class}
+
+    assert lanes["assign_permission_sets"] == "shared"
+    assert lanes["createPartnerCentral"] == "shared"
+    assert lanes["publish_community"] == "shared"
+    assert lanes["activate_expression_sets"] == "shared"
+    assert lanes["deploy_full"] == "exclusive"
+    assert lanes["deploy_post"] == "exclusive"
+
+
+def test_steps_get_a_snapshot_of_the_org_refreshed_once(run_task, mock_org, org_config, monkeypatch):
+    add_extra_procedure(mock_org)
+    refreshes = []
+    monkeypatch.setattr(org_config, "refresh_oauth_token", lambda *args, **kwargs: refreshes.append(args))
+    step_org_configs = []
+    task_runner = rlm_flow_scheduler.TaskRunner
+
+    def recording_task_runner(step, org_config, flow):
+        step_org_configs.append(org_config)
+        return task_runner(step, org_config, flow=flow)
+
+    monkeypatch.setattr(rlm_flow_scheduler, "TaskRunner", recording_task_runner)
+
+    run_task("prepare_core_parallel", flow="mock_flow", depends_on={1: [], 2: [], 3: [1]})
+
+    assert len(refreshes) == 1
+    assert len(step_org_configs) == 3
+    assert all(isinstance(config, RefreshedOrgConfig) for config in step_org_configs)
+    assert {config.access_token for config in step_org_configs} == {"mock-access-token"}
@@ -0,0 +1,25 @@
+from tasks.rlm_generate_dataset import align_parts
+
+
+def test_align_parts_matches_every_part_when_none_was_dropped():
+    assert align_parts(["Laptop", "Catalog", "Hardware"], [None, {"Catalog"}, {"Hardware"}]) == [0, 1, 2]
+
+
+def test_align_parts_skips_spec_parts_dropped_from_the_value():
+    domains = [None, {"Catalog"}, {"Hardware", "Software"}]
+
+    assert align_parts(["Laptop", "Hardware"], domains) == [0, 2]
+    assert align_parts(["Laptop"], domains) == [0]
+
+
+def test_align_parts_uses_the_earliest_spec_part_a_value_fits():
+    domains = [None, {"Annual", "Term"}, {"Annual"}]
+
+    assert align_parts(["Plan", "Term", "Annual"], domains) == [0, 1, 2]
+    assert align_parts(["Plan", "Annual"], domains) == [0, 1]
+
+
+def test_align_parts_without_an_alignment():
+    assert align_parts(["Laptop", "Unknown"], [None, {"Catalog"}]) is None
+    assert align_parts(["a", "b", "c"], [None, None]) is None
+    assert align_parts([], [None]) == []
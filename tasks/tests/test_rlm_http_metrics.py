@@ -0,0 +1,38 @@
+import pytest
+
+from tasks.rlm_http_metrics import MetricsRecorder, endpoint_template, percentile
+
+
+def test_percentile_uses_the_nearest_rank():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 100) == 100
+    assert percentile([7], 99) == 7
+    assert percentile([1, 2, 3, 4], 0) == 1
+    assert percentile([], 50) is None
+
+
+def test_endpoint_template_drops_host_version_query_and_ids():
+    url = "https://x.my.salesforce.com/services/data/v62.0/connect/context-definitions/11O000000000096AAA?q=1"
+
+    assert endpoint_template(url) == "/connect/context-definitions/{id}"
+    assert endpoint_template("https://x.my.salesforce.com/services/data/v62.0/query") == "/query"
+
+
+def test_summary_aggregates_samples_per_endpoint():
+    recorder = MetricsRecorder()
+    for latency in (0.1, 0.2, 0.3):
+        recorder.record("get", "https://x/services/data/v62.0/query?q=x", 200, latency, 0, 100, 0)
+    recorder.record("post", "https://x/services/data/v62.0/composite", 429, 0.5, 10, 20, 2)
+
+    summary = recorder.summary()
+    rows = {row["endpoint"]: row for row in summary["endpoints"]}
+
+    assert summary["total_calls"] == 4
+    assert rows["GET /query"]["calls"] == 3
+    assert rows["GET /query"]["p50_ms"] == pytest.approx(200)
+    assert rows["GET /query"]["response_bytes"] == 300
+    assert rows["POST /composite"]["retries"] == 2
+    assert rows["POST /composite"]["statuses"] == {"429": 1}
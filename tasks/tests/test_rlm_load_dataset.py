@@ -0,0 +1,85 @@
+import csv
+import os
+
+import pytest
+from cumulusci.core.exceptions import CumulusCIException
+
+from tasks.rlm_load_dataset import bulk_csv, field_value, key_value
+
+MULTICURRENCY = os.path.join("datasets", "sfdmu", "multicurrency")
+
+
+def csv_rows(sobject):
+    with open(os.path.join(MULTICURRENCY, f"{sobject}.csv"), newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def totals(task):
+    objects = task.return_values["objects"].values()
+    return {key: sum(result.get(key, 0) for result in objects) for key in ("inserted", "updated", "skipped", "failed")}
+
+
+def test_key_and_field_values_round_trip_csv_text():
+    assert key_value(True) == "true"
+    assert key_value(5.0) == "5"
+    assert key_value(None) == ""
+    assert field_value("TRUE", {"type": "boolean"}) is True
+    assert field_value("3.0", {"type": "int"}) == 3
+    assert field_value("", {"type": "string"}) is None
+
+
+def test_bulk_csv_clears_none_values():
+    data = bulk_csv([{"attributes": {"type": "Product2"}, "Name": "Laptop", "Description": None}])
+
+    assert data == b"Description,Name\n#N/A,Laptop\n"
+
+
+def test_load_writes_every_row_with_its_lookups_resolved(run_task, mock_org):
+    task = run_task("insert_quantumbit_data", incremental=False)
+
+    assert totals(task)["failed"] == 0
+    products = {record["Name"] for record in mock_org.records["Product2"]}
+    assert {row["Name"] for row in csv_rows("Product2")} <= products
+    catalogs = {record["Id"]: record["Name"] for record in mock_org.records["ProductCatalog"]}
+    categories = {record["Name"]: record for record in mock_org.records["ProductCategory"]}
+    for row in csv_rows("ProductCategory"):
+        assert catalogs[categories[row["Name"]]["CatalogId"]] == row["Catalog.Name"]
+
+
+def test_incremental_load_skips_unchanged_objects_and_reloads_children_of_a_recreated_parent(run_task, mock_org):
+    first = totals(run_task("insert_quantumbit_data"))
+    second = totals(run_task("insert_quantumbit_data"))
+
+    assert second == {"inserted": 0, "updated": 0, "skipped": first["inserted"] + first["updated"], "failed": 0}
+
+    # A selling model deleted outside the loader is recreated, and the options pointing at it are repointed
+    deleted = mock_org.records["ProductSellingModel"].pop(0)
+    third = run_task("insert_quantumbit_data").return_values["objects"]
+
+    assert third["ProductSellingModel"]["inserted"] == 1
+    recreated = next(record for record in mock_org.records["ProductSellingModel"] if record["Name"] == deleted["Name"])
+    options = [
+        record for record in mock_org.records["ProductSellingModelOption"]
+        if record["ProductSellingModelId"] in (deleted["Id"], recreated["Id"])
+    ]
+    assert options
+    assert all(record["ProductSellingModelId"] == recreated["Id"] for record in options)
+
+
+def test_objects_looking_up_a_failed_object_are_left_out(run_task, mock_org, monkeypatch):
+    validate = mock_org.validate
+
+    def reject_catalogs(sobject, record):
+        if sobject == "ProductCatalog":
+            return [{"statusCode": "FIELD_CUSTOM_VALIDATION_EXCEPTION", "message": "Catalogs are locked", "fields": []}]
+        return validate(sobject, record)
+
+    monkeypatch.setattr(mock_org, "validate", reject_catalogs)
+
+    with pytest.raises(CumulusCIException, match="ProductCatalog .*Catalogs are locked") as failure:
+        run_task("insert_quantumbit_data", incremental=False)
+
+    assert "Not loaded because of these failures: ProductCategory, ProductCategoryProduct" in str(failure.value)
+    assert "ProductCategory" not in mock_org.records
+    assert "ProductCategoryProduct" not in mock_org.records
+    assert mock_org.records["Product2"]
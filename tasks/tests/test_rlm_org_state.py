@@ -0,0 +1,35 @@
+from tasks.rlm_org_state import content_hash, load_state, path_hash, save_state
+
+
+def test_content_hash_is_stable_and_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash("task", {"a": 1}) == content_hash("task", {"a": 1})
+    assert len(content_hash("x")) == 16
+
+
+def test_content_hash_changes_with_any_value():
+    base = content_hash("deploy", {"path": "force-app"})
+
+    assert content_hash("deploy", {"path": "unpackaged"}) != base
+    assert content_hash("deploy2", {"path": "force-app"}) != base
+    assert content_hash(["a", "b"]) != content_hash(["b", "a"])
+
+
+def test_path_hash_follows_file_content_and_names(tmp_path):
+    (tmp_path / "a.txt").write_text("one")
+    before = path_hash(str(tmp_path))
+
+    (tmp_path / "a.txt").write_text("two")
+    changed = path_hash(str(tmp_path))
+    (tmp_path / "a.txt").rename(tmp_path / "b.txt")
+
+    assert changed != before
+    assert path_hash(str(tmp_path)) != changed
+
+
+def test_state_round_trips_and_missing_files_read_as_empty(tmp_path):
+    path = str(tmp_path / "org" / "flows" / "prepare.json")
+
+    assert load_state(path) == {}
+    save_state(path, {"steps": {"1": "done"}})
+    assert load_state(path) == {"steps": {"1": "done"}}
@@ -0,0 +1,39 @@
+import pytest
+from cumulusci.core.exceptions import CumulusCIException
+
+
+def assignments(mock_org, sobject, lookup):
+    return {(record["AssigneeId"], record[lookup]) for record in mock_org.records.get(sobject, []) if record.get(lookup)}
+
+
+def test_assigns_every_missing_permission_once(run_task, mock_org):
+    users = ["admin@rlm.example", "prtnr1", "prtnr2"]
+    task = run_task("assign_rlm_permissions", users=users)
+
+    user_ids = {record["Id"] for record in mock_org.records["User"] if record["Alias"] in ("admin", "prtnr1", "prtnr2")}
+    licenses = {record["Id"] for record in mock_org.records["PermissionSetLicense"]}
+    groups = {record["Id"] for record in mock_org.records["PermissionSetGroup"]}
+    permission_sets = {record["Id"] for record in mock_org.records["PermissionSet"]}
+    assert assignments(mock_org, "PermissionSetLicenseAssign", "PermissionSetLicenseId") == {
+        (user, license) for user in user_ids for license in licenses
+    }
+    assert assignments(mock_org, "PermissionSetAssignment", "PermissionSetGroupId") == {
+        (user, group) for user in user_ids for group in groups
+    }
+    assert assignments(mock_org, "PermissionSetAssignment", "PermissionSetId") == {
+        (user, permission_set) for user in user_ids for permission_set in permission_sets
+    }
+    assert task.return_values["assigned"] == len(user_ids) * (len(licenses) + len(groups) + len(permission_sets))
+
+    again = run_task("assign_rlm_permissions", users=users)
+
+    assert again.return_values["assigned"] == 0
+    assert again.return_values["existing"] == task.return_values["assigned"]
+    assert len(mock_org.records["PermissionSetAssignment"]) == len(user_ids) * (len(groups) + len(permission_sets))
+
+
+def test_unknown_names_fail_before_anything_is_written(run_task, mock_org):
+    with pytest.raises(CumulusCIException, match="NoSuchSet"):
+        run_task("assign_rlm_permissions", users=["admin"], permission_sets=["NoSuchSet"])
+
+    assert "PermissionSetAssignment" not in mock_org.records
@@ -0,0 +1,32 @@
+import itertools
+import random
+
+from tasks.rlm_polling import backoff_delays, poll
+
+
+def test_backoff_delays_grow_to_the_cap_with_jitter():
+    random.seed(1)
+    delays = list(itertools.islice(backoff_delays(initial_delay=1, max_delay=8), 8))
+
+    for delay, step in zip(delays, [1, 2, 4, 8, 8, 8, 8, 8]):
+        assert step / 2 <= delay <= step
+
+
+def test_poll_backs_off_until_the_check_passes():
+    results = iter([None, None, "ready"])
+    waits = []
+
+    result, _, attempts = poll(lambda: next(results), timeout=60, initial_delay=1, max_delay=2, sleep=waits.append)
+
+    assert result == "ready"
+    assert attempts == 3
+    assert len(waits) == 2
+    assert all(0.5 <= wait <= 2 for wait in waits)
+
+
+def test_poll_returns_the_last_result_on_timeout():
+    result, elapsed, attempts = poll(lambda: [], timeout=0, sleep=lambda seconds: None)
+
+    assert result == []
+    assert attempts == 1
+    assert elapsed >= 0
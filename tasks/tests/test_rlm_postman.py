@@ -0,0 +1,112 @@
+import json
+import logging
+import shutil
+
+import pytest
+from cumulusci.core.exceptions import CumulusCIException
+
+import tasks.rlm_postman as rlm_postman
+
+needs_node = pytest.mark.skipif(not shutil.which("node"), reason="node is not installed")
+
+
+def request(name, method, path, test=None, body=None):
+    item = {"name": name, "request": {"method": method, "url": {"raw": "{{url}}/services/data/v{{version}}/" + path}}}
+    if body is not None:
+        item["request"]["body"] = {"mode": "raw", "raw": json.dumps(body)}
+    if test:
+        item["event"] = [{"listen": "test", "script": {"exec": test.splitlines()}}]
+    return item
+
+
+# A collection whose setup folder captures a catalog ID that the load folder reads back
+@pytest.fixture
+def collection(tmp_path, mock_org):
+    with mock_org.lock:
+        mock_org.store("ProductCatalog", {"Name": "QuantumBit Catalog"})
+    path = tmp_path / "collection.json"
+    path.write_text(
+        json.dumps(
+            {
+                "item": [
+                    {
+                        "name": "Setup",
+                        "item": [
+                            request(
+                                "List Catalogs",
+                                "POST",
+                                "connect/pcm/catalogs",
+                                'pm.environment.set("catalogId", pm.response.json().catalogs[0].id);',
+                                body={},
+                            )
+                        ],
+                    },
+                    {
+                        "name": "Load",
+                        "item": [
+                            request(
+                                "Get Catalog",
+                                "GET",
+                                "connect/pcm/catalogs/{{catalogId}}",
+                                'pm.test("is the captured catalog", () => '
+                                'pm.expect(pm.response.json().catalogs[0].id).to.eql(pm.environment.get("catalogId")));',
+                            )
+                        ],
+                    },
+                ]
+            }
+        )
+    )
+    return str(path)
+
+
+def replay(run_task, collection, **options):
+    return run_task("replay_postman", collection=collection, setup=["Setup"], folders=["Load"], **options)
+
+
+@needs_node
+def test_ids_captured_in_setup_feed_every_virtual_user(run_task, mock_org, collection):
+    task = replay(run_task, collection, users=3, iterations=2)
+
+    assert task.return_values["requests"] == 6
+    assert task.return_values["errors"] == 0
+    assert task.return_values["by_request"][0]["statuses"] == {"200": 6}
+
+
+@needs_node
+def test_every_virtual_user_runs_scripts_in_its_own_sandbox(run_task, collection, monkeypatch):
+    sandboxes = []
+    script_sandbox = rlm_postman.ScriptSandbox
+
+    def recording_sandbox():
+        sandboxes.append(script_sandbox())
+        return sandboxes[-1]
+
+    monkeypatch.setattr(rlm_postman, "ScriptSandbox", recording_sandbox)
+
+    replay(run_task, collection, users=3, iterations=1)
+
+    assert len(sandboxes) == 4
+    assert all(sandbox.process.poll() is not None for sandbox in sandboxes)
+
+
+@needs_node
+def test_a_failed_setup_request_stops_the_task_before_the_load(run_task, mock_org, collection):
+    with mock_org.lock:
+        mock_org.records["ProductCatalog"].clear()
+
+    with pytest.raises(CumulusCIException, match="1 of 1 setup requests failed; the load folders were not replayed"):
+        replay(run_task, collection, users=2)
+
+    assert not [key for key in mock_org.snapshot()["endpoints"] if key.startswith("GET")]
+
+
+def test_without_node_the_skipped_scripts_are_reported(run_task, collection, monkeypatch, caplog):
+    monkeypatch.setattr(rlm_postman.shutil, "which", lambda name: None)
+
+    with caplog.at_level(logging.WARNING):
+        task = replay(run_task, collection, users=1, iterations=1, fail_on_error=False)
+
+    assert task.return_values["scripts"] is False
+    assert task.return_values["errors"] == 1
+    assert "pre-request and test scripts are SKIPPED" in caplog.text
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from tasks import rlm_response_cache
+from tasks.rlm_response_cache import ResponseCache, resource_family
+
+BASE = "https://x.my.salesforce.com/services/data/v62.0"
+DEFINITIONS = f"{BASE}/connect/context-definitions"
+DESCRIBE = f"{BASE}/sobjects/Product2/describe"
+
+
+class Response:
+    def __init__(self, **headers):
+        self.headers = headers
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rlm_response_cache.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "responses"), "62.0", ttl=60, max_bytes=1_000_000)
+
+
+def test_resource_family_is_the_first_two_path_segments():
+    assert resource_family(f"{DEFINITIONS}/11O000000000096AAA/context-mappings") == "connect/context-definitions"
+    assert resource_family(DESCRIBE) == "sobjects/Product2"
+
+
+def test_entries_without_validators_are_fresh_for_ttl_seconds(cache, clock):
+    cache.put(DEFINITIONS, None, Response(), {"contextDefinitionList": []})
+    entry = cache.get(DEFINITIONS)
+
+    assert entry["body"] == {"contextDefinitionList": []}
+    assert cache.fresh(entry)
+    assert not cache.fresh(entry, revalidate=True)
+    clock[0] += 61
+    assert not cache.fresh(entry)
+
+
+def test_revalidated_entries_start_a_new_ttl(cache, clock):
+    cache.put(DEFINITIONS, None, Response(), {})
+    clock[0] += 61
+    cache.revalidated(DEFINITIONS, None, cache.get(DEFINITIONS))
+
+    assert cache.fresh(cache.get(DEFINITIONS))
+
+
+def test_entries_with_validators_are_always_revalidated(cache):
+    cache.put(DESCRIBE, None, Response(ETag='"abc"'), {"fields": []})
+    cache.put(DEFINITIONS, None, Response(Date="Tue, 01 Oct 2024 10:00:00 GMT"), {})
+    tagged, dated = cache.get(DESCRIBE), cache.get(DEFINITIONS)
+
+    assert not cache.fresh(tagged)
+    assert cache.validators(tagged) == {"If-None-Match": '"abc"'}
+    assert cache.validators(dated) == {}
+    assert cache.validators(dated, revalidate=True) == {"If-Modified-Since": "Tue, 01 Oct 2024 10:00:00 GMT"}
+
+
+def test_entries_are_keyed_by_url_and_params(cache):
+    cache.put(f"{BASE}/query", {"q": "SELECT Id FROM Account"}, Response(), {"records": [1]})
+
+    assert cache.get(f"{BASE}/query", {"q": "SELECT Id FROM Account"})["body"] == {"records": [1]}
+    assert cache.get(f"{BASE}/query", {"q": "SELECT Id FROM Contact"}) is None
+
+
+def test_a_write_drops_only_its_resource_family(cache):
+    cache.put(DEFINITIONS, None, Response(), {})
+    cache.put(f"{DEFINITIONS}/11O000000000096AAA", None, Response(), {})
+    cache.put(DESCRIBE, None, Response(), {})
+
+    cache.invalidate(f"{DEFINITIONS}/11O000000000096AAA/context-mappings")
+
+    assert cache.get(DEFINITIONS) is None
+    assert cache.get(f"{DEFINITIONS}/11O000000000096AAA") is None
+    assert cache.get(DESCRIBE) is not None
+
+
+def test_a_composite_write_drops_every_entry(cache):
+    cache.put(DEFINITIONS, None, Response(), {})
+    cache.put(DESCRIBE, None, Response(), {})
+
+    cache.invalidate(f"{BASE}/composite")
+
+    assert cache.get(DEFINITIONS) is None
+    assert cache.get(DESCRIBE) is None
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "responses"), "62.0", ttl=60, max_bytes=2500)
+    for number in range(3):
+        url = f"{BASE}/sobjects/Object{number}/describe"
+        cache.put(url, None, Response(), {"padding": "x" * 1000})
+        # Entries age in the order they were written, whatever the file system's timestamp resolution
+        os.utime(cache._path(url, None), (number, number))
+
+    assert cache.get(f"{BASE}/sobjects/Object0/describe") is None
+    assert cache.get(f"{BASE}/sobjects/Object2/describe") is not None
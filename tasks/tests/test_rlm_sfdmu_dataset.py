@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+from tasks.rlm_sfdmu_dataset import Dataset, composite_key, key_spec_parts
+
+MULTICURRENCY = os.path.join("datasets", "sfdmu", "multicurrency")
+
+
+def write_dataset(directory, objects):
+    export = {"objectSets": [{"objects": [{"query": query, "operation": "Upsert"} for query, _ in objects]}]}
+    (directory / "export.json").write_text(json.dumps(export))
+    for query, header in objects:
+        sobject = query.split(" FROM ")[1]
+        (directory / f"{sobject}.csv").write_text(header + "\n")
+    return Dataset(str(directory))
+
+
+def test_composite_key_drops_empty_and_false_parts():
+    assert composite_key(["Laptop", "", None, "false", "Catalog"]) == "Laptop;Catalog"
+    assert composite_key(["true", 5]) == "true;5"
+    assert composite_key([]) == ""
+
+
+def test_key_spec_parts_reads_both_spellings():
+    assert key_spec_parts("$$Name$Catalog.Name$ParentCategory.Name") == ["Name", "Catalog.Name", "ParentCategory.Name"]
+    assert key_spec_parts("Name; Catalog.Name") == ["Name", "Catalog.Name"]
+
+
+def test_waves_order_objects_after_their_lookup_targets(tmp_path):
+    dataset = write_dataset(
+        tmp_path,
+        [
+            ("SELECT Name FROM ProductCategoryProduct", "Name,ProductCategory.Name,Product.Name"),
+            ("SELECT Name FROM ProductCategory", "Name,Catalog.Name,ParentCategory.Name"),
+            ("SELECT Name FROM ProductCatalog", "Name"),
+            ("SELECT Name FROM Product2", "Name"),
+        ],
+    )
+
+    assert [sorted(wave) for wave in dataset.waves()] == [
+        ["Product2", "ProductCatalog"],
+        ["ProductCategory"],
+        ["ProductCategoryProduct"],
+    ]
+
+
+def test_waves_reject_circular_lookups(tmp_path):
+    dataset = write_dataset(
+        tmp_path,
+        [
+            ("SELECT Name FROM Account", "Name,Contact.Name"),
+            ("SELECT Name FROM Contact", "Name,Account.Name"),
+        ],
+    )
+
+    with pytest.raises(ValueError, match="Circular lookups"):
+        dataset.waves()
+
+
+def test_waves_of_the_multicurrency_dataset_cover_every_object_once():
+    dataset = Dataset(MULTICURRENCY)
+    dependencies = dataset.dependencies()
+    seen = set()
+    for wave in dataset.waves():
+        for sobject in wave:
+            assert dependencies[sobject] <= seen
+        seen.update(wave)
+
+    assert seen == set(dataset.by_name)
@@ -0,0 +1,59 @@
+import csv
+import os
+
+import pytest
+from cumulusci.core.exceptions import CumulusCIException
+
+from tasks.rlm_stream_load import ExternalIdIndex, IndexView
+
+MULTICURRENCY = os.path.join("datasets", "sfdmu", "multicurrency")
+
+
+def test_index_moves_to_sqlite_past_its_memory_limit(tmp_path):
+    index = ExternalIdIndex(str(tmp_path / "index.sqlite"), memory_limit=3)
+    index.replace("Product2", [("A", "01t1"), ("B", "01t2")])
+    assert not index.spilled
+
+    index.replace("ProductCatalog", [("Software", "0ZS1"), ("Hardware", "0ZS2")])
+    assert index.spilled
+    assert index.get("Product2", "B") == "01t2"
+    assert IndexView(index, "ProductCatalog").get("Hardware") == "0ZS2"
+    assert IndexView(index, "ProductCatalog").get("Missing", "none") == "none"
+
+    index.replace("Product2", [("C", "01t3")])
+    assert index.get("Product2", "A") is None
+    assert index.get("Product2", "C") == "01t3"
+    index.close()
+    assert not os.path.exists(tmp_path / "index.sqlite")
+
+
+def test_stream_load_writes_every_row_through_bulk_jobs(run_task, mock_org):
+    task = run_task("load_scaled_catalog", dataset=MULTICURRENCY, chunk_size=50, max_jobs=2, bulk_threshold=1)
+
+    assert not any(result.get("failed") for result in task.return_values["objects"].values())
+    assert mock_org.ingest_jobs
+    with open(os.path.join(MULTICURRENCY, "PricebookEntry.csv"), newline="", encoding="utf-8-sig") as f:
+        entries = list(csv.DictReader(f))
+    assert len(mock_org.records["PricebookEntry"]) == len(entries)
+    products = {record["Id"]: record["Name"] for record in mock_org.records["Product2"]}
+    loaded = sorted(products[record["Product2Id"]] for record in mock_org.records["PricebookEntry"])
+    assert loaded == sorted(row["Product2.Name"] for row in entries)
+
+
+def test_later_waves_leave_out_objects_looking_up_a_failed_object(run_task, mock_org, monkeypatch):
+    validate = mock_org.validate
+
+    def reject_products(sobject, record):
+        if sobject == "Product2":
+            return [{"statusCode": "FIELD_CUSTOM_VALIDATION_EXCEPTION", "message": "Products are locked", "fields": []}]
+        return validate(sobject, record)
+
+    monkeypatch.setattr(mock_org, "validate", reject_products)
+
+    with pytest.raises(CumulusCIException, match="Product2 .*Products are locked") as failure:
+        run_task("load_scaled_catalog", dataset=MULTICURRENCY, chunk_size=50, max_jobs=2, bulk_threshold=1)
+
+    assert "PricebookEntry" in str(failure.value).split("Not loaded because of these failures: ")[1]
+    assert "PricebookEntry" not in mock_org.records
+    assert "ProductRelatedComponent" not in mock_org.records
+    assert mock_org.records["AttributeDefinition"]
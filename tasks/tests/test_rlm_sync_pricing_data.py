@@ -0,0 +1,34 @@
+import pytest
+from cumulusci.core.exceptions import CumulusCIException
+
+from tasks.rlm_mock_org import MockError
+
+
+@pytest.fixture(autouse=True)
+def keychain(project_config, monkeypatch):
+    monkeypatch.setattr(project_config, "keychain", None)
+
+
+def test_starts_the_pricing_sync(run_task, mock_org):
+    task = run_task("sync_pricing_data")
+
+    assert task.success is True
+    assert [endpoint for endpoint in mock_org.snapshot()["endpoints"] if endpoint.endswith("/sync/syncData")] == [
+        "GET /services/data/v61.0/connect/core-pricing/sync/syncData"
+    ]
+
+
+@pytest.mark.parametrize("answer", [(200, {"success": False}), MockError(500, "Sync unavailable")])
+def test_a_sync_the_org_does_not_accept_fails_the_task(run_task, mock_org, answer):
+    def start_pricing_sync(params, body):
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    mock_org.routes = [
+        (method, pattern, start_pricing_sync if handler.__name__ == "start_pricing_sync" else handler)
+        for method, pattern, handler in mock_org.routes
+    ]
+
+    with pytest.raises(CumulusCIException, match="Pricing sync was not accepted"):
+        run_task("sync_pricing_data")
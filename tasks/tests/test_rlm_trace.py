@@ -0,0 +1,88 @@
+import json
+
+import pytest
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+
+from tasks import rlm_connect_client
+from tasks.rlm_polling import poll
+from tasks.rlm_trace import Tracer, trace_span
+
+
+@pytest.fixture(autouse=True)
+def flow(project_config, monkeypatch):
+    monkeypatch.setitem(
+        project_config.config["flows"],
+        "mock_flow",
+        {
+            "steps": {
+                1: {"task": "activate_expression_sets"},
+                2: {"task": "wait_for_price_adjustment_schedules", "options": {"timeout": 0.2, "initial_delay": 0.05}},
+            }
+        },
+    )
+
+
+def events(path, category):
+    with open(path) as f:
+        return [event for event in json.load(f)["traceEvents"] if event.get("cat") == category]
+
+
+def test_recording_registers_and_removes_its_request_hook():
+    hooks = list(rlm_connect_client._request_hooks)
+    tracer = Tracer()
+
+    with tracer.recording():
+        assert tracer.record_request in rlm_connect_client._request_hooks
+        with pytest.raises(TaskOptionsError):
+            with Tracer().recording():
+                pass
+
+    assert rlm_connect_client._request_hooks == hooks
+    with trace_span("after", "step"):
+        pass
+    assert tracer.events == []
+
+
+def test_polling_waits_are_recorded_as_sleep_spans():
+    tracer = Tracer()
+    checks = iter([False, False, True])
+
+    with tracer.recording(), trace_span("1 wait", "step"):
+        ready, _, attempts = poll(lambda: next(checks), timeout=5, initial_delay=0.01, sleep=lambda delay: None)
+
+    assert ready and attempts == 3
+    sleeps = [event for event in tracer.events if event["cat"] == "sleep"]
+    assert [event["args"]["step"] for event in sleeps] == ["1 wait", "1 wait"]
+
+
+def test_trace_flow_records_steps_and_api_calls(run_task, tmp_path):
+    output = str(tmp_path / "trace.json")
+
+    run_task("trace_flow", flow="mock_flow", output=output)
+
+    assert [event["name"] for event in events(output, "step")] == [
+        "1 activate_expression_sets",
+        "2 wait_for_price_adjustment_schedules",
+    ]
+    calls = events(output, "http")
+    assert {event["args"]["step"] for event in calls} == {
+        "1 activate_expression_sets",
+        "2 wait_for_price_adjustment_schedules",
+    }
+    assert any(event["name"].startswith("PATCH") for event in calls)
+    with open(str(tmp_path / "trace_summary.txt")) as f:
+        assert "HTTP calls" in f.read()
+
+
+def test_parallel_flow_writes_a_trace_when_a_step_fails(run_task, mock_org, tmp_path):
+    mock_org.records["PriceAdjustmentSchedule"] = []
+    output = str(tmp_path / "trace.json")
+
+    with pytest.raises(CumulusCIException):
+        run_task("prepare_core_parallel", flow="mock_flow", depends_on={}, trace=output)
+
+    assert [event["name"] for event in events(output, "step")] == [
+        "1 activate_expression_sets",
+        "2 wait_for_price_adjustment_schedules",
+    ]
+    assert {event["args"]["step"] for event in events(output, "sleep")} == {"2 wait_for_price_adjustment_schedules"}
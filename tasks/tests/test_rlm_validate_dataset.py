@@ -0,0 +1,70 @@
+import csv
+import os
+import shutil
+
+import pytest
+from cumulusci.core.exceptions import CumulusCIException
+
+PARENT_COLUMN = "ParentCategory.$$Name$Catalog.Name$ParentCategory.Name"
+
+
+# Copy of the multicurrency dataset that a test can break
+@pytest.fixture
+def dataset(tmp_path):
+    directory = str(tmp_path / "multicurrency")
+    shutil.copytree(os.path.join("datasets", "sfdmu", "multicurrency"), directory)
+    return directory
+
+
+def edit_csv(directory, sobject, edit):
+    path = os.path.join(directory, f"{sobject}.csv")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+        columns = list(rows[0])
+    rows = edit(rows)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_the_shipped_datasets_have_no_broken_references(run_task):
+    task = run_task("validate_datasets")
+
+    assert len(task.return_values) == 7
+    assert all(not result["errors"] for result in task.return_values.values())
+    assert task.return_values[os.path.join("datasets", "sfdmu", "multicurrency")]["lookups"] > 2000
+
+
+def test_reports_a_lookup_to_a_missing_row(make_task, dataset):
+    def break_product(rows):
+        rows[0]["Product2.Name"] = "Missing Product"
+        return rows
+
+    edit_csv(dataset, "PricebookEntry", break_product)
+    task = make_task("validate_datasets", datasets=[dataset])
+
+    with pytest.raises(CumulusCIException, match="Broken references in"):
+        task()
+
+    assert task.return_values[dataset]["errors"] == [
+        "PricebookEntry.csv line 2: Product2.Name 'Missing Product' matches no Product2 row"
+    ]
+
+
+def test_parent_rows_are_found_wherever_they_are_in_the_file(make_task, dataset):
+    def add_children(rows):
+        child = dict(rows[0], Name="Child", SortOrder="", **{"$$Name$Catalog.Name$ParentCategory.Name": "Child;Software"})
+        orphan = dict(child, Name="Orphan", **{"$$Name$Catalog.Name$ParentCategory.Name": "Orphan;Software"})
+        child[PARENT_COLUMN] = rows[-1]["$$Name$Catalog.Name$ParentCategory.Name"]
+        orphan[PARENT_COLUMN] = "Missing;Software"
+        return [child, orphan] + rows
+
+    edit_csv(dataset, "ProductCategory", add_children)
+    task = make_task("validate_datasets", datasets=[dataset], fail_on_error=False)
+
+    task()
+
+    assert task.return_values[dataset]["errors"] == [
+        f"ProductCategory.csv line 3: {PARENT_COLUMN} 'Missing;Software' matches no ProductCategory row"
+    ]
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+from cumulusci.core.exceptions import CumulusCIException, TaskOptionsError
+
+
+def test_price_adjustment_schedules_are_ready_in_a_prepared_org(run_task):
+    task = run_task("wait_for_price_adjustment_schedules", timeout=1)
+
+    assert [(probe["probe"], probe["ready"], probe["attempts"]) for probe in task.return_values["probes"]] == [
+        ("record_ids", True, 1),
+        ("soql_count", True, 1),
+    ]
+
+
+def test_waits_for_every_record_the_deploy_substitutes(run_task, mock_org):
+    mock_org.records["PriceAdjustmentSchedule"] = [
+        record
+        for record in mock_org.records["PriceAdjustmentSchedule"]
+        if record["Name"] != "Standard Tier Based Adjustment"
+    ]
+
+    with pytest.raises(CumulusCIException, match="PriceAdjustmentSchedule Standard Tier Based Adjustment"):
+        run_task("wait_for_price_adjustment_schedules", timeout=0.2, initial_delay=0.05)
+
+
+def test_waits_until_the_deployed_decision_table_is_active(run_task, mock_org):
+    [table] = [record for record in mock_org.records["DecisionTable"] if record["DeveloperName"] == "RLM_ProductQualification"]
+    table["Status"] = "Draft"
+
+    with pytest.raises(CumulusCIException, match="RLM_ProductQualification"):
+        run_task("wait_for_decision_tables", timeout=0.2, initial_delay=0.05)
+
+    activation = threading.Timer(0.2, table.update, kwargs={"Status": "Active"})
+    activation.start()
+    task = run_task("wait_for_decision_tables", timeout=5, initial_delay=0.05, max_delay=0.1)
+    activation.join()
+
+    [probe] = task.return_values["probes"]
+    assert probe["ready"] is True
+    assert probe["attempts"] > 1
+
+
+def test_context_definitions_become_ready_once_extended(run_task):
+    with pytest.raises(CumulusCIException, match="RLM_CartContext"):
+        run_task("wait_for_context_definitions", timeout=0.2, initial_delay=0.05)
+
+    run_task("extend_stdctx_all")
+    task = run_task("wait_for_context_definitions", timeout=1)
+
+    assert task.return_values["probes"][0]["ready"] is True
+
+
+def test_unknown_probe_types_are_rejected(run_task):
+    with pytest.raises(TaskOptionsError, match="Unknown probe"):
+        run_task("wait_for_decision_tables", probes=[{"type": "sleep"}])